@@ -0,0 +1,68 @@
+"""
+Benchmark: in-house CLR (src/composition.py) vs scikit-bio's clr(multi_replace(X)).
+
+Reports wall time and peak traced memory (``tracemalloc`` sees NumPy
+allocations) of both paths on a random sparse-ish count matrix, and the
+largest absolute difference between their results.
+
+    python benchmarks/bench_clr.py                  # 10 000 × 5 000
+    python benchmarks/bench_clr.py --rows 2000 --cols 1000
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.composition import clr_transform  # noqa: E402
+
+
+def measure(fn, *args, **kwargs):
+    """Return (result, seconds, peak MiB) of ``fn(*args, **kwargs)``."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def skbio_clr(counts):
+    from skbio.stats.composition import clr, multi_replace
+
+    return clr(multi_replace(counts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--cols", type=int, default=5_000)
+    parser.add_argument("--density", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    counts = rng.integers(1, 100, size=(args.rows, args.cols)).astype(np.float64)
+    counts[rng.random(counts.shape) > args.density] = 0
+    counts[:, 0] += 1  # no all-zero rows
+    print(f"matrix {args.rows} × {args.cols}, {counts.nbytes / 2**20:.0f} MiB float64 input")
+
+    ours, t_ours, m_ours = measure(clr_transform, counts)
+    print(f"src.composition  {t_ours:8.2f} s  peak {m_ours:9.1f} MiB")
+    try:
+        theirs, t_skbio, m_skbio = measure(skbio_clr, counts)
+    except ImportError:
+        print("scikit-bio not installed; skipping the reference run")
+        return
+    print(f"scikit-bio       {t_skbio:8.2f} s  peak {m_skbio:9.1f} MiB")
+    print(f"max |difference| {np.abs(ours - theirs).max():.2e}")
+
+
+if __name__ == "__main__":
+    main()
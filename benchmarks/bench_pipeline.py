@@ -0,0 +1,291 @@
+"""
+Benchmark: the RDD pipeline on synthetic data, with regression thresholds.
+
+Generates a GNPS-like network, sample metadata and a hierarchical reference
+metadata file (see ``benchmarks/synthetic.py``) and reports wall time and
+peak traced memory of every stage:
+
+• ``rdd.*`` – the library: ``RDDCounts`` construction,
+  ``create_RDD_counts_all_levels``, ``update_groups``, ``RDD_counts_to_wide``,
+  ``perform_pca_RDD_counts`` and ``generate_RDDflows`` (skipped when rdd is
+  not installed)
+• ``app.*`` – the app's own paths for the same steps (``src.matching``,
+  ``src.level_counts``, ``src.state_helpers``, ``src.level_index``,
+  ``src.pca``, ``src.flows``), fed with the library's file-level counts, or
+  with those of ``src.matching`` when rdd is missing
+
+Everything runs offline: the network and both metadata files are local and
+GNPS downloads are disabled.  Results are written as JSON; ``--check``
+compares them with the ``stages`` ceilings of ``benchmarks/thresholds.json``
+(derived from the ``baselines`` recorded at the ``small`` scale) and exits
+with status 1 if any stage exceeds its ceiling.  Stages are only checked when
+they ran, so the ``rdd.*`` ceilings apply where the library is installed (CI).
+Ceilings listed under ``provisional`` have no recorded baseline yet;
+``--record`` replaces them (and the baselines of every stage that ran) with
+the measured values.
+
+    python benchmarks/bench_pipeline.py                       # small scale
+    python benchmarks/bench_pipeline.py --check
+    python benchmarks/bench_pipeline.py --record              # update thresholds.json
+    python benchmarks/bench_pipeline.py --scale large --output large.json
+    python benchmarks/bench_pipeline.py --samples 500 --spectra 300000 --depth 5
+"""
+
+import argparse
+import dataclasses
+import datetime
+import importlib
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.bench_clr import measure  # noqa: E402
+from benchmarks.synthetic import SCALES, Scale, generate  # noqa: E402
+
+THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+# Imported before timing so that stages measure work, not first-import cost
+WARM_IMPORTS = ("scipy.sparse", "sklearn.decomposition", "plotly.graph_objects")
+# Ceilings are this many times the recorded baseline (absorbs machine noise) ...
+CEILING_FACTOR = 5
+# ... but never below these
+CEILING_FLOOR = {"seconds": 0.25, "peak_mib": 1.0}
+
+
+class Run:
+    """Collects ``{stage: {"seconds", "peak_mib"}}`` while printing each stage."""
+
+    def __init__(self) -> None:
+        self.results: Dict[str, Dict[str, float]] = {}
+
+    def __call__(self, stage: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        result, seconds, peak = measure(fn, *args, **kwargs)
+        self.results[stage] = {"seconds": round(seconds, 4), "peak_mib": round(peak, 2)}
+        print(f"{stage:<28} {seconds:8.2f} s  peak {peak:9.1f} MiB")
+        return result
+
+
+def _cohorts(sample_metadata: pd.DataFrame, path: str) -> pd.DataFrame:
+    """Write a regrouping file (``filename``, ``cohort``) for the update-groups stages."""
+    cohorts = pd.DataFrame(
+        {
+            "filename": sample_metadata["filename"],
+            "cohort": [f"C{i % 5}" for i in range(len(sample_metadata))],
+        }
+    )
+    cohorts.to_csv(path, index=False)
+    return cohorts
+
+
+def bench_rdd(run: Run, paths: Dict[str, str], scale: Scale) -> Optional[pd.DataFrame]:
+    """Time the library stages; returns its file-level counts (None without rdd)."""
+    try:
+        from rdd import RDDCounts
+        from rdd.analysis import perform_pca_RDD_counts
+        from rdd.utils import RDD_counts_to_wide
+    except ImportError:
+        print("rdd not installed; skipping the library stages")
+        return None
+
+    rdd = run(
+        "rdd.construct",
+        RDDCounts,
+        gnps_network_path=paths["network"],
+        external_sample_metadata=paths["sample_metadata"],
+        external_reference_metadata=paths["reference_metadata"],
+        sample_group_col="group",
+        levels=scale.depth,
+    )
+    run("rdd.create_counts_all_levels", rdd.create_RDD_counts_all_levels)
+    run("rdd.update_groups", rdd.update_groups, paths["cohorts"], merge_column="cohort")
+    run("rdd.counts_to_wide", RDD_counts_to_wide, rdd.counts, scale.depth)
+    run("rdd.pca", perform_pca_RDD_counts, rdd, level=scale.depth, n_components=3, apply_clr=True)
+    run("rdd.flows", rdd.generate_RDDflows, max_hierarchy_level=scale.depth)
+    return rdd.counts[rdd.counts["level"] == 0].reset_index(drop=True)
+
+
+def bench_app(
+    run: Run, paths: Dict[str, str], scale: Scale, level0: Optional[pd.DataFrame]
+) -> None:
+    """
+    Time the app's own implementation of the same steps.
+
+    Downstream stages run on rdd's level-0 counts when given, on those of
+    the integer-encoded matching otherwise.
+    """
+    from src.flows import build_flow_graph
+    from src.level_counts import aggregate_levels
+    from src.level_index import LevelIndex
+    from src.matching import match_network
+    from src.pca import perform_pca
+    from src.state_helpers import relabel_groups
+
+    reference_metadata = pd.read_csv(paths["reference_metadata"])
+    sample_metadata = pd.read_csv(paths["sample_metadata"])
+    sample_metadata["filename"] = sample_metadata["filename"].str.rsplit(".", n=1).str[0]
+    columns = [f"sample_type_group{level}" for level in range(1, scale.depth + 1)]
+
+    matched = run("app.match", match_network, paths["network"], reference_metadata["filename"])
+    run("app.match_levels", matched.level_counts, reference_metadata, columns)
+    if level0 is None:
+        level0 = matched.file_counts(sample_metadata.set_index("filename")["group"])
+    levels = run("app.aggregate_levels", aggregate_levels, level0, reference_metadata, columns)
+    counts = pd.concat([level0, levels], ignore_index=True)
+    index = run("app.level_index", LevelIndex, counts)
+    rdd = SimpleNamespace(counts=counts, sample_metadata=sample_metadata)
+    cohorts = pd.read_csv(paths["cohorts"])
+    cohorts["filename"] = cohorts["filename"].str.rsplit(".", n=1).str[0]
+    run("app.update_groups", relabel_groups, rdd, cohorts.set_index("filename")["cohort"])
+    run("app.counts_to_wide", index.level(scale.depth).to_frame, index.groups)
+    run("app.pca", perform_pca, index, level=scale.depth, n_components=3, apply_clr=True)
+    run("app.flows", build_flow_graph, level0, reference_metadata, columns)
+
+
+def check(results: Dict[str, Dict[str, float]], thresholds: Dict[str, Any]) -> List[str]:
+    """Return one message per stage metric above its ceiling in `thresholds`."""
+    failures = []
+    for stage, ceilings in thresholds["stages"].items():
+        measured = results.get(stage)
+        if measured is None:
+            continue  # stage not run (e.g. rdd not installed)
+        for metric, ceiling in ceilings.items():
+            if measured[metric] > ceiling:
+                failures.append(f"{stage}: {metric} {measured[metric]:g} > {ceiling:g}")
+    return failures
+
+
+def _ceiling(value: float, floor: float) -> float:
+    """`CEILING_FACTOR` × `value`, rounded up to two significant digits."""
+    value = max(value * CEILING_FACTOR, floor)
+    step = 10 ** (math.floor(math.log10(value)) - 1)
+    return round(math.ceil(value / step - 1e-9) * step, 6)
+
+
+def record(
+    results: Dict[str, Dict[str, float]], thresholds: Dict[str, Any], environment: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Thresholds with the baselines and ceilings of every stage in `results` replaced.
+
+    Stages that did not run keep their entries; recorded stages stop being
+    provisional.
+    """
+    updated = json.loads(json.dumps(thresholds))
+    for stage, measured in results.items():
+        updated["baselines"][stage] = {
+            metric: round(value, 2) for metric, value in measured.items()
+        }
+        updated["stages"][stage] = {
+            metric: _ceiling(value, CEILING_FLOOR[metric]) for metric, value in measured.items()
+        }
+    provisional = [s for s in updated.get("provisional", []) if s not in results]
+    updated["provisional"] = provisional
+    updated["recorded"] = {"date": datetime.date.today().isoformat(), **environment}
+    return updated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    for field in dataclasses.fields(Scale):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=int, dest=field.name)
+    parser.add_argument("--output", default="bench_pipeline.json", help="results file (JSON)")
+    parser.add_argument("--data-dir", help="keep the generated inputs here (default: temp dir)")
+    parser.add_argument("--check", action="store_true", help="fail on threshold regressions")
+    parser.add_argument(
+        "--record", action="store_true", help="write this run's baselines to the thresholds"
+    )
+    parser.add_argument("--thresholds", default=THRESHOLDS)
+    args = parser.parse_args(argv)
+
+    overrides = {
+        f.name: getattr(args, f.name)
+        for f in dataclasses.fields(Scale)
+        if getattr(args, f.name) is not None
+    }
+    scale = dataclasses.replace(SCALES[args.scale], **overrides)
+    os.environ["RDD_GNPS_OFFLINE"] = "1"
+    for module in WARM_IMPORTS:
+        importlib.import_module(module)
+
+    with tempfile.TemporaryDirectory(prefix="gnps_rdd_bench_") as scratch:
+        directory = args.data_dir or scratch
+        paths = generate(scale, directory)
+        paths["cohorts"] = os.path.join(directory, "cohorts.csv")
+        _cohorts(pd.read_csv(paths["sample_metadata"]), paths["cohorts"])
+        print(f"scale {args.scale}: {scale.to_dict()}")
+
+        run = Run()
+        bench_app(run, paths, scale, bench_rdd(run, paths, scale))
+
+    report = {
+        "scale": args.scale if not overrides else "custom",
+        "parameters": scale.to_dict(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "stages": run.results,
+    }
+    with open(args.output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.check or args.record:
+        with open(args.thresholds) as fh:
+            thresholds = json.load(fh)
+        if report["scale"] != thresholds["scale"]:
+            sys.exit(
+                f"thresholds are for the {thresholds['scale']!r} scale, not {report['scale']!r}"
+            )
+    if args.record:
+        environment = {
+            "python": report["python"],
+            "pandas": report["pandas"],
+            "rdd": _rdd_version(),
+        }
+        with open(args.thresholds, "w") as fh:
+            fh.write(_dumps(record(run.results, thresholds, environment)))
+        print(f"baselines of {len(run.results)} stages written to {args.thresholds}")
+    elif args.check:
+        failures = check(run.results, thresholds)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+        unchecked = sorted(set(thresholds["stages"]) - set(run.results))
+        if unchecked:
+            print(f"not run, so not checked: {', '.join(unchecked)}")
+        print("all stages within thresholds")
+
+
+def _dumps(thresholds: Dict[str, Any]) -> str:
+    """JSON in the layout of thresholds.json: one line per stage."""
+    items = []
+    for key, value in thresholds.items():
+        if isinstance(value, dict) and value and all(isinstance(v, dict) for v in value.values()):
+            inner = ",\n".join(f"    {json.dumps(k)}: {json.dumps(v)}" for k, v in value.items())
+            items.append(f"  {json.dumps(key)}: {{\n{inner}\n  }}")
+        else:
+            items.append(f"  {json.dumps(key)}: {json.dumps(value)}")
+    return "{\n" + ",\n".join(items) + "\n}\n"
+
+
+def _rdd_version() -> Optional[str]:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("gnps-rdd")
+    except PackageNotFoundError:
+        return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Synthetic GNPS-like inputs for the pipeline benchmarks.
+
+:func:`generate` writes, for a :class:`Scale`,
+
+• ``network.tsv``            – a GNPS2 ``clusterinfo``-style table
+  (``#ClusterIdx``, ``#Filename``, …), one row per spectrum
+• ``sample_metadata.csv``    – ``filename`` and ``group`` of every sample file
+• ``reference_metadata.csv`` – foodomics-style reference files with
+  ``sample_type`` and ``sample_type_group1`` … ``sample_type_group<depth>``
+  columns forming a tree (every term has one parent on the level above)
+
+Spectra of one cluster come from a handful of files, so samples share
+clusters with a few references, as in a molecular network.  Everything is
+drawn from a seeded generator, so the same scale always gives the same files.
+"""
+
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_GROUPS = ("G1", "G2", "G3")
+
+
+@dataclass(frozen=True)
+class Scale:
+    """Size of a synthetic data set."""
+
+    samples: int = 200
+    spectra: int = 100_000
+    references: int = 1_000
+    depth: int = 4
+    branching: int = 4  # children per ontology term
+    spectra_per_cluster: int = 8
+    seed: int = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+SCALES = {
+    "tiny": Scale(samples=20, spectra=5_000, references=100, depth=3),
+    "small": Scale(),
+    "large": Scale(samples=2_000, spectra=2_000_000, references=5_000, depth=5),
+}
+
+
+def reference_metadata(scale: Scale, rng: np.random.Generator) -> pd.DataFrame:
+    """Reference files with a `scale.depth`-level ontology tree."""
+    names = [f"ref_{i:06d}" for i in range(scale.references)]
+    leaves = rng.integers(0, scale.branching**scale.depth, scale.references)
+    frame = pd.DataFrame(
+        {
+            "filename": [f"{name}.mzML" for name in names],
+            "sample_type": np.where(rng.random(scale.references) < 0.8, "simple", "complex"),
+        }
+    )
+    for level in range(1, scale.depth + 1):
+        # ancestor of each leaf on this level; names are unique per level
+        term = leaves // scale.branching ** (scale.depth - level)
+        frame[f"sample_type_group{level}"] = [f"L{level}_{t:05d}" for t in term]
+    return frame
+
+
+def sample_metadata(scale: Scale) -> pd.DataFrame:
+    """Sample files spread round-robin over :data:`SAMPLE_GROUPS`."""
+    return pd.DataFrame(
+        {
+            "filename": [f"sample_{i:05d}.mzML" for i in range(scale.samples)],
+            "group": [SAMPLE_GROUPS[i % len(SAMPLE_GROUPS)] for i in range(scale.samples)],
+        }
+    )
+
+
+def network(scale: Scale, rng: np.random.Generator, files: np.ndarray) -> pd.DataFrame:
+    """
+    One row per spectrum; each cluster draws its spectra from a few files.
+
+    `files` lists sample files first, then reference files.
+    """
+    n_clusters = max(1, scale.spectra // scale.spectra_per_cluster)
+    cluster = np.sort(rng.integers(1, n_clusters + 1, scale.spectra))
+    # every cluster has three candidate files: two samples and one reference
+    candidates = np.column_stack(
+        [
+            rng.integers(0, scale.samples, n_clusters + 1),
+            rng.integers(0, scale.samples, n_clusters + 1),
+            scale.samples + rng.integers(0, scale.references, n_clusters + 1),
+        ]
+    )
+    file = candidates[cluster, rng.integers(0, 3, scale.spectra)]
+    is_reference = file >= scale.samples
+    return pd.DataFrame(
+        {
+            "#ClusterIdx": cluster,
+            "#Filename": "input_spectra/" + files[file].astype(object),
+            "#SpecIdx": np.arange(scale.spectra),
+            "#Scan": rng.integers(1, 5_000, scale.spectra),
+            "#ParentMass": rng.uniform(100, 1_200, scale.spectra).round(4),
+            "#Charge": 1,
+            "#RetTime": rng.uniform(0, 900, scale.spectra).round(2),
+            "DefaultGroups": np.where(is_reference, "G4", "G1"),
+        }
+    )
+
+
+def generate(scale: Scale, directory: str) -> Dict[str, str]:
+    """
+    Write the synthetic inputs for `scale` into `directory`.
+
+    Returns
+    -------
+    dict
+        ``network``, ``sample_metadata`` and ``reference_metadata`` paths.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(scale.seed)
+    references = reference_metadata(scale, rng)
+    samples = sample_metadata(scale)
+    files = np.concatenate([samples["filename"], references["filename"]]).astype(str)
+    paths = {
+        "network": os.path.join(directory, "network.tsv"),
+        "sample_metadata": os.path.join(directory, "sample_metadata.csv"),
+        "reference_metadata": os.path.join(directory, "reference_metadata.csv"),
+    }
+    network(scale, rng, files).to_csv(paths["network"], sep="\t", index=False)
+    samples.to_csv(paths["sample_metadata"], index=False)
+    references.to_csv(paths["reference_metadata"], index=False)
+    return paths
+
+
+def file_counts(paths: Dict[str, str]) -> pd.DataFrame:
+    """
+    Level-0 counts of the generated network, for runs without the rdd library.
+
+    A sample spectrum counts once for every reference file found in its
+    cluster (the reference data-driven matching rule), counted with the
+    integer-encoded join of :mod:`src.matching`.
+    """
+    from src.matching import match_network
+
+    references = pd.read_csv(paths["reference_metadata"], usecols=["filename"])["filename"]
+    groups = pd.read_csv(paths["sample_metadata"])
+    groups["filename"] = groups["filename"].str.rsplit(".", n=1).str[0]
+    matched = match_network(paths["network"], references)
+    counts = matched.file_counts(groups.set_index("filename")["group"])
+    return counts[["filename", "reference_type", "count", "level", "group"]]
@@ -1,31 +1,119 @@
 # pages/01_Create_RDD_Count_Table.py
-import os, sys, tempfile
+import os, sys, zipfile
+import hashlib
 import pandas as pd
 import streamlit as st
 import io
+from dataclasses import replace
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 SRC = os.path.join(ROOT, "src")
 if SRC not in sys.path:
     sys.path.insert(0, SRC)
 
-from rdd import RDDCounts  # noqa: E402
-from src.state_helpers import set_group  # noqa: E402
+from src.build import BuildRequest, build_rdd, pop_build_timings  # noqa: E402
+from src.counts_version import counts_version  # noqa: E402
+from src.groups import get_group_assignment  # noqa: E402
+from src.ingest import read_header, unique_values  # noqa: E402
+from src.perf import performance_panel, session_perf_log  # noqa: E402
+from src.rdd_cache import cache_key  # noqa: E402
+from src.resources import (  # noqa: E402
+    job_queue,
+    rdd_cache,
+    reference_store_dir,
+    shared_tables,
+    task_cache,
+)
+from src.snapshot import load_snapshot, snapshot_bytes  # noqa: E402
+from src.state_helpers import relabel_groups, set_group, spill_directory  # noqa: E402
+
+PAGE = "Create RDD Count Table"
+perf = session_perf_log()
 
 
 # ────────────────────── helpers ──────────────────────
-def _read_any(upload):
-    ext = os.path.splitext(upload.name)[1].lower()
-    sep = "\t" if ext in (".tsv", ".txt") else ","
-    return pd.read_csv(upload, sep=sep)
+def _spill(upload):
+    """Stream an upload into this session's spill directory (once)."""
+    if not upload:
+        return None
+    with perf.stage(PAGE, f"persist upload ({upload.name})"):
+        return spill_directory().spill(upload)
+
+
+def _columns(spilled):
+    """Column names of a spilled table (header only)."""
+    with perf.stage(PAGE, f"parse header ({spilled.name})"):
+        return read_header(spilled)
+
+
+def _values(spilled, column):
+    """Unique values of one column of a spilled table."""
+    with perf.stage(PAGE, f"scan column {column!r} ({spilled.name})"):
+        return unique_values(spilled, column)
+
 
+def _finish_build(rdd, group_col, key):
+    """Share the immutable tables, make the chosen column the live group, publish the object."""
+    with perf.stage(PAGE, "share tables"):
+        shared_tables().attach(key, rdd)
+    with perf.stage(PAGE, "set_group"):
+        set_group(rdd, group_col)
+    st.session_state["rdd"] = rdd
+    st.session_state["build_notice"] = True
+
+
+def _show_build_error(e, task_id):
+    error_msg = str(e)
+    st.error(f"❌ Error creating RDDCounts: {error_msg}")
+
+    # Provide specific guidance for HTTP errors with task IDs
+    if task_id and ("500" in error_msg or "HTTP" in error_msg.upper() or "404" in error_msg):
+        st.warning(
+            "⚠️ **Cannot Access GNPS Job Data**\n\n"
+            "This may occur due to server issues, archived jobs, or temporary API problems.\n\n"
+            "**Recommended Solution:**\n\n"
+            "1. Go to your GNPS job page in your browser\n"
+            "2. Download the network file:\n"
+            "   - **GNPS1:** `METABOLOMICS-SNETS-V2-[taskid]-view_all_clusters_withID_beta-main.tsv`\n"
+            "   - **GNPS2:** `clusterinfo.tsv`\n"
+            "3. Change input method above to **'Upload File'**\n"
+            "4. Upload your downloaded file\n\n"
+            "This will bypass the API and work with any GNPS job."
+        )
+    else:
+        st.exception(e)
+
+
+@st.fragment(run_every=1.0)
+def _build_progress():
+    """Poll the background build of this session until it finishes."""
+    job = st.session_state.get("build_job")
+    if job is None:
+        return
+    queue = job_queue()
+    if job["id"] not in queue:  # server restarted or job discarded
+        del st.session_state["build_job"]
+        return
+
+    status = queue.status(job["id"])
+    if not status.finished:
+        st.progress(
+            status.fraction,
+            text=f"⏳ {status.stage}: {status.message} ({status.elapsed:.0f}s)",
+        )
+        return
 
-def _persist(upload):
-    """Save UploadedFile -> temp file -> path"""
-    suf = os.path.splitext(upload.name)[1]
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suf) as tmp:
-        tmp.write(upload.getbuffer())
-        return tmp.name
+    del st.session_state["build_job"]
+    try:
+        rdd = queue.result(job["id"])
+    except Exception as e:
+        _show_build_error(e, job["task_id"])
+        return
+    perf.extend(pop_build_timings(rdd), page=PAGE, where="worker")
+    with perf.stage(PAGE, "store in cache"):
+        rdd_cache().put(job["key"], rdd)
+    _finish_build(rdd, job["group_col"], job["key"])
+    st.rerun()
 
 
 # ──────────────── Demo Data Helper ────────────────
@@ -66,6 +154,26 @@ with st.expander("ℹ️ What data do I need for RDD analysis?"):
     """
     )
 
+# -------- RESTORE FROM SNAPSHOT --------
+with st.expander("♻️ Restore a saved RDD snapshot"):
+    snapshot_up = st.file_uploader(
+        "RDD snapshot (.zip)",
+        type=("zip",),
+        key="snapshot",
+        help="A snapshot downloaded from this page; restores the count table without rebuilding it",
+    )
+    if snapshot_up and st.button("Restore snapshot", key="restore_snapshot"):
+        try:
+            with perf.stage(PAGE, "restore snapshot"):
+                rdd = load_snapshot(snapshot_up)
+        except (ValueError, zipfile.BadZipFile) as e:
+            st.error(f"❌ Could not restore snapshot: {e}")
+        else:
+            snapshot_key = hashlib.blake2b(snapshot_up.getvalue(), digest_size=20).hexdigest()
+            st.session_state["rdd"] = shared_tables().attach(f"snapshot-{snapshot_key}", rdd)
+            st.session_state["group_column"] = getattr(rdd, "sample_group_col", "group")
+            st.success("✅ RDD count table restored from snapshot!")
+
 if "use_demo" not in st.session_state:
     st.session_state["use_demo"] = False
 
@@ -131,6 +239,8 @@ else:  # GNPS Task ID
         horizontal=True,
         help="Select the GNPS version used for your analysis",
     )
+    if task_cache().offline:
+        st.caption(f"📦 Offline mode: tasks are served only from `{task_cache().directory}`.")
 
     # Show warning for GNPS2 about required sample metadata
     if gnps_version == "GNPS2":
@@ -162,30 +272,32 @@ if use_demo:
         f"📊 Demo groups selected: Samples={sample_groups_sel}, References={reference_groups_sel}"
     )
 elif sample_meta_up:
-    meta_df = _read_any(sample_meta_up)
+    meta_spill = _spill(sample_meta_up)
+    meta_cols = _columns(meta_spill)
     sample_group_col = st.selectbox(
         "Column to group by",
-        meta_df.columns,
-        index=list(meta_df.columns).index("group") if "group" in meta_df.columns else 0,
+        meta_cols,
+        index=meta_cols.index("group") if "group" in meta_cols else 0,
     )
     sample_groups_sel = st.multiselect(
         "Sample groups to include",
-        sorted(meta_df[sample_group_col].dropna().unique()),
+        _values(meta_spill, sample_group_col),
         default=None,
         help="Leave blank to include all groups in the analysis",
     )
 elif gnps_file:
-    gnps_df = _read_any(gnps_file)
-    if "DefaultGroups" in gnps_df.columns:
+    gnps_spill = _spill(gnps_file)
+    if "DefaultGroups" in _columns(gnps_spill):
+        default_groups = _values(gnps_spill, "DefaultGroups")
         sample_groups_sel = st.multiselect(
             "Sample groups to include",
-            sorted(gnps_df["DefaultGroups"].dropna().unique()),
+            default_groups,
             default="G1",
             help="Leave blank to include all groups in the analysis",
         )
         reference_groups_sel = st.multiselect(
             "Reference groups to include",
-            sorted(gnps_df["DefaultGroups"].dropna().unique()),
+            default_groups,
             default="G4",
             help="Leave blank to include all groups in the analysis",
         )
@@ -194,29 +306,31 @@ elif gnps_task_id and input_method == "GNPS Task ID":
     # For GNPS2, we can use sample metadata
     if gnps_version == "GNPS1 (Classic)":
         if gnps_task_id.strip():  # Only fetch if task_id is provided
-            # Use session state to cache the fetched data (both groups and dataframe)
+            # Groups are kept per session; the network table itself is in the task cache
             cache_key_groups = f"gnps1_groups_{gnps_task_id}"
-            cache_key_df = f"gnps1_df_{gnps_task_id}"
 
             if cache_key_groups not in st.session_state:
                 # GNPS1 requires group selection from the network data
                 with st.spinner("📊 Fetching GNPS1 data to display available groups..."):
                     try:
-                        from rdd.utils import get_gnps_task_data
-
-                        temp_gnps_df = get_gnps_task_data(gnps_task_id, gnps2=False)
+                        transfer_note = st.empty()
+                        download = task_cache().downloader(
+                            lambda p: transfer_note.caption(f"⬇️ {p.describe()}")
+                        )
+                        with perf.stage(PAGE, "GNPS fetch (groups)"):
+                            temp_gnps_df = task_cache().fetch(
+                                gnps_task_id, gnps2=False, download=download
+                            )
+                        transfer_note.empty()
                         if "DefaultGroups" in temp_gnps_df.columns:
                             available_groups = sorted(
                                 temp_gnps_df["DefaultGroups"].dropna().unique()
                             )
                             st.session_state[cache_key_groups] = available_groups
-                            # Cache the full dataframe for later use
-                            st.session_state[cache_key_df] = temp_gnps_df
                             st.success("✅ Groups loaded successfully!")
                         else:
                             st.warning("Could not find DefaultGroups column in GNPS1 data.")
                             st.session_state[cache_key_groups] = []
-                            st.session_state[cache_key_df] = None
                     except Exception as e:
                         error_msg = str(e)
                         st.error(f"❌ Failed to fetch GNPS data: {error_msg}")
@@ -236,7 +350,6 @@ elif gnps_task_id and input_method == "GNPS Task ID":
                             )
 
                         st.session_state[cache_key_groups] = []
-                        st.session_state[cache_key_df] = None
 
             # Use cached groups
             available_groups = st.session_state.get(cache_key_groups, [])
@@ -263,15 +376,16 @@ elif gnps_task_id and input_method == "GNPS Task ID":
             )
             st.stop()  # Prevent further execution without required metadata
         else:
-            meta_df = _read_any(sample_meta_up)
+            meta_spill = _spill(sample_meta_up)
+            meta_cols = _columns(meta_spill)
             sample_group_col = st.selectbox(
                 "Column to group by",
-                meta_df.columns,
-                index=(list(meta_df.columns).index("group") if "group" in meta_df.columns else 0),
+                meta_cols,
+                index=(meta_cols.index("group") if "group" in meta_cols else 0),
             )
             sample_groups_sel = st.multiselect(
                 "Sample groups to include",
-                sorted(meta_df[sample_group_col].dropna().unique()),
+                _values(meta_spill, sample_group_col),
                 default=None,
                 help="Leave blank to include all groups in the analysis",
             )
@@ -297,6 +411,11 @@ levels_val = st.number_input(
     help="Leave empty for automatic detection, or set to 0 for file-level counts only",
 )
 
+aggregate_in_app = st.checkbox(
+    "Aggregate ontology levels in the app",
+    help="Counts levels 1..N in one vectorised pass over the file-level counts instead of the per-level loop of RDDCounts; the result is the same",
+)
+
 if (
     ontology_cols
     and levels_val
@@ -315,94 +434,76 @@ if st.button("Generate RDD Counts"):
         st.error("GNPS Task ID required.")
         st.stop()
 
-    # Prepare paths for uploaded files
-    gnps_path = _persist(gnps_file) if gnps_file else None
-    sample_meta_p = _persist(sample_meta_up) if sample_meta_up else None
-    ref_meta_p = _persist(ref_meta_up) if ref_meta_up else None
+    # Spill uploads once; RDDCounts reads them from the spill directory
+    gnps_spill = _spill(gnps_file)
+    sample_meta_spill = _spill(sample_meta_up)
+    ref_meta_spill = _spill(ref_meta_up)
+    gnps_path = gnps_spill.path if gnps_spill else None
+    sample_meta_p = sample_meta_spill.path if sample_meta_spill else None
+    ref_meta_p = ref_meta_spill.path if ref_meta_spill else None
     ontology_list = [c.strip() for c in ontology_cols.split(",") if c.strip()]
 
-    try:
-        # Determine whether to use task_id or file path
-        if gnps_task_id:
-            # Check if we have cached GNPS data (for GNPS1)
-            cache_key_df = f"gnps1_df_{gnps_task_id}"
-            if cache_key_df in st.session_state and st.session_state[cache_key_df] is not None:
-                # Use cached dataframe - save it to a temp file and use file path instead
-                with st.spinner("Using cached GNPS data..."):
-                    cached_df = st.session_state[cache_key_df]
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".tsv", mode="w") as tmp:
-                        cached_df.to_csv(tmp.name, sep="\t", index=False)
-                        gnps_path = tmp.name
-
-                    rdd = RDDCounts(
-                        gnps_network_path=gnps_path,
-                        sample_types=sample_type,
-                        sample_groups=sample_groups_sel or None,
-                        sample_group_col=sample_group_col,
-                        levels=levels_val,
-                        external_reference_metadata=ref_meta_p,
-                        external_sample_metadata=sample_meta_p,
-                        ontology_columns=ontology_list or None,
-                        reference_groups=reference_groups_sel or None,
-                    )
-            else:
-                # No cached data - fetch via task_id (for GNPS2 or if cache missing)
-                with st.spinner(
-                    f"🔄 Fetching GNPS{' 2' if gnps_version == 'GNPS2' else '1'} data from task {gnps_task_id}..."
-                ):
-                    rdd = RDDCounts(
-                        task_id=gnps_task_id,
-                        gnps_2=(gnps_version == "GNPS2"),
-                        sample_types=sample_type,
-                        sample_groups=sample_groups_sel or None,
-                        sample_group_col=sample_group_col,
-                        levels=levels_val,
-                        external_reference_metadata=ref_meta_p,
-                        external_sample_metadata=sample_meta_p,
-                        ontology_columns=ontology_list or None,
-                        reference_groups=reference_groups_sel or None,
-                    )
-        else:
-            rdd = RDDCounts(
-                gnps_network_path=gnps_path,
-                sample_types=sample_type,
-                sample_groups=sample_groups_sel or None,
-                sample_group_col=sample_group_col,
-                levels=levels_val,
-                external_reference_metadata=ref_meta_p,
-                external_sample_metadata=sample_meta_p,
-                ontology_columns=ontology_list or None,
-                reference_groups=reference_groups_sel or None,
-            )
+    request = BuildRequest(
+        gnps_network_path=gnps_path,
+        task_id=gnps_task_id or None,
+        gnps_2=(gnps_version == "GNPS2"),
+        sample_types=sample_type,
+        sample_groups=tuple(sample_groups_sel or ()) or None,
+        sample_group_col=sample_group_col,
+        levels=levels_val,
+        external_reference_metadata=ref_meta_p,
+        external_sample_metadata=sample_meta_p,
+        ontology_columns=tuple(ontology_list) or None,
+        reference_groups=tuple(reference_groups_sel or ()) or None,
+        aggregator="app" if aggregate_in_app else "rdd",
+        reference_store=reference_store_dir(),
+        project_network=os.environ.get("RDD_PROJECT_NETWORK", "").lower() in ("1", "true", "yes"),
+        matcher=os.environ.get("RDD_MATCHER", "rdd"),
+    )
 
-        # make chosen column the live group
-        set_group(rdd, sample_group_col)
+    # Content-addressed key: identical inputs + parameters → cached result
+    rdd_key = cache_key(
+        inputs={
+            "network": (
+                f"task:{gnps_version}:{gnps_task_id.strip()}"
+                if gnps_task_id
+                else gnps_spill.digest
+            ),
+            "sample_metadata": sample_meta_spill.digest if sample_meta_spill else None,
+            "reference_metadata": ref_meta_spill.digest if ref_meta_spill else None,
+        },
+        params={
+            "sample_types": sample_type,
+            "sample_groups": sorted(map(str, sample_groups_sel or [])),
+            "reference_groups": sorted(map(str, reference_groups_sel or [])),
+            "sample_group_col": sample_group_col,
+            "levels": levels_val,
+            "ontology_columns": ontology_list,
+        },
+    )
 
-        st.session_state["rdd"] = rdd
-        st.success("✅ RDDCounts object created successfully!")
+    with perf.stage(PAGE, "cache lookup"):
+        rdd = rdd_cache().get(rdd_key)
+    if rdd is not None:
+        st.info("⚡ Loaded identical RDD count table from cache.")
+        _finish_build(rdd, sample_group_col, rdd_key)
+    else:
+        if gnps_task_id:
+            # The worker serves the task table from the on-disk task cache
+            request = replace(request, task_cache=task_cache())
 
-    except Exception as e:
-        error_msg = str(e)
-        st.error(f"❌ Error creating RDDCounts: {error_msg}")
-
-        # Provide specific guidance for HTTP errors with task IDs
-        if gnps_task_id and (
-            "500" in error_msg or "HTTP" in error_msg.upper() or "404" in error_msg
-        ):
-            st.warning(
-                "⚠️ **Cannot Access GNPS Job Data**\n\n"
-                "This may occur due to server issues, archived jobs, or temporary API problems.\n\n"
-                "**Recommended Solution:**\n\n"
-                "1. Go to your GNPS job page in your browser\n"
-                "2. Download the network file:\n"
-                "   - **GNPS1:** `METABOLOMICS-SNETS-V2-[taskid]-view_all_clusters_withID_beta-main.tsv`\n"
-                "   - **GNPS2:** `clusterinfo.tsv`\n"
-                "3. Change input method above to **'Upload File'**\n"
-                "4. Upload your downloaded file\n\n"
-                "This will bypass the API and work with any GNPS job."
-            )
-        else:
-            st.exception(e)
+        # Build in a worker process; progress is polled below across reruns
+        st.session_state["build_job"] = {
+            "id": job_queue().submit(build_rdd, request),
+            "key": rdd_key,
+            "group_col": sample_group_col,
+            "task_id": gnps_task_id,
+        }
+
+if "build_job" in st.session_state:
+    _build_progress()
+if st.session_state.pop("build_notice", False):
+    st.success("✅ RDDCounts object created successfully!")
 
 
 # -------- GROUP ASSIGNMENT SECTION (OUTSIDE BUTTON BLOCK) --------
@@ -441,28 +542,8 @@ if "rdd" in st.session_state:
                 mapping_df["group"] = mapping_df["group"].str.replace("G2", "Vegan")
 
                 if {"filename", "group"}.issubset(mapping_df.columns):
-                    rdd.counts = rdd.counts.drop("group", axis=1, errors="ignore").merge(
-                        mapping_df[["filename", "group"]],
-                        left_on="filename",
-                        right_on="filename",
-                        how="left",
-                    )
-                    # Update sample_metadata with new group assignments
-                    if "group" in rdd.counts.columns and "filename" in rdd.counts.columns:
-                        rdd.sample_metadata = rdd.sample_metadata.drop(
-                            "group", axis=1, errors="ignore"
-                        ).merge(
-                            rdd.counts[["filename", "group"]].drop_duplicates(),
-                            on="filename",
-                            how="left",
-                        )
-
-                        # Also update the original sample_group_col if it's different from "group"
-                        if (
-                            rdd.sample_group_col != "group"
-                            and rdd.sample_group_col in rdd.sample_metadata.columns
-                        ):
-                            rdd.sample_metadata[rdd.sample_group_col] = rdd.sample_metadata["group"]
+                    with perf.stage(PAGE, "relabel groups"):
+                        relabel_groups(rdd, mapping_df.set_index("filename")["group"])
 
                     st.session_state["rdd"] = rdd
                     st.session_state["demo_groups_applied"] = True
@@ -527,33 +608,21 @@ if "rdd" in st.session_state:
 
         if st.button("🔄 Apply Custom Group Mapping", key="apply_custom_mapping"):
             if {"filename", "new_group"}.issubset(mapping_df.columns):
-                # Save the mapping file temporarily to use with update_groups
-                with tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False) as tmp:
-                    mapping_df.to_csv(tmp.name, index=False)
-                    tmp_path = tmp.name
-
-                try:
-                    # Use the built-in update_groups method - just updates labels, doesn't recalculate
-                    rdd.update_groups(tmp_path, merge_column="new_group")
+                # Only the per-sample lookup changes; counts are not recalculated
+                with perf.stage(PAGE, "relabel groups"):
+                    n_relabelled = relabel_groups(
+                        rdd, mapping_df.set_index("filename")["new_group"]
+                    )
 
-                    # Ensure the visualization 'group' column is synced
-                    set_group(rdd, rdd.sample_group_col)
+                st.session_state["rdd"] = rdd
+                st.session_state["custom_mapping_applied"] = True
+                st.success(f"✅ Custom group assignments applied to {n_relabelled} samples!")
 
-                    st.session_state["rdd"] = rdd
-                    st.session_state["custom_mapping_applied"] = True
-                    st.success("✅ Custom group assignments applied!")
-
-                    # Show updated counts to verify the change
-                    st.markdown("**Updated counts (first 15 rows):**")
-                    st.dataframe(
-                        rdd.counts[["filename", "reference_type", "count", "level", "group"]].head(
-                            15
-                        )
-                    )
-                finally:
-                    # Clean up temp file
-                    if os.path.exists(tmp_path):
-                        os.unlink(tmp_path)
+                # Show updated counts to verify the change
+                st.markdown("**Updated counts (first 15 rows):**")
+                st.dataframe(
+                    rdd.counts[["filename", "reference_type", "count", "level", "group"]].head(15)
+                )
                 st.rerun()
             else:
                 st.error("❌ Mapping file must have columns: filename, new_group")
@@ -629,3 +698,38 @@ if "rdd" in st.session_state:
     st.markdown("---")
     st.markdown("### 🔢 RDD Count Table Preview")
     st.dataframe(rdd.counts.head(15))
+
+    # A snapshot is a full Parquet export: build it only on request and keep it
+    # while the table and its groups stay the same
+    snapshot_state = (rdd, get_group_assignment(rdd).labels, counts_version(rdd))
+    snapshot = st.session_state.get("snapshot_export")
+    if snapshot is not None and not (
+        snapshot["rdd"] is rdd
+        and snapshot["labels"] is snapshot_state[1]
+        and snapshot["version"] == snapshot_state[2]
+    ):
+        snapshot = st.session_state["snapshot_export"] = None
+    if snapshot is None and st.button(
+        "📦 Prepare Snapshot",
+        help="Binary snapshot (Parquet) of the count table, both metadata tables and settings; restore it above to skip rebuilding",
+        key="prepare_snapshot",
+    ):
+        try:
+            with perf.stage(PAGE, "snapshot export"):
+                snapshot = dict(zip(("rdd", "labels", "version"), snapshot_state))
+                snapshot["data"] = snapshot_bytes(rdd)
+            st.session_state["snapshot_export"] = snapshot
+        except TypeError as e:  # an attribute the snapshot cannot restore
+            snapshot = None
+            st.error(f"❌ Could not create snapshot: {e}")
+    if snapshot is not None:
+        st.download_button(
+            label="📥 Download Snapshot",
+            data=snapshot["data"],
+            file_name="rdd_snapshot.zip",
+            mime="application/zip",
+            help="Binary snapshot (Parquet) of the count table, both metadata tables and settings; restore it above to skip rebuilding",
+            key="download_snapshot",
+        )
+
+performance_panel()
@@ -6,7 +6,54 @@ SRC = os.path.join(ROOT, "src")
 if SRC not in sys.path:
     sys.path.insert(0, SRC)
 
-from rdd.visualization import Visualizer, PlotlyBackend, MatplotlibBackend  # noqa: E402
+from src.count_filter import CountFilter, with_cached_filters  # noqa: E402
+from src.counts_version import counts_stamp  # noqa: E402
+from src.heatmap import heatmap_view, view_figure  # noqa: E402
+from src.level_index import get_level_index  # noqa: E402
+from src.perf import performance_panel, session_perf_log  # noqa: E402
+from src.plot_summary import (  # noqa: E402
+    bar_figure,
+    bar_summary,
+    box_figure,
+    box_summary,
+    heatmap_figure,
+    heatmap_tiles,
+)
+from src.resources import env_flag  # noqa: E402
+from src.visuals import BACKENDS, show_figure, visualizer  # noqa: E402
+
+# Above this many samples the per-sample Plotly figures get too heavy for the browser
+AGGREGATE_ABOVE_SAMPLES = 500
+# Default sample tiles of the server-side heatmaps
+HEATMAP_ROWS = 200
+PAGE = "Visualizations"
+perf = session_perf_log()
+
+
+def _viewport(column, label, n, key):
+    """Range slider over one clustered heatmap axis (None: whole axis, nothing to zoom)."""
+    return column.slider(label, 0, n, (0, n), key=f"heat_{key}") if n > 1 else None
+
+
+def _clustered_heatmap(index, level, types, n_types, max_rows):
+    """Clustered level-of-detail heatmap (Plotly) with a zoomable viewport."""
+    if level not in index.levels:
+        st.warning(f"No counts at ontology level {level}.")
+        return
+    # Zooming re-tiles only the viewport; the clustering is computed once per level
+    n_rows = len(index.level(level).samples)
+    c1, c2 = st.columns(2)
+    row_span = _viewport(c1, "Samples (clustered order)", n_rows, f"rows_{level}")
+    col_span = _viewport(
+        c2, "Reference types (clustered order)", n_types, f"cols_{level}_{n_types}"
+    )
+    with perf.stage(PAGE, "heatmap (clustered)"):
+        with st.spinner("Clustering samples and reference types…"):
+            view = heatmap_view(
+                index, level, types, rows=row_span, columns=col_span, max_rows=max_rows
+            )
+        show_figure(view_figure(view))
+
 
 if "rdd" not in st.session_state:
     st.warning("First create an RDDCounts object.")
@@ -20,35 +67,84 @@ if st.session_state.get("custom_mapping_applied", False):
 else:
     st.info("📊 **Using original groups** (Apply custom mapping on page 1)")
 
-backend_choice = st.radio("Backend", ("Plotly", "Matplotlib"), horizontal=True)
-backend = PlotlyBackend() if backend_choice == "Plotly" else MatplotlibBackend()
-viz = Visualizer(backend)
+backend_choice = st.radio("Backend", BACKENDS, horizontal=True)
 
 level = st.slider("Ontology level", 0, rdd.levels, 3)
 
-default_types = rdd.counts.query("level==@level")["reference_type"].unique().tolist()
+index = get_level_index(rdd)
+default_types = index.reference_types(level)
 sel_types = st.multiselect("Reference types (blank = all)", default_types)
+# Hashable and order-free: reordering the chosen types keeps the plots on screen
+selection = CountFilter.compile(level=level, reference_types=sel_types)
 
 group_toggle = st.checkbox("Group by", value=True)
+aggregate = backend_choice == "Plotly" and st.checkbox(
+    "Aggregate on the server",
+    value=len(index.samples) > AGGREGATE_ABOVE_SAMPLES,
+    help="Send box statistics, bar totals and a downsampled heatmap to the browser instead of "
+    "every sample; the figure size then no longer grows with the number of samples.",
+)
+if aggregate:
+    c1, c2 = st.columns(2)
+    max_outliers = c1.number_input("Outliers shown per box", 0, 1000, 50, 10)
+    max_rows = c2.number_input("Heatmap rows (sample tiles)", 10, 2000, HEATMAP_ROWS, 10)
+
+# Plots stay on screen across reruns while the parameters are unchanged, so the
+# heatmap viewport below can be moved without clicking again.
+params = (counts_stamp(rdd), selection, group_toggle, backend_choice, aggregate)
 if st.button("Render plots"):
+    st.session_state["viz_params"] = params
+
+if st.session_state.get("viz_params") == params:
+    types = sorted(selection.reference_types) if selection.reference_types else None
     tab_bar, tab_box, tab_heat = st.tabs(["Barplot", "Boxplot", "Heatmap"])
 
-    with tab_bar:
-        fig = viz.plot_reference_type_distribution(
-            rdd, level, sel_types or None, group_by=group_toggle
-        )
-        (st.plotly_chart if backend_choice == "Plotly" else st.pyplot)(
-            fig, use_container_width=True
-        )
-
-    with tab_box:
-        fig = viz.box_plot_RDD_proportions(rdd, level, sel_types or None, group_by=group_toggle)
-        (st.plotly_chart if backend_choice == "Plotly" else st.pyplot)(
-            fig, use_container_width=True
-        )
-
-    with tab_heat:
-        fig = viz.plot_RDD_proportion_heatmap(rdd, level, sel_types or None)
-        (st.plotly_chart if backend_choice == "Plotly" else st.pyplot)(
-            fig, use_container_width=True
-        )
+    if aggregate and level not in index.levels:
+        st.warning(f"No counts at ontology level {level}.")
+    elif aggregate:
+        with tab_bar, perf.stage(PAGE, "bar plot (aggregated)"):
+            show_figure(bar_figure(bar_summary(index, level, types, group_by=group_toggle)))
+
+        with tab_box, perf.stage(PAGE, "box plot (aggregated)"):
+            summary = box_summary(index, level, types, group_toggle, max_outliers=max_outliers)
+            show_figure(box_figure(summary))
+
+        with tab_heat:
+            order_by = st.radio("Row order", ("Clustered", "By group"), horizontal=True)
+            if order_by == "By group":
+                with perf.stage(PAGE, "heatmap (by group)"):
+                    tiles = heatmap_tiles(index, level, types, max_rows=max_rows)
+                    show_figure(heatmap_figure(tiles))
+                if tiles.sizes.max(initial=1) > 1:
+                    st.caption(
+                        f"{tiles.sizes.sum()} samples averaged into {len(tiles.labels)} rows."
+                    )
+            else:
+                _clustered_heatmap(index, level, types, len(sel_types or default_types), max_rows)
+    else:
+        viz = visualizer(backend_choice)
+        # The visualizer selects rows with rdd.filter_counts; RDD_APP_FILTERS=1 serves
+        # those calls from the cached masks (tests/test_library_equivalence.py)
+        rdd_view = with_cached_filters(rdd) if env_flag("RDD_APP_FILTERS") else rdd
+
+        with tab_bar, perf.stage(PAGE, f"bar plot ({backend_choice})"):
+            fig = viz.plot_reference_type_distribution(
+                rdd_view, level, types, group_by=group_toggle
+            )
+            show_figure(fig, backend_choice)
+
+        with tab_box, perf.stage(PAGE, f"box plot ({backend_choice})"):
+            fig = viz.box_plot_RDD_proportions(rdd_view, level, types, group_by=group_toggle)
+            show_figure(fig, backend_choice)
+
+        with tab_heat:
+            style = st.radio("Heatmap", (backend_choice, "Clustered (Plotly)"), horizontal=True)
+            if style == backend_choice:
+                with perf.stage(PAGE, f"heatmap ({backend_choice})"):
+                    fig = viz.plot_RDD_proportion_heatmap(rdd_view, level, types)
+                    show_figure(fig, backend_choice)
+            else:
+                n_types = len(sel_types or default_types)
+                _clustered_heatmap(index, level, types, n_types, HEATMAP_ROWS)
+
+performance_panel()
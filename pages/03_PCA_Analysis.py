@@ -6,8 +6,39 @@ SRC = os.path.join(ROOT, "src")
 if SRC not in sys.path:
     sys.path.insert(0, SRC)
 
-from rdd.analysis import perform_pca_RDD_counts  # noqa: E402
-from rdd.visualization import Visualizer, PlotlyBackend, MatplotlibBackend  # noqa: E402
+from src.counts_version import counts_stamp  # noqa: E402
+from src.groups import get_group_assignment  # noqa: E402
+from src.level_index import get_level_index  # noqa: E402
+from src.pca import perform_pca  # noqa: E402
+from src.perf import performance_panel, session_perf_log  # noqa: E402
+from src.resources import env_flag  # noqa: E402
+from src.visuals import BACKENDS, show_figure, visualizer  # noqa: E402
+
+PAGE = "PCA Analysis"
+perf = session_perf_log()
+
+
+def _fit(rdd, level, apply_clr):
+    """
+    PCA scores and explained variance of `level`.
+
+    The library's fit by default.  RDD_APP_PCA=1 uses src.pca on the shared
+    level index instead: memoised per level, but its CLR replaces zeros
+    multiplicatively where the library adds a pseudocount, so the scores differ.
+    """
+    if env_flag("RDD_APP_PCA"):
+        return perform_pca(get_level_index(rdd), level=level, apply_clr=apply_clr)
+    # One library fit per session, refitted when the table or the groups change
+    key = (counts_stamp(rdd), level, apply_clr)
+    labels = get_group_assignment(rdd).labels  # replaced on relabelling
+    cached = st.session_state.get("pca_fit")
+    if cached is None or cached[0] != key or cached[1] is not labels:
+        from rdd.analysis import perform_pca_RDD_counts
+
+        cached = (key, labels, perform_pca_RDD_counts(rdd, level=level, apply_clr=apply_clr))
+        st.session_state["pca_fit"] = cached
+    return cached[2]
+
 
 if "rdd" not in st.session_state:
     st.warning("First create an RDDCounts object.")
@@ -23,18 +54,28 @@ else:
 
 level = st.slider("Ontology level", 0, rdd.levels, 3)
 apply_clr = st.checkbox("Apply CLR transformation", True)
-backend_choice = st.radio("Backend", ("Plotly", "Matplotlib"), horizontal=True)
+backend_choice = st.radio("Backend", BACKENDS, horizontal=True)
+color_by_group = st.checkbox("Colour samples by group", True)
 
+# Fits are memoised, so after the first click the plot is redrawn on every
+# rerun (backend / colouring changes) without refitting.
+params = (counts_stamp(rdd), level, apply_clr)
 if st.button("Run PCA"):
-    pca_df, ev = perform_pca_RDD_counts(rdd, level=level, apply_clr=apply_clr)
+    st.session_state["pca_params"] = params
+
+if st.session_state.get("pca_params") == params:
+    with perf.stage(PAGE, f"PCA fit (level {level})"):
+        pca_df, ev = _fit(rdd, level, apply_clr)
+
+    with perf.stage(PAGE, f"PCA plots ({backend_choice})"):
+        viz = visualizer(backend_choice)
 
-    backend = PlotlyBackend() if backend_choice == "Plotly" else MatplotlibBackend()
-    viz = Visualizer(backend)
+        fig_scatter = viz.plot_pca_results(
+            pca_df, ev, group_by=color_by_group, group_column="group"
+        )
+        fig_ev = viz.plot_explained_variance(ev)
 
-    fig_scatter = viz.plot_pca_results(pca_df, ev, group_by=True, group_column="group")
-    fig_ev = viz.plot_explained_variance(ev)
+        show_figure(fig_scatter, backend_choice)
+        show_figure(fig_ev, backend_choice)
 
-    (st.plotly_chart if backend_choice == "Plotly" else st.pyplot)(
-        fig_scatter, use_container_width=True
-    )
-    (st.plotly_chart if backend_choice == "Plotly" else st.pyplot)(fig_ev, use_container_width=True)
+performance_panel()
@@ -1,12 +1,19 @@
 # pages/04_Sankey_Diagram.py
-import os, sys, tempfile, streamlit as st
+import os, sys, streamlit as st
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 SRC = os.path.join(ROOT, "src")
 if SRC not in sys.path:
     sys.path.insert(0, SRC)
 
-from rdd.visualization import Visualizer, PlotlyBackend  # noqa: E402
+from src.colours import colour_mapping, foodomics_colours, grayscale_colours  # noqa: E402
+from src.counts_version import counts_stamp  # noqa: E402
+from src.flows import get_flow_graph, sankey_figure  # noqa: E402
+from src.level_index import get_level_index  # noqa: E402
+from src.perf import performance_panel, session_perf_log  # noqa: E402
+
+PAGE = "Sankey Diagram"
+perf = session_perf_log()
 
 st.header("Sankey Diagram")
 
@@ -16,7 +23,7 @@ if "rdd" not in st.session_state:
     st.stop()
 
 rdd = st.session_state["rdd"]
-viz = Visualizer(PlotlyBackend())  # Sankey supported only in Plotly
+index = get_level_index(rdd)
 
 # ── guard: need at least 2 ontology levels for Sankey ─────────────────
 if rdd.levels < 2:
@@ -31,44 +38,18 @@ if rdd.levels < 2:
 # ── user controls ──────────────────────────────────────────────────────
 sample_choice = st.selectbox(
     "Filter by sample filename (optional)",
-    ["<all samples>"] + sorted(rdd.counts["filename"].unique()),
+    ["<all samples>"] + index.samples.tolist(),
 )
 
 max_level = st.number_input("Maximum hierarchy level", 1, rdd.levels, rdd.levels, step=1)
 
-
-def load_demo_file(filename):
-    import io
-
-    ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-    path = os.path.join(ROOT, "data", filename)
-    with open(path, "rb") as f:
-        file_obj = io.BytesIO(f.read())
-        file_obj.name = filename
-        return file_obj
-
-
-color_map_up = None
+# Colour mappings are parsed once (per file content / descriptor set) and
+# passed to the figure in memory.
+colours = None
 if st.session_state.get("use_demo"):
-    # Automatically use demo color map if in demo mode - clean it to 2 columns
-    try:
-        import pandas as pd
-        import io
-
-        demo_file = load_demo_file("sample_type_hierarchy.csv")
-        color_df = pd.read_csv(demo_file, sep=";")
-
-        # Keep only descriptor and color_code columns
-        if "descriptor" in color_df.columns and "color_code" in color_df.columns:
-            color_df = color_df[["descriptor", "color_code"]]
-
-        # Convert back to BytesIO
-        csv_str = color_df.to_csv(index=False, sep=";")
-        color_map_up = io.BytesIO(csv_str.encode())
-        color_map_up.name = "sample_type_hierarchy.csv"
-        st.info("Demo color map loaded automatically.")
-    except Exception as e:
-        st.warning(f"Demo color map not found: {e}")
+    # Automatically use the foodomics color map in demo mode
+    colours = foodomics_colours()
+    st.info("Demo color map loaded automatically.")
 else:
     color_option = st.radio(
         "Color mapping option",
@@ -77,99 +58,50 @@ else:
     )
 
     if color_option == "Use foodomics color mapping":
-        # Use the default foodomics color mapping - clean to 2 columns
         try:
-            import pandas as pd
-            import io
-
-            demo_file = load_demo_file("sample_type_hierarchy.csv")
-            color_df = pd.read_csv(demo_file, sep=";")
-
-            # Keep only descriptor and color_code columns
-            if "descriptor" in color_df.columns and "color_code" in color_df.columns:
-                color_df = color_df[["descriptor", "color_code"]]
-
-            # Convert back to BytesIO
-            csv_str = color_df.to_csv(index=False, sep=";")
-            color_map_up = io.BytesIO(csv_str.encode())
-            color_map_up.name = "sample_type_hierarchy.csv"
+            colours = foodomics_colours()
             st.info("✓ Using foodomics reference color mapping")
-        except Exception as e:
+        except (OSError, ValueError) as e:
             st.error(f"Could not load foodomics color mapping: {e}")
     elif color_option == "Upload custom file":
         color_map_up = st.file_uploader(
             "Colour-mapping file (CSV/TSV with 2 columns: descriptor and color_code)",
             type=("csv", "tsv", "txt"),
         )
+        if color_map_up is not None:
+            try:
+                colours = colour_mapping(color_map_up.getvalue())
+            except ValueError as e:  # also undecodable / unparsable files
+                st.error(f"Error reading color mapping file: {e}")
     else:
-        # Generate grayscale mapping automatically
-        import io
-        import pandas as pd
-
-        # Get all unique reference types from level 0
-        unique_types = rdd.counts[rdd.counts["level"] == 0]["reference_type"].unique()
-        n_types = len(unique_types)
-
-        # Generate grayscale colors
-        grayscale_colors = [
-            f"#{int(255 - (i * 200 / max(n_types-1, 1))):02x}" * 3 for i in range(n_types)
-        ]
-
-        # Create mapping dataframe
-        color_df = pd.DataFrame({"descriptor": unique_types, "color_code": grayscale_colors})
-
-        # Convert to BytesIO object (with header to match expected format)
-        csv_str = color_df.to_csv(index=False, sep=";", header=True)
-        color_map_up = io.BytesIO(csv_str.encode())
-        color_map_up.name = "grayscale_mapping.csv"
-        st.info(f"✓ Generated grayscale mapping for {n_types} reference types")
+        # One grey per node of the flow graph (every term at every level)
+        descriptors = get_flow_graph(rdd).nodes
+        colours = grayscale_colours(descriptors)
+        st.info(f"✓ Generated grayscale mapping for {len(descriptors)} ontology terms")
 
 dark_mode = st.checkbox("Dark mode")
 
 # ── draw button ────────────────────────────────────────────────────────
+# The flow graph is built once per count table; after the first draw the
+# diagram follows the sample / level controls without another click.
 if st.button("Draw Sankey"):
-    if not color_map_up:
+    st.session_state["sankey_counts"] = counts_stamp(rdd)
+
+if st.session_state.get("sankey_counts") == counts_stamp(rdd):
+    if colours is None:
         st.error("⚠️ Please select a color mapping option.")
         st.stop()
 
-    # Read uploaded file and convert to semicolon-separated format for backend
-    import pandas as pd
-    import io
-
-    try:
-        # Try to read with common separators
-        color_map_up.seek(0)
-        content = color_map_up.read().decode("utf-8")
-
-        # Detect separator and read
-        if ";" in content.split("\n")[0]:
-            sep = ";"
-        elif "\t" in content.split("\n")[0]:
-            sep = "\t"
-        else:
-            sep = ","
-
-        color_map_up.seek(0)
-        color_df = pd.read_csv(color_map_up, sep=sep)
-
-        # Ensure we have the expected columns
-        if len(color_df.columns) >= 2:
-            color_df = color_df.iloc[:, :2]  # Take first two columns
-            color_df.columns = ["descriptor", "color_code"]
-
-        # Save as semicolon-separated for backend
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".csv", mode="w") as tmp:
-            color_df.to_csv(tmp, sep=";", index=False)
-            colour_path = tmp.name
-    except Exception as e:
-        st.error(f"Error reading color mapping file: {e}")
+    with st.spinner("Building the flow graph…"), perf.stage(PAGE, "flow graph"):
+        graph = get_flow_graph(rdd)
+    sample = None if sample_choice == "<all samples>" else sample_choice
+    if sample is not None and sample not in graph.samples:
+        st.warning(f"No reference matches for {sample}.")
         st.stop()
+    with perf.stage(PAGE, "Sankey render"):
+        fig = sankey_figure(
+            graph.flows(sample, max_level=int(max_level)), colours=colours, dark_mode=dark_mode
+        )
+        st.plotly_chart(fig, use_container_width=True)
 
-    fig = viz.plot_sankey(
-        rdd,
-        color_mapping_file=colour_path,
-        max_hierarchy_level=max_level or None,
-        filename_filter=None if sample_choice == "<all samples>" else sample_choice,
-        dark_mode=dark_mode,
-    )
-    st.plotly_chart(fig, use_container_width=True)
+performance_panel()
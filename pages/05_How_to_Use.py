@@ -77,6 +77,9 @@ Reference Data-Driven (RDD) metabolomics matches your experimental spectra again
 4. **Sankey Diagram**  
    Provide a colour map (`descriptor;color_code`) and explore hierarchical flows.
 
+5. **Batch Mode**  
+   Upload several network files and/or list task IDs to build them concurrently into one table with a `batch_id` column.
+
 ---
 
 **Tips:**
@@ -0,0 +1,203 @@
+# pages/06_Batch_Mode.py
+import os, sys
+import io
+from functools import partial
+import streamlit as st
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from src.batch import (  # noqa: E402
+    BatchEntry,
+    build_counts,
+    combine_counts,
+    entry_request,
+    share_reference,
+)
+from src.build import BuildRequest  # noqa: E402
+from src.resources import job_queue, reference_store_dir, task_cache  # noqa: E402
+from src.state_helpers import spill_directory  # noqa: E402
+
+
+def _parse_task_lines(text):
+    """'task_id[,GNPS1|GNPS2]' per line → batch entries."""
+    entries = []
+    for line in text.splitlines():
+        parts = [p.strip() for p in line.split(",")]
+        if not parts[0]:
+            continue
+        version = parts[1].upper() if len(parts) > 1 and parts[1] else "GNPS2"
+        entries.append(
+            BatchEntry(batch_id=parts[0], task_id=parts[0], gnps2=not version.startswith("GNPS1"))
+        )
+    return entries
+
+
+def _parquet_bytes(counts):
+    buf = io.BytesIO()
+    counts.to_parquet(buf, compression="zstd", index=False)
+    return buf.getvalue()
+
+
+def _collect(queue, job_id):
+    """Result of a finished job, or the error string of a failed / lost one."""
+    if job_id not in queue:  # server restarted or job discarded
+        return None, "Job was dropped before it finished"
+    try:
+        return queue.result(job_id), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+@st.fragment(run_every=1.0)
+def _batch_progress():
+    """
+    Poll this session's batch on the shared job queue until every job has finished.
+
+    At most one job per queue worker is in flight, so a large batch neither
+    crowds out other sessions' builds nor leaves more finished results waiting
+    than the queue keeps.
+    """
+    batch = st.session_state.get("batch_job")
+    if batch is None:
+        return
+    queue = job_queue()
+
+    if batch["prepare"] is not None:  # shared reference store first, then the jobs
+        job_id = batch["prepare"]
+        if job_id in queue and not queue.status(job_id).finished:
+            st.progress(0.0, text="⏳ Compiling the shared reference metadata")
+            return
+        template, error = _collect(queue, job_id)
+        if error:
+            del st.session_state["batch_job"]
+            st.error(f"❌ Reference metadata: {error}")
+            return
+        batch["prepare"], batch["template"] = None, template
+
+    for batch_id, job_id in list(batch["running"].items()):
+        if job_id in queue and not queue.status(job_id).finished:
+            continue
+        counts, error = _collect(queue, job_id)
+        if error:
+            batch["errors"][batch_id] = error
+        else:
+            batch["frames"][batch_id] = counts
+        del batch["running"][batch_id]
+    while batch["pending"] and len(batch["running"]) < queue.max_workers:
+        entry = batch["pending"].pop(0)
+        request = entry_request(entry, batch["template"])
+        batch["running"][entry.batch_id] = queue.submit(build_counts, request)
+
+    n_total = len(batch["entries"])
+    n_done = len(batch["frames"]) + len(batch["errors"])
+    if n_done < n_total:
+        st.progress(n_done / n_total, text=f"⏳ {n_done}/{n_total} jobs finished")
+        return
+    del st.session_state["batch_job"]
+    st.session_state["batch_result"] = combine_counts(
+        batch["entries"], batch["frames"], batch["errors"]
+    )
+    st.rerun()
+
+
+st.header("Batch Mode")
+st.caption(
+    "Build RDD count tables for many GNPS networks or tasks at once. Jobs run in the background "
+    "on the server's shared build workers and share the reference metadata; the result is one "
+    "combined table with a `batch_id` column. "
+    "For scripted runs use `python -m src.batch manifest.csv -o combined.parquet`."
+)
+
+# -------- inputs --------
+network_ups = st.file_uploader(
+    "GNPS network files (one job per file)",
+    type=("csv", "tsv", "txt"),
+    accept_multiple_files=True,
+)
+task_text = st.text_area(
+    "GNPS task IDs (one per line, optionally `,GNPS1`)",
+    placeholder="b93a540abded417ab1e2a285544a148c\n0123456789abcdef0123456789abcdef,GNPS1",
+)
+sample_meta_up = st.file_uploader(
+    "Sample metadata shared by every job (optional)", type=("csv", "tsv", "txt")
+)
+ref_meta_up = st.file_uploader(
+    "Reference metadata shared by every job (uses preloaded foodomics data if not provided)",
+    type=("csv", "tsv", "txt"),
+)
+
+col1, col2 = st.columns(2)
+with col1:
+    sample_type = st.selectbox("Reference sample type", ("all", "simple", "complex"))
+with col2:
+    levels_val = st.number_input("Maximum ontology levels", 0, 10, None, 1)
+sample_group_col = st.text_input("Sample group column", "group")
+
+# -------- run --------
+if st.button("Run batch", disabled="batch_job" in st.session_state):
+    spills = spill_directory()
+    entries = []
+    for up in network_ups or []:
+        spilled = spills.spill(up)
+        entries.append(BatchEntry(batch_id=os.path.splitext(up.name)[0], network=spilled.path))
+    entries += _parse_task_lines(task_text)
+
+    batch_ids = [e.batch_id for e in entries]
+    if not entries:
+        st.error("Add at least one network file or task ID.")
+        st.stop()
+    if len(set(batch_ids)) != len(batch_ids):
+        st.error("Every network file / task ID must be unique.")
+        st.stop()
+
+    template = BuildRequest(
+        sample_types=sample_type,
+        sample_group_col=sample_group_col,
+        levels=levels_val,
+        external_sample_metadata=spills.spill(sample_meta_up).path if sample_meta_up else None,
+        external_reference_metadata=spills.spill(ref_meta_up).path if ref_meta_up else None,
+        task_cache=task_cache(),
+        reference_store=reference_store_dir(),
+    )
+
+    # Jobs run on the shared queue; progress is polled below across reruns
+    st.session_state.pop("batch_result", None)
+    st.session_state["batch_job"] = {
+        "prepare": job_queue().submit(share_reference, template),
+        "template": None,
+        "entries": entries,
+        "pending": list(entries),
+        "running": {},
+        "frames": {},
+        "errors": {},
+    }
+
+if "batch_job" in st.session_state:
+    _batch_progress()
+
+# -------- results (persist across reruns) --------
+result = st.session_state.get("batch_result")
+if result is not None:
+    n_ok = result.counts["batch_id"].nunique()
+    st.success(f"✅ {n_ok} jobs finished, {len(result.counts):,} rows in the combined table.")
+    for batch_id, error in result.errors.items():
+        st.error(f"❌ {batch_id}: {error}")
+
+    if len(result.counts):
+        st.dataframe(result.counts.head(100))
+        # Serialised only when a download button is clicked
+        st.download_button(
+            "📥 Download combined counts (Parquet)",
+            data=partial(_parquet_bytes, result.counts),
+            file_name="rdd_counts_batch.parquet",
+            mime="application/octet-stream",
+        )
+        st.download_button(
+            "📥 Download combined counts (CSV)",
+            data=partial(result.counts.to_csv, index=False),
+            file_name="rdd_counts_batch.csv",
+            mime="text/csv",
+        )
@@ -0,0 +1,334 @@
+"""
+Batch mode: build RDD count tables for many GNPS networks / tasks at once.
+
+A *manifest* lists one job per row:
+
+    batch_id,network,task_id,gnps_version,sample_metadata
+    study_a,networks/a.tsv,,,
+    study_b,,b93a540abded417ab1e2a285544a148c,GNPS2,meta/b.csv
+
+``network`` (a file, relative to the manifest) or ``task_id`` is required;
+``batch_id`` defaults to the file stem / task id, ``gnps_version`` to GNPS2.
+Every job shares the reference metadata and the build options.
+
+Jobs run concurrently in a process pool: the app's shared
+:class:`src.jobs.JobQueue`, or a private pool bounded by ``max_workers`` for
+:func:`run_batch` on the command line.  With ``RDD_REFERENCE_STORE=1`` (or
+``--reference-store``) the reference metadata is compiled once, before the
+jobs start (:func:`share_reference`), into a reference store (see
+:mod:`src.reference_store`) that every worker memory-maps instead of
+re-parsing the file per job.  Results are combined into one long counts
+table with a leading ``batch_id`` column.
+
+Command line (from the repository root)::
+
+    python -m src.batch manifest.csv -o combined.parquet --workers 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import IO, Callable, Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+
+from src.build import BuildRequest, ProgressCallback, build_rdd
+from src.ingest import sep_for
+from src.rdd_cache import user_cache_directory
+from src.reference_store import ensure_reference_store, reference_store_root
+from src.task_cache import TaskCache
+
+
+@dataclass(frozen=True)
+class BatchEntry:
+    """One manifest row."""
+
+    batch_id: str
+    network: Optional[str] = None
+    task_id: Optional[str] = None
+    gnps2: bool = True
+    sample_metadata: Optional[str] = None
+
+
+@dataclass
+class BatchResult:
+    """Combined counts of the successful jobs plus the error of each failed one."""
+
+    counts: pd.DataFrame
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+def _cell(row: pd.Series, column: str) -> Optional[str]:
+    value = row.get(column)
+    if value is None or pd.isna(value) or not str(value).strip():
+        return None
+    return str(value).strip()
+
+
+def read_manifest(
+    source: Union[str, os.PathLike, IO], base_dir: Optional[str] = None
+) -> List[BatchEntry]:
+    """
+    Parse a manifest (CSV/TSV) into batch entries.
+
+    Parameters
+    ----------
+    source : path or file-like
+        Manifest table.
+    base_dir : str, optional
+        Directory relative paths are resolved against; defaults to the
+        manifest's directory (or the working directory for file objects).
+
+    Raises
+    ------
+    ValueError
+        If a row has neither or both of ``network`` / ``task_id``, or if two
+        rows share a ``batch_id``.
+    """
+    name = getattr(source, "name", str(source))
+    if base_dir is None:
+        base_dir = (
+            os.path.dirname(os.path.abspath(name))
+            if isinstance(source, (str, os.PathLike))
+            else os.getcwd()
+        )
+    manifest = pd.read_csv(source, sep=sep_for(name), dtype=str)
+
+    entries = []
+    for i, row in manifest.iterrows():
+        network, task_id = _cell(row, "network"), _cell(row, "task_id")
+        if bool(network) == bool(task_id):
+            raise ValueError(f"Manifest row {i + 1}: give exactly one of 'network' or 'task_id'")
+        if network:
+            network = os.path.join(base_dir, network)
+        sample_metadata = _cell(row, "sample_metadata")
+        if sample_metadata:
+            sample_metadata = os.path.join(base_dir, sample_metadata)
+        version = (_cell(row, "gnps_version") or "GNPS2").upper()
+        entries.append(
+            BatchEntry(
+                batch_id=_cell(row, "batch_id") or task_id or Path(network).stem,
+                network=network,
+                task_id=task_id,
+                gnps2=not version.startswith("GNPS1"),
+                sample_metadata=sample_metadata,
+            )
+        )
+
+    seen = set()
+    duplicates = {e.batch_id for e in entries if e.batch_id in seen or seen.add(e.batch_id)}
+    if duplicates:
+        raise ValueError(f"Duplicate batch_id in manifest: {', '.join(sorted(duplicates))}")
+    return entries
+
+
+def entry_request(entry: BatchEntry, template: BuildRequest) -> BuildRequest:
+    """The BuildRequest of `entry`: shared options from `template`, inputs from the entry."""
+    return replace(
+        template,
+        gnps_network_path=entry.network,
+        task_id=entry.task_id,
+        gnps_2=entry.gnps2,
+        external_sample_metadata=entry.sample_metadata or template.external_sample_metadata,
+    )
+
+
+# ────────────────────── worker side ──────────────────────
+def build_counts(
+    request: BuildRequest, progress: Optional[ProgressCallback] = None
+) -> pd.DataFrame:
+    """Build one job and return its counts table (the object itself stays in the worker)."""
+    return build_rdd(request, progress).counts
+
+
+def share_reference(
+    template: BuildRequest,
+    directory: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> BuildRequest:
+    """
+    Compile the reference store every job of a batch memory-maps.
+
+    Run once before the jobs are submitted, so they do not each compile it.
+
+    Parameters
+    ----------
+    template : BuildRequest
+        Shared build options (see :func:`run_batch`).
+    directory : str, optional
+        Store root; defaults to ``template.reference_store``.
+    progress : callable, optional
+        ``progress(stage, fraction, message)``, as passed by :class:`src.jobs.JobQueue`.
+
+    Returns
+    -------
+    BuildRequest
+        `template` pointing at the store, or at none if there is no store root
+        or the library lacks the metadata loader (every job then parses it).
+    """
+    directory = directory or template.reference_store
+    if not directory:
+        return template
+    if progress is not None:
+        progress("reference", 0.5, "Compiling the shared reference metadata")
+    try:
+        ensure_reference_store(directory, template.external_reference_metadata)
+    except ImportError:
+        directory = None
+    return replace(template, reference_store=directory)
+
+
+# ────────────────────── driver ──────────────────────
+def combine_counts(
+    entries: Sequence[BatchEntry], frames: Dict[str, pd.DataFrame], errors: Dict[str, str]
+) -> BatchResult:
+    """
+    Combine the counts of finished jobs, in manifest order, under a ``batch_id`` column.
+
+    `frames` maps the batch id of each successful job to its counts; failed
+    jobs are listed in `errors`.
+    """
+    ordered = [(e.batch_id, frames[e.batch_id]) for e in entries if e.batch_id in frames]
+    if ordered:
+        counts = pd.concat(
+            [frame.assign(batch_id=batch_id) for batch_id, frame in ordered], ignore_index=True
+        )
+        counts["batch_id"] = pd.Categorical(counts["batch_id"], [b for b, _ in ordered])
+        counts = counts[["batch_id"] + [c for c in counts.columns if c != "batch_id"]]
+    else:
+        counts = pd.DataFrame(columns=["batch_id"])
+    return BatchResult(counts, dict(errors))
+
+
+def run_batch(
+    entries: Sequence[BatchEntry],
+    template: BuildRequest,
+    max_workers: Optional[int] = None,
+    on_done: Optional[Callable[[str, Optional[str], int, int], None]] = None,
+    start_method: str = "spawn",
+    build: Callable[[BuildRequest], pd.DataFrame] = build_counts,
+) -> BatchResult:
+    """
+    Build every entry concurrently in a private process pool and combine the counts.
+
+    Used by the command line; the app submits the same jobs to its shared
+    :class:`src.jobs.JobQueue` instead.
+
+    Parameters
+    ----------
+    entries : sequence of BatchEntry
+        Jobs to run (see :func:`read_manifest`).
+    template : BuildRequest
+        Options shared by every job (reference metadata, levels, groups, …).
+        Its network / task fields are ignored and its sample metadata is the
+        default for entries without their own.  With a ``reference_store`` root
+        the store is compiled once before the jobs start.
+    max_workers : int, optional
+        Concurrent builds; defaults to the number of CPUs.
+    on_done : callable, optional
+        Called as ``on_done(batch_id, error_or_None, n_done, n_total)`` in the
+        calling thread as each job finishes.
+    start_method : str
+        Multiprocessing start method of the pool.
+    build : callable
+        ``build(request) -> counts`` run in the workers; must be a picklable
+        module-level function.
+
+    Returns
+    -------
+    BatchResult
+        ``counts`` has a ``batch_id`` column first; failed jobs are listed in
+        ``errors`` instead of aborting the batch.
+    """
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(entries) or 1))
+    frames, errors = {}, {}
+    template = share_reference(template)
+    ctx = multiprocessing.get_context(start_method)
+    with ProcessPoolExecutor(max_workers, mp_context=ctx) as pool:
+        futures = {
+            pool.submit(build, entry_request(entry, template)): entry.batch_id for entry in entries
+        }
+        for n_done, future in enumerate(as_completed(futures), start=1):
+            batch_id = futures[future]
+            try:
+                frames[batch_id] = future.result()
+                error = None
+            except Exception as e:
+                error = errors[batch_id] = f"{type(e).__name__}: {e}"
+            if on_done is not None:
+                on_done(batch_id, error, n_done, len(futures))
+    return combine_counts(entries, frames, errors)
+
+
+def write_counts(counts: pd.DataFrame, target: Union[str, os.PathLike]) -> None:
+    """Write the combined table as Parquet (``.parquet``) or CSV/TSV."""
+    target = str(target)
+    if target.endswith(".parquet"):
+        counts.to_parquet(target, compression="zstd", index=False)
+    else:
+        counts.to_csv(target, sep=sep_for(target), index=False)
+
+
+# ────────────────────── command line ──────────────────────
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.batch", description="Build RDD count tables for many GNPS jobs."
+    )
+    parser.add_argument("manifest", help="CSV/TSV with batch_id, network or task_id, ...")
+    parser.add_argument("-o", "--output", required=True, help=".parquet, .csv or .tsv")
+    parser.add_argument("--reference-metadata", help="shared reference metadata file")
+    parser.add_argument("--sample-metadata", help="default sample metadata for every job")
+    parser.add_argument("--sample-types", default="all")
+    parser.add_argument("--sample-group-col", default="group")
+    parser.add_argument("--sample-groups", nargs="*")
+    parser.add_argument("--reference-groups", nargs="*")
+    parser.add_argument("--levels", type=int)
+    parser.add_argument("--ontology-columns", nargs="*")
+    parser.add_argument("--workers", type=int, help="concurrent builds (default: CPUs)")
+    parser.add_argument(
+        "--task-cache",
+        default=user_cache_directory("gnps_task_cache"),
+        help="GNPS task cache directory (RDD_GNPS_OFFLINE=1 serves only from it)",
+    )
+    parser.add_argument(
+        "--reference-store",
+        default=reference_store_root(),
+        help="compiled reference metadata store directory, reused across runs "
+        "(default: none, or the user's store with RDD_REFERENCE_STORE=1)",
+    )
+    args = parser.parse_args(argv)
+
+    template = BuildRequest(
+        sample_types=args.sample_types,
+        sample_groups=tuple(args.sample_groups) if args.sample_groups else None,
+        sample_group_col=args.sample_group_col,
+        levels=args.levels,
+        external_reference_metadata=args.reference_metadata,
+        external_sample_metadata=args.sample_metadata,
+        ontology_columns=tuple(args.ontology_columns) if args.ontology_columns else None,
+        reference_groups=tuple(args.reference_groups) if args.reference_groups else None,
+        task_cache=TaskCache.from_env(args.task_cache),
+        reference_store=args.reference_store,
+    )
+    entries = read_manifest(args.manifest)
+
+    def report(batch_id, error, n_done, n_total):
+        status = f"failed: {error}" if error else "ok"
+        print(f"[{n_done}/{n_total}] {batch_id}: {status}", file=sys.stderr)
+
+    result = run_batch(entries, template, max_workers=args.workers, on_done=report)
+    write_counts(result.counts, args.output)
+    print(
+        f"{len(entries) - len(result.errors)}/{len(entries)} jobs, "
+        f"{len(result.counts)} rows written to {args.output}",
+        file=sys.stderr,
+    )
+    return 1 if result.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+RDDCounts build requests, runnable in the page thread or a worker process.
+
+A :class:`BuildRequest` is a plain, picklable description of one "Generate
+RDD Counts" click.  :func:`build_rdd` turns it into an RDDCounts object and
+reports its stage through an optional ``progress(stage, fraction, message)``
+callable, so it can run inside :class:`src.jobs.JobQueue` workers.
+"""
+
+import os
+import tempfile
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, List, Optional, Tuple
+
+import pandas as pd
+
+from src.counts_version import counts_changed
+from src.level_counts import aggregate_levels, resolve_ontology_columns, strip_extension
+from src.matching import match
+from src.network import project_network, read_membership
+from src.perf import PerfLog, StageTiming
+from src.reference_store import ensure_reference_store, serve_reference_store
+from src.task_cache import TaskCache, serve_tasks_from
+
+ProgressCallback = Callable[..., None]
+
+# Stages reported by build_rdd, in order.  RDDCounts construction itself is
+# opaque, so it is reported as a single "fetch" (task id) or "parse" (file)
+# stage covering fetching, parsing and matching.  "aggregate" only appears
+# when levels are aggregated (``aggregator="app"``) or matched (``matcher="app"``)
+# in-house.
+STAGES = ("queued", "fetch", "parse", "aggregate", "done")
+MATCHERS = AGGREGATORS = ("rdd", "app")
+
+
+@dataclass(frozen=True)
+class BuildRequest:
+    """Arguments of one RDDCounts construction (hashable and picklable)."""
+
+    gnps_network_path: Optional[str] = None
+    task_id: Optional[str] = None
+    gnps_2: bool = True
+    sample_types: str = "all"
+    sample_groups: Optional[Tuple[str, ...]] = None
+    sample_group_col: str = "group"
+    levels: Optional[int] = None
+    external_reference_metadata: Optional[str] = None
+    external_sample_metadata: Optional[str] = None
+    ontology_columns: Optional[Tuple[str, ...]] = None
+    reference_groups: Optional[Tuple[str, ...]] = None
+    # "app" counts levels 1..N with the vectorised src.level_counts.aggregate_levels
+    # instead of the library's per-level loop.  Does not change the result, so it
+    # is not part of the cache key
+    aggregator: str = "rdd"
+    # On-disk GNPS task cache used for task-id builds (not part of the cache key)
+    task_cache: Optional[TaskCache] = None
+    # Root of the compiled reference metadata stores; None (the default) lets
+    # RDDCounts parse the file per build.  Opt-in, checked against the library
+    # like project_network
+    reference_store: Optional[str] = None
+    # Hand RDDCounts a streamed copy of the network file holding only the columns
+    # RDD counting reads (not part of the cache key).  Opt-in: it adds a parse and
+    # write pass and is only checked against the library when rdd is installed
+    # (tests/test_library_equivalence.py)
+    project_network: bool = False
+    # "app" matches samples to references with src.matching (network-file builds):
+    # RDDCounts only reads the network's sample rows and produces no counts, the
+    # integer-encoded match produces levels 0..N (not part of the cache key).
+    # Opt-in, checked against the library like project_network
+    matcher: str = "rdd"
+
+    def rdd_kwargs(self) -> dict:
+        """Keyword arguments for the RDDCounts constructor."""
+        kwargs = asdict(self)
+        for key in ("aggregator", "task_cache", "reference_store", "project_network", "matcher"):
+            del kwargs[key]
+        for key in ("sample_groups", "ontology_columns", "reference_groups"):
+            kwargs[key] = list(kwargs[key]) if kwargs[key] else None
+        if self.task_id:
+            del kwargs["gnps_network_path"]
+        else:
+            del kwargs["task_id"], kwargs["gnps_2"]
+        return kwargs
+
+
+def _noop(*args: Any, **kwargs: Any) -> None:
+    pass
+
+
+def build_rdd(request: BuildRequest, progress: Optional[ProgressCallback] = None) -> Any:
+    """
+    Build an RDDCounts object for `request`.
+
+    Parameters
+    ----------
+    request : BuildRequest
+        What to build.
+    progress : callable, optional
+        Called as ``progress(stage, fraction, message)`` at stage boundaries.
+
+    Returns
+    -------
+    RDDCounts
+        With the timings of the build's stages (:class:`src.perf.StageTiming`)
+        in ``build_timings``; :func:`pop_build_timings` takes them off again.
+    """
+    from rdd import RDDCounts
+
+    progress = progress or _noop
+    if request.task_id:
+        progress("fetch", 0.1, f"Fetching GNPS task {request.task_id}")
+    else:
+        progress("parse", 0.1, "Parsing network and metadata")
+
+    if request.matcher not in MATCHERS:
+        raise ValueError(f"matcher must be one of {MATCHERS}, got {request.matcher!r}")
+    if request.aggregator not in AGGREGATORS:
+        raise ValueError(f"aggregator must be one of {AGGREGATORS}, got {request.aggregator!r}")
+    in_house = request.matcher == "app" and not request.task_id
+    aggregate = request.aggregator == "app" and request.levels != 0 and not in_house
+    kwargs = request.rdd_kwargs()
+    if aggregate or in_house:
+        kwargs["levels"] = 0  # file-level counts only; levels 1..N follow below
+
+    def on_fetch(transfer: Any) -> None:
+        fraction = 0.1 + 0.3 * (transfer.fraction or 0.0)
+        progress("fetch", fraction, f"Downloading GNPS task: {transfer.describe()}")
+
+    perf = PerfLog()
+    store = None
+    with ExitStack() as serving:
+        if request.task_id and request.task_cache is not None:
+            serving.enter_context(serve_tasks_from(request.task_cache, progress=on_fetch))
+        if request.reference_store:
+            with perf.stage("build", "reference store"):
+                store = ensure_reference_store(
+                    request.reference_store, request.external_reference_metadata
+                )
+            serving.enter_context(
+                serve_reference_store(
+                    store, request.sample_types, request.external_reference_metadata
+                )
+            )
+        if in_house:
+            with perf.stage("build", "sample network"):
+                references = _reference_files(request, store)
+                kwargs["gnps_network_path"] = _sample_network(
+                    request.gnps_network_path, references, serving
+                )
+        elif request.project_network and not request.task_id:
+            with perf.stage("build", "project network"):
+                kwargs["gnps_network_path"] = _projected_network(request.gnps_network_path, serving)
+        # fetching / parsing, reference filtering and matching are one library call
+        with perf.stage("build", "fetch + RDDCounts" if request.task_id else "parse + RDDCounts"):
+            rdd = RDDCounts(**kwargs)
+
+    if in_house:
+        with perf.stage("build", "match"):
+            _match_in_house(rdd, request, progress)
+    elif aggregate:
+        with perf.stage("build", "aggregate levels"):
+            _aggregate_in_house(rdd, request, progress)
+    rdd.build_timings = perf.records()
+    progress("done", 1.0, "RDD counts ready")
+    return rdd
+
+
+def _projected_network(path: str, stack: ExitStack) -> str:
+    """
+    Slim copy of the network at `path` in a temp dir that lives as long as `stack`.
+
+    Falls back to `path` itself if its columns are not recognised or not
+    parseable; RDDCounts then reads (and reports on) the original file.
+    """
+    scratch = stack.enter_context(tempfile.TemporaryDirectory(prefix="gnps_rdd_network_"))
+    try:
+        return project_network(path, os.path.join(scratch, "network.tsv"))
+    except ValueError:
+        return path
+
+
+def _reference_files(request: BuildRequest, store: Any) -> pd.Series:
+    """File names of every reference (all sample types) the build reads."""
+    if store is not None:
+        return store.frame("all")["filename"]
+    from rdd.utils import _load_RDD_metadata
+
+    return _load_RDD_metadata(request.external_reference_metadata)["filename"]
+
+
+def _sample_network(path: str, references: pd.Series, stack: ExitStack) -> str:
+    """Slim copy of the network at `path` without the rows of the `references`."""
+    scratch = stack.enter_context(tempfile.TemporaryDirectory(prefix="gnps_rdd_network_"))
+    return project_network(path, os.path.join(scratch, "network.tsv"), exclude=references)
+
+
+def pop_build_timings(rdd: Any) -> List[StageTiming]:
+    """Remove and return the stage timings :func:`build_rdd` left on `rdd`."""
+    return rdd.__dict__.pop("build_timings", [])
+
+
+def _resolve_columns(rdd: Any, request: BuildRequest, fallback: str) -> List[str]:
+    columns = resolve_ontology_columns(
+        rdd.reference_metadata,
+        levels=request.levels,
+        custom=request.ontology_columns,
+        renamed=getattr(rdd, "ontology_columns_renamed", None),
+    )
+    if not columns:
+        raise ValueError(
+            "Could not find the ontology columns in the reference metadata; "
+            f"{fallback} to let RDDCounts resolve them."
+        )
+    return columns
+
+
+def _match_in_house(rdd: Any, request: BuildRequest, progress: ProgressCallback) -> None:
+    """
+    Fill the counts of `rdd`, built on the sample rows only, with :func:`match`.
+
+    Samples and references are the ones RDDCounts kept (its sample and
+    sample-type filters); groups come from its sample metadata.
+    """
+    columns = _resolve_columns(rdd, request, 'use matcher="rdd"') if request.levels != 0 else []
+    progress("aggregate", 0.5, "Matching samples to references")
+    samples = rdd.sample_metadata.assign(filename=strip_extension(rdd.sample_metadata["filename"]))
+    groups = samples.drop_duplicates("filename").set_index("filename")["group"]
+    matched = match(
+        read_membership(request.gnps_network_path),
+        rdd.reference_metadata["filename"],
+        sample_files=samples["filename"],
+    )
+    progress("aggregate", 0.75, f"Counting {len(columns)} ontology levels")
+    rdd.counts = pd.concat(
+        [
+            matched.file_counts(groups),
+            matched.level_counts(rdd.reference_metadata, columns, groups),
+        ],
+        ignore_index=True,
+    )
+    counts_changed(rdd)
+    rdd.levels = len(columns)
+
+
+def _aggregate_in_house(rdd: Any, request: BuildRequest, progress: ProgressCallback) -> None:
+    """Replace the library's per-level loop with :func:`aggregate_levels`."""
+    columns = _resolve_columns(rdd, request, 'use aggregator="rdd"')
+    file_counts = rdd.counts[rdd.counts["level"] == 0]
+    progress("aggregate", 0.5, f"Aggregating {len(columns)} ontology levels")
+    upper = aggregate_levels(file_counts, rdd.reference_metadata, columns)
+    rdd.counts = pd.concat([file_counts, upper], ignore_index=True)
+    counts_changed(rdd)
+    rdd.levels = len(columns)
@@ -0,0 +1,108 @@
+"""
+Colour mappings for the Sankey page, parsed once and kept in memory.
+
+A colour-mapping file lists ``descriptor`` (``<term>_<level>``, the Sankey
+node names) and ``color_code`` columns, separated by ``;``, tab or ``,``.
+:func:`colour_mapping` parses and validates the bytes of such a file once
+per content hash; the bundled foodomics mapping and the grayscale mapping of
+a set of descriptors are cached the same way.  Every mapping is returned as
+a read-only ``descriptor → colour`` dict that the Sankey figure consumes
+directly, so nothing is written to disk on the render path.
+"""
+
+import hashlib
+import io
+import os
+import re
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+FOODOMICS_MAPPING = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sample_type_hierarchy.csv"
+)
+# Hex codes and rgb()/rgba(); names are checked against the CSS colour names
+_COLOUR = re.compile(r"#(?:[0-9a-fA-F]{3}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})|rgba?\([\d\s.,%]+\)")
+# "#000000" … "#ffffff" by grey value, for vectorised lookups
+_GREYS = np.array([f"#{v:02x}{v:02x}{v:02x}" for v in range(256)])
+
+
+def _separator(header: str) -> str:
+    if ";" in header:
+        return ";"
+    return "\t" if "\t" in header else ","
+
+
+@lru_cache(maxsize=1)
+def _colour_names() -> frozenset:
+    """The 148 CSS colour names (``red``, ``steelblue``, …), as Plotly accepts them."""
+    from matplotlib.colors import CSS4_COLORS
+
+    return frozenset(CSS4_COLORS)
+
+
+def parse_colour_mapping(content: bytes) -> Mapping[str, str]:
+    """
+    Parse a colour-mapping file into a read-only ``descriptor → colour`` dict.
+
+    Uses the ``descriptor`` / ``color_code`` columns when present, otherwise
+    the first two columns.  Rows without a colour are skipped.
+
+    Raises
+    ------
+    ValueError
+        If the file has fewer than two columns or contains colour codes
+        that are not hex codes, ``rgb()`` / ``rgba()`` or CSS colour names.
+    """
+    text = content.decode("utf-8-sig")
+    table = pd.read_csv(io.StringIO(text), sep=_separator(text.partition("\n")[0]), dtype=str)
+    if {"descriptor", "color_code"}.issubset(table.columns):
+        table = table[["descriptor", "color_code"]]
+    elif len(table.columns) >= 2:
+        table = table.iloc[:, :2]
+    else:
+        raise ValueError("A colour mapping needs two columns: descriptor and color_code.")
+    table.columns = ["descriptor", "color_code"]
+    table = table.dropna()
+    colours = table["color_code"].str.strip()
+    valid = colours.str.fullmatch(_COLOUR) | colours.str.lower().isin(_colour_names())
+    invalid = table.loc[~valid, "color_code"]
+    if len(invalid):
+        shown = ", ".join(invalid.head(5))
+        raise ValueError(f"{len(invalid)} invalid colour code(s) in the mapping: {shown}")
+    return MappingProxyType(dict(zip(table["descriptor"].str.strip(), colours)))
+
+
+@lru_cache(maxsize=32)
+def _cached_mapping(digest: str, content: bytes) -> Mapping[str, str]:
+    return parse_colour_mapping(content)
+
+
+def colour_mapping(content: bytes) -> Mapping[str, str]:
+    """:func:`parse_colour_mapping`, cached per content hash."""
+    return _cached_mapping(hashlib.blake2b(content, digest_size=20).hexdigest(), content)
+
+
+@lru_cache(maxsize=1)
+def foodomics_colours() -> Mapping[str, str]:
+    """The bundled foodomics colour mapping (``data/sample_type_hierarchy.csv``), read once."""
+    with open(FOODOMICS_MAPPING, "rb") as fh:
+        return colour_mapping(fh.read())
+
+
+@lru_cache(maxsize=16)
+def _grayscale(descriptors: tuple) -> Mapping[str, str]:
+    values = np.linspace(255, 55, len(descriptors)).astype(np.intp)
+    return MappingProxyType(dict(zip(descriptors, _GREYS[values].tolist())))
+
+
+def grayscale_colours(descriptors: Sequence[str]) -> Mapping[str, str]:
+    """
+    Grey levels from white to dark grey over `descriptors`, in order.
+
+    Cached per descriptor set (and order).
+    """
+    return _grayscale(tuple(descriptors))
@@ -0,0 +1,238 @@
+"""
+Reusable row filters over the long-format ``rdd.counts`` table.
+
+``RDDCounts.filter_counts`` and the pages select rows of the counts table by
+ontology level, reference type, group and sample with fresh string
+comparisons over the whole table on every rerun.  Here the table is
+integer-coded once (:class:`CountCodes`, cached on the RDDCounts object like
+the level index) and a selection is a :class:`CountFilter`: an immutable,
+hashable combination of the four selectors.  Every selector becomes a row
+mask (a lookup-table ``isin`` on int codes) that is cached on its own, so
+changing one selector re-evaluates only that mask and the rest is a cheap AND.
+
+Group masks are evaluated per sample on the :class:`src.groups.GroupAssignment`
+codes and follow relabelling without rebuilding the codes.
+
+:func:`with_cached_filters` hands the library's plotting routines an RDDCounts
+whose own ``filter_counts`` calls go through these masks.
+
+Selections are returned as views where pandas allows it: the table itself
+when nothing is filtered, a row slice when the selected rows are contiguous
+(e.g. one level of a table stored level by level); other selections copy.
+"""
+
+import copy
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.counts_version import CountsStamp, counts_version
+from src.groups import GroupAssignment, get_group_assignment
+
+# Row masks kept per counts table (one byte per row each), least recently used
+# dropped first
+MAX_MASKS = 8
+
+
+class CountCodes:
+    """
+    Integer codes of one counts table, with a cache of per-selector row masks.
+
+    Parameters
+    ----------
+    counts : pd.DataFrame
+        Long table with ``filename``, ``reference_type`` and ``level`` columns.
+    assignment : GroupAssignment, optional
+        Sample → group lookup of `counts`; built from its ``group`` column
+        by default.
+    version : int
+        :func:`src.counts_version.counts_version` of the table.
+    """
+
+    def __init__(
+        self,
+        counts: pd.DataFrame,
+        assignment: Optional[GroupAssignment] = None,
+        version: int = 0,
+    ) -> None:
+        self._stamp = CountsStamp(counts, version)
+        self.assignment = GroupAssignment(counts, version) if assignment is None else assignment
+        self.levels = counts["level"].to_numpy()
+        type_codes, types = pd.factorize(counts["reference_type"])
+        self.type_codes = type_codes.astype(np.int32)
+        self.types = pd.Index(types)
+        self._masks: "OrderedDict[Tuple[str, Any], Tuple[Any, np.ndarray]]" = OrderedDict()
+
+    def matches(self, counts: pd.DataFrame, version: int = 0) -> bool:
+        """True if these codes were built from `counts` at `version`."""
+        return self._stamp.matches(counts, version)
+
+    def _cached(self, key: Tuple[str, Any], version: Any, evaluate: Callable) -> np.ndarray:
+        entry = self._masks.get(key)
+        if entry is None or entry[0] is not version:
+            mask = evaluate()
+            mask.flags.writeable = False
+            entry = self._masks[key] = (version, mask)
+            if len(self._masks) > MAX_MASKS:
+                self._masks.popitem(last=False)
+        self._masks.move_to_end(key)
+        return entry[1]
+
+    def level_mask(self, level: int) -> np.ndarray:
+        return self._cached(("level", level), None, lambda: self.levels == level)
+
+    def type_mask(self, reference_types: FrozenSet[str]) -> np.ndarray:
+        def evaluate():
+            wanted = self.types.get_indexer(list(reference_types))
+            return _isin(self.type_codes, wanted[wanted >= 0], len(self.types))
+
+        return self._cached(("reference_type", reference_types), None, evaluate)
+
+    def group_mask(self, groups: FrozenSet[str]) -> np.ndarray:
+        labels = self.assignment.labels  # replaced (not mutated) on relabelling
+
+        def evaluate():
+            wanted = np.flatnonzero(labels.categories.isin(list(groups)))
+            return _isin(labels.codes, wanted, len(labels.categories))[self.assignment.row_codes]
+
+        return self._cached(("group", groups), labels, evaluate)
+
+    def sample_mask(self, samples: FrozenSet[str]) -> np.ndarray:
+        def evaluate():
+            wanted = self.assignment.samples.get_indexer(list(samples))
+            return _isin(
+                self.assignment.row_codes, wanted[wanted >= 0], len(self.assignment.samples)
+            )
+
+        return self._cached(("sample", samples), None, evaluate)
+
+
+def _isin(codes: np.ndarray, wanted: np.ndarray, n_codes: int) -> np.ndarray:
+    """``np.isin(codes, wanted)`` for codes in ``[-1, n_codes)`` (-1: missing)."""
+    # codes are dense and small: gather from a lookup table instead of sorting
+    table = np.zeros(n_codes + 1, dtype=bool)
+    table[wanted] = True
+    return table[codes]
+
+
+def get_count_codes(rdd: Any) -> CountCodes:
+    """
+    Return the CountCodes of `rdd`, building them on first use.
+
+    Stored on the object (``rdd._count_codes``) and rebuilt only when
+    ``rdd.counts`` has been replaced or edited
+    (:func:`src.counts_version.counts_changed`).
+    """
+    codes = getattr(rdd, "_count_codes", None)
+    version = counts_version(rdd)
+    if codes is None or not codes.matches(rdd.counts, version):
+        codes = CountCodes(rdd.counts, get_group_assignment(rdd), version)
+        rdd._count_codes = codes
+    return codes
+
+
+def _selection(values: Optional[Iterable[str]]) -> Optional[FrozenSet[str]]:
+    if values is None or isinstance(values, str):
+        return None if values is None else frozenset([values])
+    values = frozenset(values)
+    return values or None  # blank = all, as in the pages' multiselects
+
+
+@dataclass(frozen=True)
+class CountFilter:
+    """
+    A selection of counts rows; ``None`` selectors keep everything.
+
+    Build it with :meth:`compile`, which normalises the selectors so equal
+    selections compare (and hash) equal whatever the order of their values.
+    """
+
+    level: Optional[int] = None
+    reference_types: Optional[FrozenSet[str]] = None
+    groups: Optional[FrozenSet[str]] = None
+    samples: Optional[FrozenSet[str]] = None
+
+    @classmethod
+    def compile(
+        cls,
+        level: Optional[int] = None,
+        reference_types: Optional[Iterable[str]] = None,
+        groups: Optional[Iterable[str]] = None,
+        samples: Optional[Iterable[str]] = None,
+    ) -> "CountFilter":
+        return cls(
+            None if level is None else int(level),
+            _selection(reference_types),
+            _selection(groups),
+            _selection(samples),
+        )
+
+    def masks(self, codes: CountCodes) -> List[np.ndarray]:
+        """The (cached, read-only) row mask of every active selector."""
+        masks = []
+        if self.level is not None:
+            masks.append(codes.level_mask(self.level))
+        if self.reference_types is not None:
+            masks.append(codes.type_mask(self.reference_types))
+        if self.groups is not None:
+            masks.append(codes.group_mask(self.groups))
+        if self.samples is not None:
+            masks.append(codes.sample_mask(self.samples))
+        return masks
+
+    def mask(self, codes: CountCodes) -> Optional[np.ndarray]:
+        """Row mask of the whole selection (None: every row)."""
+        masks = self.masks(codes)
+        if not masks:
+            return None
+        return masks[0] if len(masks) == 1 else np.logical_and.reduce(masks)
+
+    def apply(self, rdd: Any) -> pd.DataFrame:
+        """Selected rows of ``rdd.counts``."""
+        return select_rows(rdd.counts, self.mask(get_count_codes(rdd)))
+
+
+def select_rows(counts: pd.DataFrame, mask: Optional[np.ndarray]) -> pd.DataFrame:
+    """Rows of `counts` in `mask`; a slice (no copy) when they are contiguous."""
+    if mask is None:
+        return counts
+    rows = np.flatnonzero(mask)
+    if not len(rows):
+        return counts.iloc[:0]
+    if rows[-1] - rows[0] + 1 == len(rows):
+        return counts.iloc[rows[0] : rows[-1] + 1]
+    return counts.iloc[rows]
+
+
+def filter_counts(
+    rdd: Any,
+    reference_types: Optional[Iterable[str]] = None,
+    level: Optional[int] = None,
+    groups: Optional[Iterable[str]] = None,
+    samples: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    """
+    Rows of ``rdd.counts`` at `level` with one of `reference_types`, `groups`
+    and `samples` (None or empty: no restriction).
+
+    Equivalent to ``RDDCounts.filter_counts`` for the level and reference
+    types, on cached integer masks.
+    """
+    return CountFilter.compile(level, reference_types, groups, samples).apply(rdd)
+
+
+def with_cached_filters(rdd: Any) -> Any:
+    """
+    Shallow copy of `rdd` whose ``filter_counts`` method is :func:`filter_counts`.
+
+    For code that filters through ``RDDCounts.filter_counts`` itself (the
+    library's visualizer): its selections then reuse the cached masks of
+    `rdd`.  The copy shares every table with `rdd`.
+    """
+    view = copy.copy(rdd)
+    view.filter_counts = partial(filter_counts, rdd)
+    return view
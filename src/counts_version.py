@@ -0,0 +1,68 @@
+"""
+Freshness of the caches derived from ``rdd.counts``.
+
+The level index, the group assignment and the filter codes are built from
+the counts table once and cached on the RDDCounts object.  They go stale
+when ``rdd.counts`` is
+
+• replaced – detected with a weak reference to the table they were built
+  from (object ids are reused once a table is garbage collected)
+• edited in place (``rdd.counts["count"] = …``) – invisible from outside,
+  so code that does it calls :func:`counts_changed`, which bumps a version
+  number kept on the RDDCounts object
+
+Relabelling groups (:mod:`src.state_helpers`) rewrites the ``group`` column
+without bumping the version: the group assignment is the source of those
+labels and the other caches are refreshed from it explicitly.
+"""
+
+import weakref
+from typing import Any
+
+import pandas as pd
+
+
+def counts_version(rdd: Any) -> int:
+    """Number of in-place edits announced for ``rdd.counts``."""
+    return getattr(rdd, "_counts_version", 0)
+
+
+def counts_changed(rdd: Any) -> None:
+    """Announce an in-place edit of ``rdd.counts``; derived caches are rebuilt."""
+    rdd._counts_version = counts_version(rdd) + 1
+
+
+def counts_stamp(rdd: Any) -> "CountsStamp":
+    """Stamp of the current ``rdd.counts``, e.g. to key results shown on a page."""
+    return CountsStamp(rdd.counts, counts_version(rdd))
+
+
+class CountsStamp:
+    """The counts table (and its version) a cache was built from."""
+
+    __slots__ = ("_table", "version")
+
+    def __init__(self, counts: pd.DataFrame, version: int = 0) -> None:
+        self._table = weakref.ref(counts)
+        self.version = version
+
+    def matches(self, counts: pd.DataFrame, version: int = 0) -> bool:
+        return self._table() is counts and self.version == version
+
+    def __eq__(self, other: object) -> bool:
+        # equal while both stamp the same live table at the same version
+        if not isinstance(other, CountsStamp):
+            return NotImplemented
+        table = self._table()
+        return table is not None and other.matches(table, self.version)
+
+    def __hash__(self) -> int:
+        return hash((id(self._table()), self.version))
+
+    def __reduce__(self):
+        # an unpickled cache belongs to no table (the table is a new object)
+        return (_stale_stamp, ())
+
+
+def _stale_stamp() -> CountsStamp:
+    return CountsStamp(pd.DataFrame(), version=-1)
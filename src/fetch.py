@@ -0,0 +1,298 @@
+"""
+Robust HTTP download of GNPS task network tables.
+
+GNPS servers regularly answer with transient 5xx errors or drop connections
+half-way through multi-hundred-MB tables.  :class:`HttpFetcher` wraps the
+download in a pooled ``requests.Session`` and
+
+• streams the body to ``<name>.part`` in chunks (never held in memory),
+• resumes an interrupted transfer with an HTTP ``Range`` request,
+• retries connection errors and 429/5xx answers with bounded exponential
+  backoff, and
+• reports bytes received and throughput through a callback.
+
+Task tables are staged under a name derived from their URL, behind a lock
+file, so a ``.part`` left by a failed call or a killed process is resumed by
+the next fetch of the same task instead of being downloaded again.
+
+It is the opt-in downloader of :class:`src.task_cache.TaskCache`
+(``RDD_GNPS_FETCHER=http``).  The default stays ``rdd.utils.get_gnps_task_data``:
+this module parses the table itself, and that parse is not yet checked
+against the library's for every GNPS version.  The task URL templates can be
+overridden with ``RDD_GNPS2_URL`` / ``RDD_GNPS1_URL`` (``{task_id}``
+placeholder), e.g. to point at a mirror or a local stand-in server.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Union
+
+import pandas as pd
+
+from src.rdd_cache import private_directory, user_cache_directory
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only serialise threads of one process
+    fcntl = None
+
+GNPS2_URL = "https://gnps2.org/resultfile?task={task_id}&file=nf_output/clustering/clusterinfo.tsv"
+GNPS1_URL = (
+    "https://gnps.ucsd.edu/ProteoSAFe/DownloadResultFile?task={task_id}"
+    "&file=clusterinfosummarygroup_attributes_withIDs_withcomponentID/&block=main"
+)
+
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+CHUNK_SIZE = 1 << 20  # 1 MiB
+
+
+class FetchError(IOError):
+    """A download failed permanently or ran out of retries."""
+
+
+@dataclass(frozen=True)
+class FetchProgress:
+    """Transfer state passed to progress callbacks."""
+
+    received: int  # bytes on disk, including a resumed prefix
+    total: Optional[int]  # None when the server sends no length
+    seconds: float  # since this download call started
+    resumed_from: int = 0
+
+    @property
+    def fraction(self) -> Optional[float]:
+        return None if not self.total else min(1.0, self.received / self.total)
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second transferred by this call (excludes the resumed prefix)."""
+        return (self.received - self.resumed_from) / self.seconds if self.seconds > 0 else 0.0
+
+    def describe(self) -> str:
+        size = f"{self.received / 2**20:.1f}"
+        if self.total:
+            size += f" / {self.total / 2**20:.1f}"
+        return f"{size} MiB at {self.throughput / 2**20:.1f} MiB/s"
+
+
+ProgressCallback = Callable[[FetchProgress], None]
+
+
+def task_url(task_id: str, gnps2: bool = True) -> str:
+    """Download URL of the network table of `task_id`."""
+    if gnps2:
+        template = os.environ.get("RDD_GNPS2_URL", GNPS2_URL)
+    else:
+        template = os.environ.get("RDD_GNPS1_URL", GNPS1_URL)
+    return template.format(task_id=task_id.strip())
+
+
+class HttpFetcher:
+    """
+    Pooled, resumable, retrying downloader.
+
+    Parameters
+    ----------
+    retries : int
+        Attempts after the first one before giving up.
+    backoff : float
+        First retry delay in seconds; doubled on every retry.
+    max_backoff : float
+        Upper bound of a single retry delay.
+    timeout : float or (float, float)
+        Connect / read timeout passed to ``requests``.
+    chunk_size : int
+        Bytes written per chunk.
+    download_dir : str, optional
+        Where task tables are staged; defaults to ``<tmp>/gnps_downloads-<user>``
+        and is made private to the user, since ``.part`` files are resumed.
+        One task URL is staged by one writer at a time (a lock file held
+        across processes and threads); concurrent fetches wait for it.
+    pool_size : int
+        Connections kept alive per host.
+    sleep : callable
+        Used between retries (injectable for tests).
+    """
+
+    def __init__(
+        self,
+        retries: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        timeout: Union[float, tuple] = (10.0, 120.0),
+        chunk_size: int = CHUNK_SIZE,
+        download_dir: Optional[str] = None,
+        pool_size: int = 4,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.download_dir = Path(download_dir or user_cache_directory("gnps_downloads"))
+        self._sleep = sleep
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    # ────────────────────── downloads ──────────────────────
+    def download(
+        self, url: str, target: Union[str, os.PathLike], progress: Optional[ProgressCallback] = None
+    ) -> Path:
+        """
+        Download `url` to `target`, resuming from ``<target>.part`` if present.
+
+        Raises
+        ------
+        FetchError
+            On a non-retryable HTTP status or once the retries are used up.
+        """
+        import requests
+
+        target = Path(target)
+        part = target.with_name(target.name + ".part")
+        part.parent.mkdir(parents=True, exist_ok=True)
+        start = time.monotonic()
+
+        for attempt in range(self.retries + 1):
+            try:
+                if self._attempt(url, part, start, progress):
+                    os.replace(part, target)
+                    return target
+                error = "incomplete body"
+            except (
+                requests.ConnectionError,
+                requests.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+            ) as e:
+                error = f"{type(e).__name__}: {e}"
+            except _RetryableStatus as e:
+                error = str(e)
+            if attempt < self.retries:
+                self._sleep(min(self.max_backoff, self.backoff * 2**attempt))
+        raise FetchError(f"Download of {url} failed after {self.retries + 1} attempts ({error})")
+
+    def _attempt(
+        self, url: str, part: Path, start: float, progress: Optional[ProgressCallback]
+    ) -> bool:
+        """One request; True once ``part`` holds the complete body."""
+        offset = part.stat().st_size if part.exists() else 0
+        # identity encoding keeps byte ranges and Content-Length in on-disk units
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as resp:
+            if resp.status_code == 416:  # nothing left to send, or a stale part file
+                total = _content_range_total(resp.headers.get("Content-Range"))
+                if total == offset:
+                    return True
+                part.unlink()
+                raise _RetryableStatus(f"HTTP 416 for {url}; restarting from zero")
+            if resp.status_code in RETRY_STATUS:
+                raise _RetryableStatus(f"HTTP {resp.status_code} from {url}")
+            if resp.status_code not in (200, 206):
+                raise FetchError(f"HTTP {resp.status_code} from {url}")
+
+            if resp.status_code == 200:  # server ignored the range: start over
+                offset = 0
+            length = resp.headers.get("Content-Length")
+            total = offset + int(length) if length is not None else None
+            received = offset
+            with open(part, "ab" if offset else "wb") as fh:
+                for chunk in resp.iter_content(self.chunk_size):
+                    fh.write(chunk)
+                    received += len(chunk)
+                    if progress is not None:
+                        elapsed = time.monotonic() - start
+                        progress(FetchProgress(received, total, elapsed, offset))
+        return total is None or received >= total
+
+    def fetch_task(
+        self, task_id: str, gnps2: bool = True, progress: Optional[ProgressCallback] = None
+    ) -> pd.DataFrame:
+        """
+        Download and parse the network table of a GNPS task.
+
+        Signature-compatible with ``rdd.utils.get_gnps_task_data`` (plus
+        `progress`), so it can serve as a :class:`TaskCache` downloader.  A
+        failed download keeps its ``.part`` file for the next call to resume.
+        """
+        url = task_url(task_id, gnps2)
+        digest = hashlib.blake2b(url.encode(), digest_size=6).hexdigest()
+        name = f"{'gnps2' if gnps2 else 'gnps1'}_{task_id.strip()}-{digest}.tsv"
+        target = private_directory(self.download_dir) / name
+        with _staging_lock(target):
+            path = self.download(url, target, progress)
+            try:
+                return pd.read_csv(path, sep="\t", low_memory=False)
+            finally:
+                path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+@lru_cache(maxsize=None)
+def shared_fetcher() -> HttpFetcher:
+    """Process-wide fetcher, so keep-alive connections are reused across downloads."""
+    return HttpFetcher()
+
+
+class _RetryableStatus(Exception):
+    pass
+
+
+_THREAD_LOCKS: Dict[Path, threading.Lock] = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+
+
+@contextmanager
+def _staging_lock(target: Path) -> Iterator[None]:
+    """
+    Hold ``<target>.lock`` exclusively while `target` is staged.
+
+    ``flock`` locks are per open file, so they also serialise threads of one
+    process, and are dropped with a killed process.  The lock file is removed
+    on release; a waiter that locked a removed file tries again.
+    """
+    if fcntl is None:
+        with _THREAD_LOCKS_GUARD:
+            lock = _THREAD_LOCKS.setdefault(target, threading.Lock())
+        with lock:
+            yield
+        return
+
+    lock_path = target.with_name(target.name + ".lock")
+    while True:
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_ino == os.stat(lock_path).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+    try:
+        yield
+    finally:
+        os.unlink(lock_path)
+        os.close(fd)
+
+
+def _content_range_total(header: Optional[str]) -> Optional[int]:
+    """Total size from ``Content-Range: bytes */<total>``."""
+    if not header or "/" not in header:
+        return None
+    total = header.rsplit("/", 1)[1]
+    return int(total) if total.isdigit() else None
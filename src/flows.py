@@ -0,0 +1,210 @@
+"""
+Precomputed ontology flow graph for the Sankey page.
+
+A Sankey flow from term ``a`` at level ``L`` to term ``b`` at level ``L + 1``
+carries every count a sample has against reference files annotated with
+both terms.  The graph of all levels is built once per counts table from the
+level-0 counts (see :func:`src.level_counts.join_ontology`) and kept in
+``LevelIndex.derived``:
+
+• nodes  – one per (level, term), named ``<term>_<level>`` like the
+  descriptors of the colour-mapping files
+• edges  – parent → child node pairs of adjacent levels
+• contributions – a sparse ``samples × edges`` matrix; the all-samples
+  totals are its precomputed column sums
+
+Showing one sample is then a CSR row slice, all samples a cached vector and
+a lower maximum level an edge mask, so redrawing never re-joins the counts.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.count_filter import filter_counts
+from src.level_counts import join_ontology, resolve_ontology_columns
+from src.level_index import get_level_index
+
+DEFAULT_NODE_COLOUR = "#999999"
+
+
+@dataclass(frozen=True)
+class FlowGraph:
+    """Parent → child edges of every level with per-sample contributions."""
+
+    nodes: np.ndarray
+    node_levels: np.ndarray
+    sources: np.ndarray
+    targets: np.ndarray
+    samples: pd.Index
+    contributions: Any
+    totals: np.ndarray
+
+    @property
+    def max_level(self) -> int:
+        return int(self.node_levels.max(initial=0))
+
+    def flows(self, sample: Optional[str] = None, max_level: Optional[int] = None) -> pd.DataFrame:
+        """
+        Flows of one `sample` (None = all samples) up to `max_level`.
+
+        Returns
+        -------
+        pd.DataFrame
+            ``source``, ``target`` (node names) and ``value``; zero flows
+            are dropped.
+        """
+        if sample is None:
+            values = self.totals
+        else:
+            row = self.samples.get_loc(sample)  # KeyError for unknown samples
+            values = np.asarray(self.contributions[row].todense()).ravel()
+        keep = values > 0
+        if max_level is not None:
+            keep &= self.node_levels[self.targets] <= max_level
+        return pd.DataFrame(
+            {
+                "source": self.nodes[self.sources[keep]],
+                "target": self.nodes[self.targets[keep]],
+                "value": values[keep],
+            }
+        )
+
+
+def build_flow_graph(
+    file_counts: pd.DataFrame,
+    reference_metadata: pd.DataFrame,
+    ontology_columns: Sequence[str],
+) -> FlowGraph:
+    """
+    Build the flow graph of levels 1..N from level-0 counts.
+
+    Parameters
+    ----------
+    file_counts : pd.DataFrame
+        Level-0 rows: ``filename``, ``reference_type`` (reference filename)
+        and ``count``.
+    reference_metadata : pd.DataFrame
+        Reference files with the columns of `ontology_columns`.
+    ontology_columns : sequence of str
+        Ontology column of level 1, 2, … in order.
+    """
+    from scipy.sparse import coo_matrix
+
+    join = join_ontology(file_counts, reference_metadata, ontology_columns)
+    offsets = np.cumsum([0] + [len(t) for t in join.terms])
+    nodes = np.asarray(
+        [f"{term}_{i + 1}" for i, terms in enumerate(join.terms) for term in terms], dtype=object
+    )
+    node_levels = np.repeat(np.arange(1, len(join.terms) + 1), np.diff(offsets))
+
+    sources, targets, rows, edge_ids, weights = [], [], [], [], []
+    n_edges = 0
+    for i in range(len(join.terms) - 1):
+        parent = join.term_codes[i][join.ref_pos]
+        child = join.term_codes[i + 1][join.ref_pos]
+        keep = (parent >= 0) & (child >= 0)
+        pair = parent[keep].astype(np.int64) * len(join.terms[i + 1]) + child[keep]
+        unique_pairs, edge = np.unique(pair, return_inverse=True)
+        sources.append(offsets[i] + unique_pairs // len(join.terms[i + 1]))
+        targets.append(offsets[i + 1] + unique_pairs % len(join.terms[i + 1]))
+        rows.append(join.sample_codes[keep])
+        edge_ids.append(n_edges + edge)
+        weights.append(join.weights[keep])
+        n_edges += len(unique_pairs)
+
+    def concat(parts, dtype):
+        return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype)
+
+    contributions = coo_matrix(
+        (concat(weights, float), (concat(rows, np.intp), concat(edge_ids, np.intp))),
+        shape=(len(join.samples), n_edges),
+    ).tocsr()  # duplicates (several reference files per edge) are summed
+    return FlowGraph(
+        nodes=nodes,
+        node_levels=node_levels,
+        sources=concat(sources, np.intp),
+        targets=concat(targets, np.intp),
+        samples=pd.Index(join.samples),
+        contributions=contributions,
+        totals=np.asarray(contributions.sum(axis=0)).ravel(),
+    )
+
+
+def get_flow_graph(rdd: Any) -> FlowGraph:
+    """
+    Return the flow graph of `rdd`, building it on first use.
+
+    Memoised in the level index, so it is rebuilt only when ``rdd.counts``
+    is replaced.
+    """
+    index = get_level_index(rdd)
+    if "flows" not in index.derived:
+        columns = resolve_ontology_columns(
+            rdd.reference_metadata,
+            levels=rdd.levels,
+            custom=getattr(rdd, "ontology_columns", None),
+            renamed=getattr(rdd, "ontology_columns_renamed", None),
+        )
+        file_counts = filter_counts(rdd, level=0)
+        index.derived["flows"] = build_flow_graph(file_counts, rdd.reference_metadata, columns)
+    return index.derived["flows"]
+
+
+# ────────────────────── figure ──────────────────────
+def _rgba(colour: str, alpha: float) -> str:
+    colour = colour.lstrip("#")
+    if len(colour) == 3:
+        colour = "".join(c * 2 for c in colour)
+    try:
+        r, g, b = (int(colour[i : i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        return f"rgba(153, 153, 153, {alpha})"
+    return f"rgba({r}, {g}, {b}, {alpha})"
+
+
+def sankey_figure(
+    flows: pd.DataFrame,
+    colours: Optional[Mapping[str, str]] = None,
+    dark_mode: bool = False,
+    title: str = "RDD flows",
+) -> Any:
+    """
+    Plotly Sankey of `flows` (:meth:`FlowGraph.flows`).
+
+    Nodes are labelled with their term and coloured by ``colours``
+    (node name → colour, e.g. ``plant_1 → #458B00``); links take the colour
+    of their source node.  Replaces the library's ``Visualizer.plot_sankey``,
+    which reads the mapping from a file and derives the flows itself with
+    ``RDDCounts.generate_RDDflows``.
+    """
+    import plotly.graph_objects as go
+
+    colours = colours or {}
+    names = pd.Index(pd.unique(np.concatenate([flows["source"], flows["target"]])))
+    node_colours = [colours.get(name, DEFAULT_NODE_COLOUR) for name in names]
+    source = names.get_indexer(flows["source"])
+    fig = go.Figure(
+        go.Sankey(
+            node=dict(
+                label=[name.rsplit("_", 1)[0] for name in names],
+                color=node_colours,
+                pad=12,
+                thickness=14,
+            ),
+            link=dict(
+                source=source,
+                target=names.get_indexer(flows["target"]),
+                value=flows["value"].to_numpy(),
+                color=[_rgba(node_colours[i], 0.4) for i in source],
+            ),
+        )
+    )
+    fig.update_layout(
+        title=title,
+        template="plotly_dark" if dark_mode else "plotly_white",
+        font_size=11,
+    )
+    return fig
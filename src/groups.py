@@ -0,0 +1,105 @@
+"""
+Per-sample group assignment for the counts table.
+
+Group labels are stored once per *sample* as a categorical (integer code +
+category list) and the counts table references them through an integer
+sample code per row, computed once per ``rdd.counts`` object.  Relabelling
+therefore updates a lookup vector of length ``n_samples``; the ``group``
+column every plotting routine expects is rebuilt by one small-integer gather
+from the label strings, with no string ``map``, no merge, no temp file and
+no copy of the counts table.  The column holds plain labels, not a
+categorical, so the library's group-bys behave the same on pandas 2 and 3.
+"""
+
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from src.counts_version import CountsStamp, counts_version
+
+
+class GroupAssignment:
+    """
+    Sample → group lookup bound to one counts table.
+
+    Parameters
+    ----------
+    counts : pd.DataFrame
+        Long counts table with a ``filename`` column.
+    version : int
+        :func:`src.counts_version.counts_version` of the table.
+    """
+
+    def __init__(self, counts: pd.DataFrame, version: int = 0) -> None:
+        self._stamp = CountsStamp(counts, version)
+        row_codes, samples = pd.factorize(counts["filename"])
+        self.row_codes = row_codes.astype(np.int32)
+        self.samples = pd.Index(samples)
+        self.labels = pd.Categorical([None] * len(self.samples))
+        if "group" in counts.columns:
+            # Seed from the existing column: first row of every sample
+            first_rows = pd.Series(self.row_codes).drop_duplicates().index.to_numpy()
+            self.labels = pd.Categorical(counts["group"].to_numpy()[first_rows])
+
+    def matches(self, counts: pd.DataFrame, version: int = 0) -> bool:
+        """True if this assignment was built from `counts` at `version`."""
+        return self._stamp.matches(counts, version)
+
+    def assign(self, mapping: pd.Series) -> None:
+        """Replace every sample's label with `mapping` (filename → group)."""
+        self.labels = pd.Categorical(mapping.reindex(self.samples).to_numpy())
+
+    def relabel(self, mapping: pd.Series) -> int:
+        """
+        Update the labels of the samples present in `mapping`.
+
+        Samples absent from `mapping` keep their label.
+
+        Returns
+        -------
+        int
+            Number of samples whose label was set.
+        """
+        positions = self.samples.get_indexer(mapping.index)
+        found = positions >= 0
+        values = mapping.to_numpy()[found]
+        labels = self.labels.add_categories(
+            pd.Index(pd.unique(values)).difference(self.labels.categories).dropna()
+        )
+        labels[positions[found]] = values
+        self.labels = labels.remove_unused_categories()
+        return int(found.sum())
+
+    def sample_groups(self) -> pd.Series:
+        """Filename → group label."""
+        return pd.Series(np.asarray(self.labels, dtype=object), index=self.samples)
+
+    def group_column(self) -> np.ndarray:
+        """
+        Per-row group labels for the counts table, as an object array.
+
+        Only the small integer codes are gathered per row; every row points
+        at one of the label strings held once in the categories.  Plain
+        values rather than a categorical: with the ``observed=False`` default
+        of pandas 2, group-bys and pivots over a categorical column emit rows
+        for every unused group.
+        """
+        labels = np.append(np.asarray(self.labels.categories, dtype=object), np.nan)
+        return labels[self.labels.codes[self.row_codes]]  # code -1 (no group): NaN
+
+
+def get_group_assignment(rdd: Any) -> GroupAssignment:
+    """
+    Return the GroupAssignment of `rdd`, building it on first use.
+
+    Stored on the object (``rdd._groups``) and rebuilt only when
+    ``rdd.counts`` has been replaced or edited
+    (:func:`src.counts_version.counts_changed`).
+    """
+    assignment = getattr(rdd, "_groups", None)
+    version = counts_version(rdd)
+    if assignment is None or not assignment.matches(rdd.counts, version):
+        assignment = GroupAssignment(rdd.counts, version)
+        rdd._groups = assignment
+    return assignment
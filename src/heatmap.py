@@ -0,0 +1,228 @@
+"""
+Clustered proportion heatmap with level-of-detail rendering.
+
+Rows (samples) and columns (reference types) of a level are ordered by
+hierarchical clustering of their proportion profiles.  Exact linkage is
+quadratic in the number of leaves, so wide axes are first reduced to a few
+dozen dimensions (a random projection, which preserves distances) and grouped into at most ``MAX_LEAVES``
+k-means micro-clusters; the Ward linkage of the micro-cluster centroids
+orders the clusters and each cluster's members follow in order of their
+distance to the centroid.  The ordering is computed once per level and kept
+in ``LevelIndex.derived``, like the PCA fits.
+
+Rendering never sends the full matrix: :func:`heatmap_view` averages the
+requested *viewport* (a row range and a column range of the clustered order)
+into at most ``max_rows × max_cols`` tiles.  The whole matrix gives a coarse
+overview; zooming in on a smaller viewport refines it down to single cells.
+Tiles are products with sparse averaging matrices (``R @ M @ C``, the row
+normalisation folded into ``R``), so sparse levels are never densified and
+the cost is linear in the viewport's cells.
+"""
+
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.level_index import LevelIndex
+
+# Largest axis clustered exactly; larger axes go through micro-clusters
+MAX_LEAVES = 500
+# Components kept before clustering a wide axis
+REDUCED_DIMENSIONS = 32
+
+
+@dataclass(frozen=True)
+class HeatmapOrder:
+    """Clustered order of one level: positions into its rows and columns."""
+
+    rows: np.ndarray
+    columns: np.ndarray
+
+
+@dataclass(frozen=True)
+class HeatmapView:
+    """
+    Tile-averaged viewport of the clustered heatmap.
+
+    ``row_edges`` / ``col_edges`` are the tile boundaries in clustered order
+    (``len(labels) + 1`` entries), so a tile covers
+    ``row_edges[i]:row_edges[i + 1]``.
+    """
+
+    values: np.ndarray
+    row_labels: List[str]
+    col_labels: List[str]
+    row_edges: np.ndarray
+    col_edges: np.ndarray
+    shape: Tuple[int, int]
+
+    @property
+    def is_exact(self) -> bool:
+        """True if every tile is a single cell."""
+        return (
+            len(self.row_labels) == np.diff(self.row_edges).sum()
+            and len(self.col_labels) == np.diff(self.col_edges).sum()
+        )
+
+
+def _reduce(values: Any, seed: int) -> np.ndarray:
+    """Dense low-dimensional embedding of the rows of `values` (Gaussian random projection)."""
+    if values.shape[1] <= REDUCED_DIMENSIONS:
+        return values.toarray() if hasattr(values, "toarray") else np.asarray(values, dtype=float)
+    rng = np.random.default_rng(seed)
+    projection = rng.standard_normal((values.shape[1], REDUCED_DIMENSIONS))
+    return np.asarray(values @ projection) / np.sqrt(REDUCED_DIMENSIONS)
+
+
+def leaf_order(values: Any, max_leaves: int = MAX_LEAVES, seed: int = 0) -> np.ndarray:
+    """
+    Order the rows of `values` (dense or sparse) by hierarchical clustering.
+
+    Returns
+    -------
+    np.ndarray
+        Permutation of ``range(values.shape[0])``.
+    """
+    n = values.shape[0]
+    if n < 3:
+        return np.arange(n)
+    from scipy.cluster.hierarchy import leaves_list, linkage
+
+    points = _reduce(values, seed)
+    if n <= max_leaves:
+        return leaves_list(linkage(points, method="ward")).astype(np.intp)
+
+    from sklearn.cluster import MiniBatchKMeans
+
+    kmeans = MiniBatchKMeans(n_clusters=max_leaves, random_state=seed, n_init=1)
+    labels = kmeans.fit_predict(points)
+    centroids = kmeans.cluster_centers_
+    rank = np.empty(max_leaves, dtype=np.intp)
+    rank[leaves_list(linkage(centroids, method="ward"))] = np.arange(max_leaves)
+    distance = np.linalg.norm(points - centroids[labels], axis=1)
+    return np.lexsort((distance, rank[labels])).astype(np.intp)
+
+
+def cluster_order(index: LevelIndex, level: int) -> HeatmapOrder:
+    """Clustered row / column order of `level`'s proportions, memoised."""
+    key = ("heatmap_order", int(level))
+    if key not in index.derived:
+        proportions = index.level(level).proportions()
+        index.derived[key] = HeatmapOrder(
+            rows=leaf_order(proportions), columns=leaf_order(proportions.T)
+        )
+    return index.derived[key]
+
+
+def _tiles(start: int, stop: int, max_tiles: int) -> np.ndarray:
+    """Edges of at most `max_tiles` near-equal tiles covering ``start:stop``."""
+    n_tiles = max(1, min(max_tiles, stop - start))
+    return np.unique(np.linspace(start, stop, n_tiles + 1).round().astype(np.intp))
+
+
+def _indicator(
+    edges: np.ndarray, positions: np.ndarray, n: int, scale: Optional[np.ndarray] = None
+) -> Any:
+    """
+    Sparse ``tiles × n`` averaging matrix: 1 / tile size at the positions of
+    each tile, times the optional per-position `scale`.
+    """
+    from scipy.sparse import csr_matrix
+
+    tile = np.repeat(np.arange(len(edges) - 1), np.diff(edges))
+    members = positions[edges[0] : edges[-1]]
+    weight = 1.0 / np.diff(edges)[tile]
+    if scale is not None:
+        weight = weight * scale[members]
+    return csr_matrix((weight, (tile, members)), shape=(len(edges) - 1, n))
+
+
+def _label(names: np.ndarray, edges: np.ndarray, i: int) -> str:
+    first, last = names[edges[i]], names[edges[i + 1] - 1]
+    size = edges[i + 1] - edges[i]
+    return str(first) if size == 1 else f"{first} … {last} ({size})"
+
+
+def heatmap_view(
+    index: LevelIndex,
+    level: int,
+    reference_types: Optional[Sequence[str]] = None,
+    rows: Optional[Tuple[int, int]] = None,
+    columns: Optional[Tuple[int, int]] = None,
+    max_rows: int = 200,
+    max_cols: int = 200,
+) -> HeatmapView:
+    """
+    Average a viewport of the clustered heatmap into tiles.
+
+    Parameters
+    ----------
+    index : LevelIndex
+        Index of the counts table.
+    level : int
+        Ontology level.
+    reference_types : sequence of str, optional
+        Columns to keep (None = all), in clustered order.
+    rows, columns : (start, stop), optional
+        Viewport in clustered order (after the type selection); default the
+        whole axis.
+    max_rows, max_cols : int
+        Tile budget per axis.
+    """
+    matrix = index.level(level)
+    order = cluster_order(index, level)
+    row_order, col_order = order.rows, order.columns
+    if reference_types:
+        col_order = col_order[np.isin(matrix.types[col_order], list(reference_types))]
+
+    n_rows, n_cols = len(row_order), len(col_order)
+    row_start, row_stop = rows or (0, n_rows)
+    col_start, col_stop = columns or (0, n_cols)
+    row_edges = _tiles(max(0, row_start), min(n_rows, row_stop), max_rows)
+    col_edges = _tiles(max(0, col_start), min(n_cols, col_stop), max_cols)
+
+    if len(row_edges) < 2 or len(col_edges) < 2:
+        values = np.zeros((max(len(row_edges) - 1, 0), max(len(col_edges) - 1, 0)))
+    else:
+        # Row normalisation is folded into the left factor: no proportion matrix
+        totals = np.asarray(matrix.values.sum(axis=1), dtype=float).ravel()
+        with np.errstate(divide="ignore"):
+            scale = np.nan_to_num(1.0 / totals, posinf=0.0)
+        left = _indicator(row_edges, row_order, matrix.shape[0], scale)
+        right = _indicator(col_edges, col_order, matrix.shape[1]).T
+        values = left @ matrix.values @ right
+        values = values.toarray() if hasattr(values, "toarray") else np.asarray(values)
+
+    samples, types = matrix.samples[row_order], matrix.types[col_order]
+    return HeatmapView(
+        values=values,
+        row_labels=[_label(samples, row_edges, i) for i in range(len(row_edges) - 1)],
+        col_labels=[_label(types, col_edges, i) for i in range(len(col_edges) - 1)],
+        row_edges=row_edges,
+        col_edges=col_edges,
+        shape=(n_rows, n_cols),
+    )
+
+
+def view_figure(view: HeatmapView, title: str = "RDD proportions (clustered)") -> Any:
+    """Plotly heatmap of a :class:`HeatmapView`."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure(
+        go.Heatmap(
+            z=view.values,
+            x=view.col_labels,
+            y=view.row_labels,
+            colorscale="Viridis",
+            hovertemplate="%{y}<br>%{x}<br>mean proportion: %{z:.3f}<extra></extra>",
+        )
+    )
+    detail = "cells" if view.is_exact else "tiles"
+    fig.update_layout(
+        title=f"{title} — {len(view.row_labels)} × {len(view.col_labels)} {detail}",
+        yaxis_autorange="reversed",
+        xaxis_showticklabels=len(view.col_labels) <= 60,
+        yaxis_showticklabels=len(view.row_labels) <= 80,
+    )
+    return fig
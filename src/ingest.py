@@ -0,0 +1,144 @@
+"""
+Single ingestion stage for uploaded files.
+
+Every upload (GNPS network, sample metadata, reference metadata) is streamed
+once into a managed spill directory and hashed on the way, so the same bytes
+are never buffered, copied or parsed more than needed:
+
+• selectors only read the header or a single projected column
+  (``usecols`` + chunked scan)
+• the full frame is left to RDDCounts, which receives the spilled path
+• the spill directory is deleted when its owner (the session) goes away or
+  the interpreter exits
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import weakref
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+CHUNK_SIZE = 1 << 20  # bytes copied per read when spilling
+SCAN_ROWS = 200_000  # rows per chunk when scanning a column
+
+
+def sep_for(name: str) -> str:
+    """Return the field separator implied by a file name's extension."""
+    ext = os.path.splitext(name)[1].lower()
+    return "\t" if ext in (".tsv", ".txt") else ","
+
+
+@dataclass(frozen=True)
+class SpilledFile:
+    """An upload persisted on disk, identified by its content digest."""
+
+    name: str
+    path: str
+    digest: str
+
+    @property
+    def sep(self) -> str:
+        return sep_for(self.name)
+
+
+class SpillDirectory:
+    """
+    Private temp directory that owns spilled uploads.
+
+    Files are named by content digest, so re-uploading identical bytes reuses
+    the existing copy.  The directory is removed when the object is garbage
+    collected (e.g. with its Streamlit session) or at interpreter exit.
+
+    Parameters
+    ----------
+    parent : str, optional
+        Where to create the directory; defaults to the system temp dir.
+    """
+
+    def __init__(self, parent: Optional[str] = None) -> None:
+        self.path = tempfile.mkdtemp(prefix="gnps_rdd_spill_", dir=parent)
+        self._by_upload_id: Dict[str, SpilledFile] = {}
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.path, ignore_errors=True)
+
+    def spill(self, upload: Any) -> SpilledFile:
+        """
+        Stream a file-like upload to disk in fixed-size chunks.
+
+        Streamlit's ``UploadedFile`` carries a ``file_id``; uploads already
+        spilled under that id are returned without touching their bytes.
+        """
+        upload_id = getattr(upload, "file_id", None)
+        if upload_id is not None and upload_id in self._by_upload_id:
+            return self._by_upload_id[upload_id]
+
+        suffix = os.path.splitext(upload.name)[1]
+        h = hashlib.blake2b(digest_size=20)
+        upload.seek(0)
+        with tempfile.NamedTemporaryFile(dir=self.path, suffix=".part", delete=False) as tmp:
+            for block in iter(lambda: upload.read(CHUNK_SIZE), b""):
+                h.update(block)
+                tmp.write(block)
+        upload.seek(0)
+
+        digest = h.hexdigest()
+        target = os.path.join(self.path, f"{digest}{suffix}")
+        if os.path.exists(target):
+            os.unlink(tmp.name)
+        else:
+            os.replace(tmp.name, target)
+
+        spilled = SpilledFile(name=upload.name, path=target, digest=digest)
+        if upload_id is not None:
+            self._by_upload_id[upload_id] = spilled
+        return spilled
+
+    def scratch_path(self, suffix: str = "") -> str:
+        """Return a fresh path inside the spill directory."""
+        fd, path = tempfile.mkstemp(dir=self.path, suffix=suffix)
+        os.close(fd)
+        return path
+
+    def cleanup(self) -> None:
+        """Delete the directory and everything spilled into it."""
+        self._by_upload_id.clear()
+        self._finalizer()
+
+    @property
+    def alive(self) -> bool:
+        return self._finalizer.alive and Path(self.path).is_dir()
+
+
+# ────────────────────── projected readers ──────────────────────
+# Spilled paths embed the content digest, so caching on the path is safe.
+@lru_cache(maxsize=64)
+def _header(path: str, sep: str) -> tuple:
+    return tuple(pd.read_csv(path, sep=sep, nrows=0).columns)
+
+
+@lru_cache(maxsize=256)
+def _unique_values(path: str, sep: str, column: str) -> tuple:
+    seen = set()
+    for chunk in pd.read_csv(path, sep=sep, usecols=[column], chunksize=SCAN_ROWS):
+        seen.update(chunk[column].dropna().unique().tolist())
+    return tuple(sorted(seen, key=str))
+
+
+def read_header(spilled: SpilledFile) -> List[str]:
+    """Return the column names of a spilled table without reading rows."""
+    return list(_header(spilled.path, spilled.sep))
+
+
+def unique_values(spilled: SpilledFile, column: str) -> List[Any]:
+    """
+    Return the sorted, non-null unique values of one column.
+
+    Only `column` is parsed (``usecols``), in chunks of ``SCAN_ROWS`` rows,
+    so memory stays bounded by the number of distinct values.
+    """
+    return list(_unique_values(spilled.path, spilled.sep, column))
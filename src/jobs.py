@@ -0,0 +1,198 @@
+"""
+Local job runner for long builds, backed by a process pool.
+
+A single :class:`JobQueue` is shared by every Streamlit session of the server
+(``st.cache_resource``).  Pages submit work, keep the returned job id in
+session state and poll :meth:`JobQueue.status` on later reruns, so a build
+keeps running while the user interacts with widgets and several analysts
+can queue builds without blocking each other's script threads.
+
+Workers report progress through a :class:`ProgressReporter`, which writes
+``(stage, fraction, message)`` into a manager-backed dict the parent reads.
+
+Finished jobs hold their result (a whole RDDCounts object) until the page
+collects it; a session whose tab was closed never does, so unclaimed results
+are dropped after ``result_ttl`` seconds, and beyond ``max_unclaimed``
+finished jobs the oldest go first (checked on every submit and membership
+test).
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+RESULT_TTL = 30 * 60  # seconds a finished job waits for its page
+MAX_UNCLAIMED = 16  # finished jobs kept at most
+
+
+class ProgressReporter:
+    """Picklable ``progress(stage, fraction, message)`` callable for workers."""
+
+    def __init__(self, store: Any, job_id: str) -> None:
+        self._store = store
+        self._job_id = job_id
+
+    def __call__(self, stage: str, fraction: float = 0.0, message: str = "") -> None:
+        self._store[self._job_id] = (stage, float(fraction), message)
+
+
+@dataclass(frozen=True)
+class JobStatus:
+    """Snapshot of one job as seen by the submitting page."""
+
+    job_id: str
+    state: str
+    stage: str
+    fraction: float
+    message: str
+    elapsed: float
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (DONE, FAILED)
+
+
+class JobQueue:
+    """
+    Process-pool job runner with progress reporting.
+
+    Parameters
+    ----------
+    max_workers : int, optional
+        Number of worker processes; defaults to ``min(4, cpu_count)``.
+    start_method : str
+        Multiprocessing start method.  ``"spawn"`` avoids forking the
+        multi-threaded Streamlit server.
+    result_ttl : float
+        Seconds a finished job is kept for :meth:`result` before it is
+        dropped.
+    max_unclaimed : int
+        Finished jobs kept at most; the oldest are dropped first.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        start_method: str = "spawn",
+        result_ttl: float = RESULT_TTL,
+        max_unclaimed: int = MAX_UNCLAIMED,
+    ) -> None:
+        ctx = multiprocessing.get_context(start_method)
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._manager = ctx.Manager()
+        self._progress = self._manager.dict()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx)
+        self._futures: Dict[str, Future] = {}
+        self._submitted: Dict[str, float] = {}
+        self._finished: Dict[str, float] = {}  # in finishing order
+        self.result_ttl = result_ttl
+        self.max_unclaimed = max_unclaimed
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> str:
+        """
+        Run ``fn(*args, progress=reporter, **kwargs)`` in a worker process.
+
+        `fn` and its arguments must be picklable (module-level function).
+
+        Returns
+        -------
+        str
+            Job id used to poll status and collect the result.
+        """
+        self.prune()
+        job_id = uuid.uuid4().hex
+        self._progress[job_id] = ("queued", 0.0, "Waiting for a free worker")
+        reporter = ProgressReporter(self._progress, job_id)
+        future = self._executor.submit(fn, *args, progress=reporter, **kwargs)
+        with self._lock:
+            self._futures[job_id] = future
+            self._submitted[job_id] = time.monotonic()
+        future.add_done_callback(lambda _: self._on_finished(job_id))
+        return job_id
+
+    def _on_finished(self, job_id: str) -> None:
+        with self._lock:
+            if job_id in self._futures:
+                self._finished[job_id] = time.monotonic()
+
+    def prune(self) -> int:
+        """
+        Drop finished jobs nobody collected (older than ``result_ttl``, or
+        beyond the ``max_unclaimed`` most recent).
+
+        Returns
+        -------
+        int
+            Number of jobs dropped.
+        """
+        now = time.monotonic()
+        with self._lock:
+            finished = list(self._finished.items())
+        kept = [job_id for job_id, at in finished if now - at <= self.result_ttl]
+        expired = [job_id for job_id, at in finished if now - at > self.result_ttl]
+        expired += kept[: max(0, len(kept) - self.max_unclaimed)]
+        for job_id in expired:
+            self.discard(job_id)
+        return len(expired)
+
+    def __contains__(self, job_id: str) -> bool:
+        self.prune()  # pages check membership before polling
+        with self._lock:
+            return job_id in self._futures
+
+    def status(self, job_id: str) -> JobStatus:
+        """Return the current state of `job_id` (KeyError if unknown)."""
+        with self._lock:
+            future = self._futures[job_id]
+            elapsed = time.monotonic() - self._submitted[job_id]
+        stage, fraction, message = self._progress.get(job_id, ("queued", 0.0, ""))
+
+        error = None
+        if future.done():
+            exc = future.exception()
+            if exc is not None:
+                state, error = FAILED, f"{type(exc).__name__}: {exc}"
+            else:
+                state = DONE
+        elif future.running() or stage != "queued":
+            state = RUNNING
+        else:
+            state = QUEUED
+        return JobStatus(job_id, state, stage, fraction, message, elapsed, error)
+
+    def result(self, job_id: str, timeout: Optional[float] = None) -> Any:
+        """
+        Wait for `job_id`, forget it and return its result.
+
+        Re-raises the worker's exception if the job failed.
+        """
+        with self._lock:
+            future = self._futures[job_id]
+        try:
+            return future.result(timeout=timeout)
+        finally:
+            self.discard(job_id)
+
+    def discard(self, job_id: str) -> None:
+        """Forget `job_id` (a running job still finishes in the background)."""
+        with self._lock:
+            future = self._futures.pop(job_id, None)
+            self._submitted.pop(job_id, None)
+            self._finished.pop(job_id, None)
+        if future is not None:
+            future.cancel()
+        self._progress.pop(job_id, None)
+
+    def shutdown(self) -> None:
+        """Stop the workers and the progress manager."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._manager.shutdown()
@@ -0,0 +1,167 @@
+"""
+Vectorised per-level aggregation of RDD counts.
+
+Level ``k`` counts are a group-by of the file-level (``level == 0``) counts
+over the reference files' ontology column ``k``: the count of a sample for
+an ontology term is the sum of its counts against every reference file
+annotated with that term.  All levels are computed in one pass over one
+integer-coded join of the file-level table with the reference ontology:
+every (level, sample, term) triple is packed into one int64 key, so the
+group-by is a single sort and ``bincount`` instead of a pandas group-by (or
+merge) per level.  The work is NumPy throughout; threads would mostly wait
+on the GIL, so none are used.
+"""
+
+import re
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+_EXTENSION = re.compile(r"\.(mzML|mzXML|mgf|mzml|mzxml)$")
+
+
+def strip_extension(values: pd.Series) -> pd.Series:
+    """Spectrum file names without their mzML/mzXML/mgf extension."""
+    return values.astype(str).str.replace(_EXTENSION, "", regex=True)
+
+
+def resolve_ontology_columns(
+    reference_metadata: pd.DataFrame,
+    levels: Optional[int] = None,
+    custom: Optional[Sequence[str]] = None,
+    renamed: Optional[Sequence[str]] = None,
+) -> List[str]:
+    """
+    Return the reference-metadata columns holding ontology levels 1..N.
+
+    Tries the renamed custom columns, then the custom columns as given, then
+    the default ``sample_type_group1..`` columns; the first candidate list
+    that exists in `reference_metadata` wins.  The result is truncated to
+    `levels` when given.
+    """
+    default = sorted(
+        (c for c in reference_metadata.columns if re.fullmatch(r"sample_type_group\d+", c)),
+        key=lambda c: int(c[len("sample_type_group") :]),
+    )
+    for candidate in (renamed, custom, default):
+        if candidate and all(c in reference_metadata.columns for c in candidate):
+            columns = list(candidate)
+            break
+    else:
+        columns = []
+    return columns if levels is None else columns[:levels]
+
+
+class OntologyJoin(NamedTuple):
+    """
+    File-level rows matched to their reference file, integer-coded.
+
+    ``sample_codes`` / ``ref_pos`` / ``weights`` have one entry per matched
+    row (sample, reference-metadata row, count); ``term_codes[i]`` maps every
+    reference-metadata row to its term in ``terms[i]`` (-1: no term) for
+    ontology level ``i + 1``.
+    """
+
+    sample_codes: np.ndarray
+    samples: np.ndarray
+    ref_pos: np.ndarray
+    weights: np.ndarray
+    term_codes: List[np.ndarray]
+    terms: List[np.ndarray]
+
+
+def join_ontology(
+    file_counts: pd.DataFrame,
+    reference_metadata: pd.DataFrame,
+    ontology_columns: Sequence[str],
+) -> OntologyJoin:
+    """
+    Match level-0 counts to the reference files' ontology terms.
+
+    Reference files are matched without their extension; rows whose
+    reference file is not in `reference_metadata` are dropped.
+    """
+    ref_keys = strip_extension(reference_metadata["filename"])
+    unique_refs = ~ref_keys.duplicated().to_numpy()
+    reference_metadata, ref_keys = reference_metadata[unique_refs], ref_keys[unique_refs]
+    ref_pos = pd.Index(ref_keys).get_indexer(strip_extension(file_counts["reference_type"]))
+    matched = ref_pos >= 0
+    sample_codes, samples = pd.factorize(file_counts["filename"].to_numpy()[matched])
+
+    term_codes, terms = [], []
+    for col in ontology_columns:
+        codes, uniques = pd.factorize(reference_metadata[col])
+        term_codes.append(codes)
+        terms.append(np.asarray(uniques))
+    return OntologyJoin(
+        sample_codes,
+        np.asarray(samples),
+        ref_pos[matched],
+        file_counts["count"].to_numpy()[matched],
+        term_codes,
+        terms,
+    )
+
+
+def aggregate_levels(
+    file_counts: pd.DataFrame,
+    reference_metadata: pd.DataFrame,
+    ontology_columns: Sequence[str],
+) -> pd.DataFrame:
+    """
+    Compute levels 1..N from file-level counts.
+
+    Parameters
+    ----------
+    file_counts : pd.DataFrame
+        Level-0 rows: ``filename``, ``reference_type`` (reference filename),
+        ``count`` and optionally ``group``.
+    reference_metadata : pd.DataFrame
+        Must contain ``filename`` and every column of `ontology_columns`.
+    ontology_columns : sequence of str
+        Ontology column of level 1, 2, … in order.
+
+    Returns
+    -------
+    pd.DataFrame
+        Long counts (``filename``, ``reference_type``, ``count``, ``level``
+        and ``group`` if present) for levels 1..N, in level order.
+    """
+    if not len(ontology_columns):
+        return file_counts.iloc[:0]
+
+    # ── one shared join: file-level rows × reference ontology codes ──
+    join = join_ontology(file_counts, reference_metadata, ontology_columns)
+    n_samples = max(len(join.samples), 1)
+    n_terms = np.array([max(len(t), 1) for t in join.terms], dtype=np.int64)
+    # level i owns the key block [block[i], block[i + 1]) of n_samples × n_terms[i] keys
+    block = np.concatenate([[0], np.cumsum(n_samples * n_terms)])
+    keys, weights = [], []
+    for i in range(len(ontology_columns)):
+        codes = join.term_codes[i][join.ref_pos]
+        keep = codes >= 0  # references without a term at this level
+        keys.append(block[i] + join.sample_codes[keep].astype(np.int64) * n_terms[i] + codes[keep])
+        weights.append(join.weights[keep])
+    uniq, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    sums = np.bincount(inverse, weights=np.concatenate(weights), minlength=len(uniq))
+
+    level = np.searchsorted(block, uniq, side="right") - 1
+    local = uniq - block[level]
+    sample, code = local // n_terms[level], local % n_terms[level]
+    first_term = np.concatenate([[0], np.cumsum([len(t) for t in join.terms])])
+    terms = np.concatenate([np.asarray(t, dtype=object) for t in join.terms])
+    counts = pd.DataFrame(
+        {
+            "filename": join.samples[sample],
+            "reference_type": terms[first_term[level] + code],
+            "count": sums.astype(file_counts["count"].dtype),
+            "level": level + 1,
+        }
+    )
+    if "group" in file_counts.columns:
+        groups = (
+            file_counts[["filename", "group"]].drop_duplicates("filename").set_index("filename")
+        )["group"]
+        counts["group"] = groups.reindex(join.samples).to_numpy()[sample]
+    return counts
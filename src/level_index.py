@@ -0,0 +1,204 @@
+"""
+Per-level wide matrix index over the long-format ``rdd.counts`` table.
+
+The counts table is scanned once; every ontology level becomes a
+``samples × reference_type`` matrix with integer-coded rows (into one shared
+sample axis) and columns.  Pages slice this index instead of filtering and
+re-pivoting the long table on every rerun.
+
+Levels that are large and mostly zero (deep ontology levels, ``level=0``
+file-level counts) are stored as SciPy CSR matrices instead of dense arrays;
+see ``SPARSE_MAX_DENSITY`` / ``SPARSE_MIN_CELLS``.
+
+The index is cached on the RDDCounts object itself (``rdd._level_index``) and
+rebuilt automatically when ``rdd.counts`` is replaced or announced as edited
+(:mod:`src.counts_version`).  Group labels only
+affect colouring, so they are held separately and refreshed by
+``set_group`` without touching the matrices.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.counts_version import CountsStamp, counts_version
+
+# A level is stored sparse when it has at least SPARSE_MIN_CELLS cells and at
+# most SPARSE_MAX_DENSITY of them are non-zero.
+SPARSE_MIN_CELLS = 1_000_000
+SPARSE_MAX_DENSITY = 0.1
+
+
+class LevelMatrix:
+    """
+    Counts of one ontology level in wide form.
+
+    Attributes
+    ----------
+    level : int
+        Ontology level.
+    sample_codes : np.ndarray
+        Row → position in the index's shared sample axis.
+    samples : np.ndarray
+        Row → sample filename.
+    types : np.ndarray
+        Column → reference type.
+    values : np.ndarray or scipy.sparse.csr_matrix
+        ``len(samples) × len(types)`` count matrix.
+    """
+
+    def __init__(self, level, sample_codes, samples, types, values):
+        self.level = level
+        self.sample_codes = sample_codes
+        self.samples = samples
+        self.types = types
+        self.values = values
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def is_sparse(self) -> bool:
+        return not isinstance(self.values, np.ndarray)
+
+    def dense(self) -> np.ndarray:
+        """Counts as a dense array (materialises sparse levels)."""
+        return self.values.toarray() if self.is_sparse else self.values
+
+    def select_types(self, reference_types: Optional[Sequence[str]]) -> "LevelMatrix":
+        """Return the sub-matrix restricted to `reference_types` (None = all)."""
+        if not reference_types:
+            return self
+        cols = np.flatnonzero(np.isin(self.types, list(reference_types)))
+        if len(cols) == len(self.types):
+            return self
+        if len(cols) and cols[-1] - cols[0] + 1 == len(cols):
+            cols = slice(cols[0], cols[-1] + 1)  # contiguous: dense values stay a view
+        return LevelMatrix(
+            self.level, self.sample_codes, self.samples, self.types[cols], self.values[:, cols]
+        )
+
+    def proportions(self):
+        """Row-normalised counts (each sample sums to 1); sparse stays sparse."""
+        totals = np.asarray(self.values.sum(axis=1)).ravel()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scale = np.nan_to_num(1.0 / totals, posinf=0.0)
+        if self.is_sparse:
+            from scipy import sparse
+
+            return sparse.diags(scale) @ self.values
+        return self.values * scale[:, None]
+
+    def to_frame(self, groups: Optional[pd.Series] = None) -> pd.DataFrame:
+        """
+        Wide DataFrame indexed by filename, one column per reference type.
+
+        If `groups` (filename → group) is given a ``group`` column is added,
+        matching the layout of ``rdd.utils.RDD_counts_to_wide``.
+        """
+        index = pd.Index(self.samples, name="filename")
+        if self.is_sparse:
+            df = pd.DataFrame.sparse.from_spmatrix(self.values, index=index, columns=self.types)
+        else:
+            df = pd.DataFrame(self.values, index=index, columns=self.types)
+        if groups is not None:
+            df["group"] = groups.reindex(self.samples).to_numpy()
+        return df
+
+
+class LevelIndex:
+    """
+    All levels of a counts table, built in a single pass.
+
+    Parameters
+    ----------
+    counts : pd.DataFrame
+        Long table with ``filename``, ``reference_type``, ``count`` and
+        ``level`` columns (and optionally ``group``).
+    sparse : bool, optional
+        Force sparse (True) or dense (False) storage for every level.  The
+        default picks per level from its size and density.
+    version : int
+        :func:`src.counts_version.counts_version` of the table.
+    """
+
+    def __init__(
+        self, counts: pd.DataFrame, sparse: Optional[bool] = None, version: int = 0
+    ) -> None:
+        self._stamp = CountsStamp(counts, version)
+
+        row_codes, samples = pd.factorize(counts["filename"], sort=True)
+        self.samples = np.asarray(samples)
+        self.levels: Dict[int, LevelMatrix] = {}
+
+        count_values = counts["count"].to_numpy()
+        for level, positions in counts.groupby("level", sort=True).indices.items():
+            rows = row_codes[positions]
+            col_codes, types = pd.factorize(counts["reference_type"].iloc[positions], sort=True)
+            present, local_rows = np.unique(rows, return_inverse=True)
+            shape = (len(present), len(types))
+            values = _build_matrix(local_rows, col_codes, count_values[positions], shape, sparse)
+            self.levels[int(level)] = LevelMatrix(
+                int(level), present, self.samples[present], np.asarray(types), values
+            )
+
+        # Results derived from the matrices (CLR transforms, PCA fits); they
+        # live and die with the index, i.e. with this ``rdd.counts`` object.
+        self.derived: Dict[Any, Any] = {}
+
+        self.groups = pd.Series(dtype=object)
+        if "group" in counts.columns:
+            self.set_groups(counts.drop_duplicates("filename").set_index("filename")["group"])
+
+    # ────────────────────── lookups ──────────────────────
+    def matches(self, counts: pd.DataFrame, version: int = 0) -> bool:
+        """True if this index was built from `counts` at `version`."""
+        return self._stamp.matches(counts, version)
+
+    def level(self, level: int) -> LevelMatrix:
+        """Return the wide matrix of `level` (KeyError if absent)."""
+        return self.levels[int(level)]
+
+    def reference_types(self, level: int) -> List[str]:
+        """Reference types present at `level`, sorted."""
+        matrix = self.levels.get(int(level))
+        return [] if matrix is None else matrix.types.tolist()
+
+    def set_groups(self, mapping: pd.Series) -> None:
+        """Replace the filename → group labels (does not touch the matrices)."""
+        self.groups = mapping.reindex(self.samples)
+
+
+def _use_sparse(nnz: int, shape, sparse: Optional[bool]) -> bool:
+    if sparse is not None:
+        return sparse
+    cells = shape[0] * shape[1]
+    return cells >= SPARSE_MIN_CELLS and nnz <= SPARSE_MAX_DENSITY * cells
+
+
+def _build_matrix(rows, cols, weights, shape, sparse: Optional[bool]):
+    """Sum `weights` into a dense array or CSR matrix of `shape`."""
+    if _use_sparse(len(weights), shape, sparse):
+        from scipy.sparse import coo_matrix
+
+        return coo_matrix((weights.astype(float), (rows, cols)), shape=shape).tocsr()
+    flat = rows * shape[1] + cols
+    return np.bincount(flat, weights=weights, minlength=shape[0] * shape[1]).reshape(shape)
+
+
+def get_level_index(rdd: Any) -> LevelIndex:
+    """
+    Return the LevelIndex of `rdd`, building it on first use.
+
+    The index is stored on the object, so it travels with the RDDCounts
+    instance kept in session state and is rebuilt only when ``rdd.counts``
+    has been replaced or edited (:func:`src.counts_version.counts_changed`).
+    """
+    index = getattr(rdd, "_level_index", None)
+    version = counts_version(rdd)
+    if index is None or not index.matches(rdd.counts, version):
+        index = LevelIndex(rdd.counts, version=version)
+        rdd._level_index = index
+    return index
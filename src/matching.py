@@ -0,0 +1,193 @@
+"""
+Integer-encoded sample × reference matching over a molecular network.
+
+RDD counting matches sample files to reference files through the network
+clusters they share.  Joining string file names with pandas merges is
+quadratic in the size of busy clusters and holds several object copies of
+the network; here everything is integer-coded once and the join is a sparse
+matrix product:
+
+• encode  – :func:`src.network.read_membership` streams the network into
+  int32 (cluster, file) pairs; files are split into sample and reference
+  columns by their stem
+• index   – :class:`ClusterIndex`, a CSR cluster → member-files index
+• match   – with ``S`` (clusters × samples, spectrum counts) and ``R``
+  (clusters × references, presence), the file-level counts are
+  ``C = Sᵀ R``: the number of a sample's spectra that fall in clusters
+  holding the reference (``weight="clusters"`` counts shared clusters)
+• levels  – ``C @ T_k`` with ``T_k`` the references × terms indicator of
+  ontology level ``k``
+
+Results are returned as the long ``filename`` / ``reference_type`` /
+``count`` / ``level`` tables of ``RDDCounts.counts``.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.level_counts import strip_extension
+from src.network import ClusterMembership, read_membership
+
+WEIGHTS = ("spectra", "clusters")
+
+
+@dataclass(frozen=True)
+class ClusterIndex:
+    """CSR index of the member files of every cluster."""
+
+    indptr: np.ndarray  # members of cluster c: indptr[c]:indptr[c + 1]
+    members: np.ndarray  # int32 file codes
+    spectra: np.ndarray  # int32 spectra of each member
+
+    @property
+    def n_clusters(self) -> int:
+        return len(self.indptr) - 1
+
+    def members_of(self, cluster: int) -> np.ndarray:
+        return self.members[self.indptr[cluster] : self.indptr[cluster + 1]]
+
+    def matrix(self, columns: np.ndarray, n_columns: int, binary: bool = False) -> Any:
+        """
+        Sparse ``clusters × n_columns`` matrix of the files mapped by `columns`.
+
+        `columns` maps every file code to a column (-1: left out); entries
+        are spectrum counts, or 1 if `binary`.
+        """
+        from scipy.sparse import csr_matrix
+
+        column = columns[self.members]
+        keep = column >= 0
+        rows = np.repeat(np.arange(self.n_clusters, dtype=np.int32), np.diff(self.indptr))
+        values = np.ones(keep.sum(), dtype=np.int32) if binary else self.spectra[keep]
+        return csr_matrix((values, (rows[keep], column[keep])), shape=(self.n_clusters, n_columns))
+
+
+def cluster_index(membership: ClusterMembership) -> ClusterIndex:
+    """CSR index of `membership` (whose pairs are sorted by cluster)."""
+    sizes = np.bincount(membership.cluster_codes, minlength=len(membership.clusters))
+    indptr = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=indptr[1:])
+    return ClusterIndex(indptr, membership.file_codes, membership.spectra)
+
+
+@dataclass(frozen=True)
+class MatchCounts:
+    """File-level sample × reference counts (``matrix`` is a sparse CSR matrix)."""
+
+    samples: np.ndarray
+    references: np.ndarray
+    matrix: Any
+
+    def _long(self, matrix: Any, columns: np.ndarray, level: int, groups) -> pd.DataFrame:
+        coo = matrix.tocoo()
+        order = np.lexsort((coo.col, coo.row))
+        frame = pd.DataFrame(
+            {
+                "filename": self.samples[coo.row[order]],
+                "reference_type": columns[coo.col[order]],
+                "count": coo.data[order],
+                "level": level,
+            }
+        )
+        if groups is not None:
+            frame["group"] = pd.Series(groups).reindex(frame["filename"]).to_numpy()
+        return frame
+
+    def file_counts(self, groups: Optional[Mapping[str, str]] = None) -> pd.DataFrame:
+        """Level-0 rows, one per matched (sample, reference file); `groups`: sample → group."""
+        return self._long(self.matrix, self.references, 0, groups)
+
+    def level_counts(
+        self,
+        reference_metadata: pd.DataFrame,
+        ontology_columns: Sequence[str],
+        groups: Optional[Mapping[str, str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Rows of levels 1..N: the file-level counts summed per ontology term.
+
+        Matches :func:`src.level_counts.aggregate_levels` applied to
+        :meth:`file_counts`.
+        """
+        from scipy.sparse import csr_matrix
+
+        stems = strip_extension(reference_metadata["filename"])
+        first = ~stems.duplicated().to_numpy()
+        position = pd.Index(stems[first]).get_indexer(self.references)
+        per_level = []
+        for i, col in enumerate(ontology_columns):
+            codes, terms = pd.factorize(reference_metadata.loc[first, col])
+            ref_codes = np.where(position >= 0, codes[position], -1)
+            keep = ref_codes >= 0
+            indicator = csr_matrix(
+                (
+                    np.ones(keep.sum(), dtype=self.matrix.dtype),
+                    (np.flatnonzero(keep), ref_codes[keep]),
+                ),
+                shape=(len(self.references), len(terms)),
+            )
+            per_level.append(self._long(self.matrix @ indicator, np.asarray(terms), i + 1, groups))
+        if not per_level:
+            return self.file_counts().iloc[:0]
+        return pd.concat(per_level, ignore_index=True)
+
+
+def match(
+    membership: ClusterMembership,
+    reference_files: Sequence[str],
+    sample_files: Optional[Sequence[str]] = None,
+    weight: str = "spectra",
+) -> MatchCounts:
+    """
+    Count sample × reference co-occurrences in the clusters of `membership`.
+
+    Parameters
+    ----------
+    membership : ClusterMembership
+        The network (:func:`src.network.read_membership`).
+    reference_files : sequence of str
+        Reference file names (with or without extension); network files
+        among them are references, every other file is a sample.
+    sample_files : sequence of str, optional
+        Restrict the samples to these files.
+    weight : {"spectra", "clusters"}
+        Count a sample's spectra in clusters holding the reference, or the
+        number of clusters they share.
+    """
+    if weight not in WEIGHTS:
+        raise ValueError(f"weight must be one of {WEIGHTS}, got {weight!r}")
+    files = pd.Index(membership.files)
+    reference_keys = pd.Index(strip_extension(pd.Series(reference_files)).unique())
+    is_reference = reference_keys.get_indexer(files) >= 0
+    is_sample = ~is_reference
+    if sample_files is not None:
+        is_sample &= files.isin(strip_extension(pd.Series(sample_files)))
+
+    def columns(mask: np.ndarray) -> np.ndarray:
+        mapping = np.full(len(files), -1, dtype=np.int32)
+        mapping[mask] = np.arange(mask.sum(), dtype=np.int32)
+        return mapping
+
+    index = cluster_index(membership)
+    samples = index.matrix(columns(is_sample), int(is_sample.sum()), binary=weight == "clusters")
+    references = index.matrix(columns(is_reference), int(is_reference.sum()), binary=True)
+    counts = (samples.T.tocsr().astype(np.int64) @ references).tocsr()
+    counts.eliminate_zeros()
+    return MatchCounts(
+        samples=np.asarray(files[is_sample], dtype=object),
+        references=np.asarray(files[is_reference], dtype=object),
+        matrix=counts,
+    )
+
+
+def match_network(
+    path: str,
+    reference_files: Sequence[str],
+    sample_files: Optional[Sequence[str]] = None,
+    weight: str = "spectra",
+) -> MatchCounts:
+    """:func:`match` on the network table at `path`, streamed with column projection."""
+    return match(read_membership(path), reference_files, sample_files, weight)
@@ -0,0 +1,305 @@
+"""
+Streaming reader for GNPS network tables.
+
+A GNPS1 ``view_all_clusters_withID`` or GNPS2 ``clusterinfo.tsv`` table has
+one row per spectrum and a dozen or more columns, but RDD counting only
+needs three of them: the cluster index, the spectrum file name and, for
+GNPS1, ``DefaultGroups``.  :func:`iter_network` reads just those columns
+(column projection) in fixed-size chunks with dtype hints (integer cluster
+ids, dictionary-encoded file names), using pyarrow's streaming CSV reader
+when pyarrow is installed and chunked pandas otherwise, so memory is bounded
+by the chunk size rather than the file size.
+
+On top of it:
+
+• :func:`project_network` streams the projected columns into a slim copy of
+  the table (optionally without some files' rows); builds hand that copy to
+  RDDCounts instead of the full file
+• :func:`read_membership` builds the file → cluster membership table
+  (:class:`ClusterMembership`) incrementally, dictionary-encoded to int32,
+  keeping only distinct (cluster, file) pairs and their spectrum counts
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.ingest import sep_for
+from src.level_counts import strip_extension
+
+# Column names used by GNPS1 / GNPS2 exports, in order of preference
+CLUSTER_COLUMNS = ("#ClusterIdx", "cluster index", "ClusterIdx")
+FILENAME_COLUMNS = ("#Filename", "Filename", "filename", "Original_Filename")
+GROUP_COLUMN = "DefaultGroups"
+
+CHUNK_BYTES = 16 << 20  # bytes of text per pyarrow block
+CHUNK_ROWS = 200_000  # rows per chunk with the pandas engine
+COMPACT_PAIRS = 2_000_000  # pending (cluster, file) pairs before they are merged
+FILE_BITS = 24  # file codes in the low bits of a packed (cluster, file) key
+
+
+@dataclass(frozen=True)
+class NetworkColumns:
+    """The network columns RDD counting reads (``groups`` is GNPS1 only)."""
+
+    cluster: str
+    filename: str
+    groups: Optional[str] = None
+
+    @property
+    def names(self) -> List[str]:
+        return [c for c in (self.cluster, self.filename, self.groups) if c]
+
+
+def network_columns(header: Sequence[str]) -> NetworkColumns:
+    """
+    Find the cluster, file name and group columns in a network `header`.
+
+    Raises
+    ------
+    ValueError
+        If no cluster index or file name column is present.
+    """
+    present = set(header)
+    cluster = next((c for c in CLUSTER_COLUMNS if c in present), None)
+    filename = next((c for c in FILENAME_COLUMNS if c in present), None)
+    if cluster is None or filename is None:
+        raise ValueError(
+            "Not a GNPS network table: expected a cluster index column "
+            f"({', '.join(CLUSTER_COLUMNS)}) and a file name column "
+            f"({', '.join(FILENAME_COLUMNS)})."
+        )
+    return NetworkColumns(cluster, filename, GROUP_COLUMN if GROUP_COLUMN in present else None)
+
+
+def _engine(engine: Optional[str]) -> str:
+    if engine is not None:
+        return engine
+    try:
+        import pyarrow.csv  # noqa: F401
+    except ImportError:
+        return "pandas"
+    return "pyarrow"
+
+
+def iter_network(
+    path: str,
+    columns: Optional[NetworkColumns] = None,
+    engine: Optional[str] = None,
+    chunk_bytes: int = CHUNK_BYTES,
+    chunk_rows: int = CHUNK_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield the projected columns of a network table in chunks.
+
+    Parameters
+    ----------
+    path : str
+        Network table; ``.tsv`` / ``.txt`` are tab separated, others commas.
+    columns : NetworkColumns, optional
+        Columns to read; found from the header by default.
+    engine : {"pyarrow", "pandas"}, optional
+        Default: pyarrow's streaming reader when installed.
+    chunk_bytes, chunk_rows : int
+        Chunk size of the pyarrow / pandas engine.
+
+    Yields
+    ------
+    pd.DataFrame
+        Int64 cluster ids, categorical file names (and groups).
+    """
+    sep = sep_for(path)
+    if columns is None:
+        columns = network_columns(pd.read_csv(path, sep=sep, nrows=0).columns)
+
+    if _engine(engine) == "pyarrow":
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+
+        text = pa.dictionary(pa.int32(), pa.string())
+        reader = pa_csv.open_csv(
+            path,
+            read_options=pa_csv.ReadOptions(block_size=chunk_bytes),
+            parse_options=pa_csv.ParseOptions(delimiter=sep),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=columns.names,
+                column_types={columns.cluster: pa.int64(), **{c: text for c in columns.names[1:]}},
+            ),
+        )
+        for batch in reader:
+            yield batch.to_pandas()
+    else:
+        dtype = {columns.cluster: "int64", **{c: "category" for c in columns.names[1:]}}
+        yield from pd.read_csv(
+            path, sep=sep, usecols=columns.names, dtype=dtype, chunksize=chunk_rows
+        )
+
+
+def project_network(
+    path: str,
+    target: str,
+    engine: Optional[str] = None,
+    exclude: Optional[Sequence[str]] = None,
+) -> str:
+    """
+    Stream the cluster, file name and group columns of `path` into `target`.
+
+    The copy keeps the original column names and values and has the
+    separator implied by `target`'s extension.  Rows of the files in
+    `exclude` (names with or without directory / extension) are left out.
+
+    Returns
+    -------
+    str
+        `target`.
+    """
+    header = True
+    sep = sep_for(target)
+    columns = network_columns(pd.read_csv(path, sep=sep_for(path), nrows=0).columns)
+    excluded = None if exclude is None else file_stem(pd.Series(exclude, dtype=object)).unique()
+    with open(target, "w", newline="") as out:
+        for chunk in iter_network(path, columns, engine=engine):
+            if excluded is not None:
+                names = chunk[columns.filename].cat
+                dropped = file_stem(pd.Series(names.categories)).isin(excluded).to_numpy()
+                chunk = chunk[~np.append(dropped, False)[names.codes]]  # code -1: no name
+            chunk.to_csv(out, sep=sep, index=False, header=header)
+            header = False
+    if header:  # empty table: still write the header
+        pd.DataFrame(columns=columns.names).to_csv(target, sep=sep, index=False)
+    return target
+
+
+def file_stem(names: pd.Series) -> pd.Series:
+    """Spectrum file names without directory and mzML/mzXML/mgf extension."""
+    return strip_extension(names.astype(str).str.rsplit("/", n=1).str[-1])
+
+
+@dataclass(frozen=True)
+class ClusterMembership:
+    """
+    Which spectrum files have spectra in which network clusters.
+
+    Files and clusters are dictionary-encoded: ``file_codes[i]`` and
+    ``cluster_codes[i]`` index ``files`` and ``clusters``, and ``spectra[i]``
+    counts the spectra of that (cluster, file) pair.  Pairs are distinct and
+    sorted by cluster.
+    """
+
+    files: np.ndarray  # file stems
+    file_groups: np.ndarray  # DefaultGroups of each file (None without the column)
+    clusters: np.ndarray  # original cluster ids
+    cluster_codes: np.ndarray
+    file_codes: np.ndarray
+    spectra: np.ndarray
+
+    @property
+    def n_spectra(self) -> int:
+        return int(self.spectra.sum())
+
+    def to_frame(self) -> pd.DataFrame:
+        """Long ``filename`` / ``cluster`` / ``spectra`` table (plus ``DefaultGroups``)."""
+        frame = pd.DataFrame(
+            {
+                "filename": pd.Categorical.from_codes(self.file_codes, self.files),
+                "cluster": self.clusters[self.cluster_codes],
+                "spectra": self.spectra,
+            }
+        )
+        if any(g is not None for g in self.file_groups):
+            frame[GROUP_COLUMN] = self.file_groups[self.file_codes]
+        return frame
+
+
+class _MembershipBuilder:
+    """Accumulates (cluster, file) pair counts chunk by chunk."""
+
+    def __init__(self) -> None:
+        self.file_index: Dict[str, int] = {}
+        self.groups: List[Optional[str]] = []
+        self._pending: List[np.ndarray] = []  # rows of (cluster, file code, spectra)
+        self._n_pending = 0
+
+    def _file_codes(self, names: pd.Categorical, groups: Optional[pd.Series]) -> np.ndarray:
+        # encode the chunk's categories (few), then map the per-row codes
+        stems = file_stem(pd.Series(names.categories)).tolist()
+        first_group = {}
+        if groups is not None:
+            labelled = pd.DataFrame({"code": names.codes, "group": groups.to_numpy()})
+            first_group = labelled.drop_duplicates("code").set_index("code")["group"].to_dict()
+        lookup = np.empty(len(stems), dtype=np.int32)
+        for i, stem in enumerate(stems):
+            code = self.file_index.get(stem)
+            if code is None:
+                code = self.file_index[stem] = len(self.groups)
+                group = first_group.get(i)
+                self.groups.append(None if pd.isna(group) else str(group))
+            lookup[i] = code
+        return lookup[names.codes]
+
+    def add(self, chunk: pd.DataFrame, columns: NetworkColumns) -> None:
+        names = chunk[columns.filename]
+        keep = names.notna().to_numpy() & chunk[columns.cluster].notna().to_numpy()
+        if not keep.all():
+            chunk = chunk[keep]
+            names = chunk[columns.filename]
+        if not len(chunk):
+            return
+        files = self._file_codes(
+            pd.Categorical(names), chunk[columns.groups] if columns.groups else None
+        )
+        clusters = chunk[columns.cluster].to_numpy(np.int64)
+        if clusters.min() < 0 or clusters.max() >= 1 << (63 - FILE_BITS):
+            raise ValueError("Cluster indices must be non-negative and below 2**39.")
+        # one sortable int64 key per (cluster, file) pair
+        keys, counts = np.unique((clusters << FILE_BITS) | files, return_counts=True)
+        self._pending.append((keys, counts))
+        self._n_pending += len(keys)
+        if self._n_pending > COMPACT_PAIRS:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Merge pending pairs that repeat across chunks (clusters span chunks)."""
+        if len(self._pending) <= 1:
+            return
+        keys, inverse = np.unique(
+            np.concatenate([k for k, _ in self._pending]), return_inverse=True
+        )
+        counts = np.bincount(
+            inverse, weights=np.concatenate([c for _, c in self._pending]), minlength=len(keys)
+        )
+        self._pending = [(keys, counts.astype(np.int64))]
+        self._n_pending = len(keys)
+
+    def finish(self) -> ClusterMembership:
+        if len(self.groups) >= 1 << FILE_BITS:
+            raise ValueError(f"More than 2**{FILE_BITS} spectrum files in the network.")
+        self._compact()
+        keys, counts = self._pending[0] if self._pending else (np.zeros(0, np.int64),) * 2
+        clusters, cluster_codes = np.unique(keys >> FILE_BITS, return_inverse=True)
+        files = np.empty(len(self.groups), dtype=object)
+        files[list(self.file_index.values())] = list(self.file_index)
+        return ClusterMembership(
+            files=files,
+            file_groups=np.asarray(self.groups, dtype=object),
+            clusters=clusters,
+            cluster_codes=cluster_codes.astype(np.int32),
+            file_codes=(keys & ((1 << FILE_BITS) - 1)).astype(np.int32),
+            spectra=counts.astype(np.int32),
+        )
+
+
+def read_membership(path: str, engine: Optional[str] = None, **chunking) -> ClusterMembership:
+    """
+    Stream a network table into its :class:`ClusterMembership`.
+
+    Memory is bounded by one chunk plus the distinct (cluster, file) pairs;
+    `chunking` is passed on to :func:`iter_network`.
+    """
+    columns = network_columns(pd.read_csv(path, sep=sep_for(path), nrows=0).columns)
+    builder = _MembershipBuilder()
+    for chunk in iter_network(path, columns, engine=engine, **chunking):
+        builder.add(chunk, columns)
+    return builder.finish()
@@ -0,0 +1,112 @@
+"""
+PCA on the shared per-level index.
+
+Equivalent to ``rdd.analysis.perform_pca_RDD_counts`` but starts from the
+pre-pivoted matrix in :mod:`src.level_index` instead of re-pivoting
+``rdd.counts``.
+
+Fits are memoised in ``LevelIndex.derived`` under ``(level, apply_clr,
+n_components)``, as is the CLR-transformed matrix of each level, so they are
+dropped with the index whenever ``rdd.counts`` is replaced.  Group labels are
+not part of the fit: :func:`perform_pca` attaches the current labels to the
+cached scores, so relabelling only changes the colouring.
+"""
+
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.composition import clr_transform
+from src.level_index import LevelIndex
+
+
+@dataclass(frozen=True)
+class PCAFit:
+    """Scores and explained variance of one fitted decomposition."""
+
+    scores: np.ndarray
+    explained_variance_ratio: np.ndarray
+    samples: np.ndarray
+
+
+def clr_matrix(index: LevelIndex, level: int) -> np.ndarray:
+    """CLR transform (after multiplicative zero replacement) of `level`, memoised."""
+    key = ("clr", int(level))
+    if key not in index.derived:
+        index.derived[key] = clr_transform(index.level(level).values)
+    return index.derived[key]
+
+
+def fit_pca(
+    index: LevelIndex,
+    level: int = 3,
+    n_components: int = 3,
+    apply_clr: bool = True,
+) -> PCAFit:
+    """
+    Fit PCA on one ontology level, reusing a previous fit when available.
+
+    Parameters are those of :func:`perform_pca`.
+    """
+    matrix = index.level(level)
+    n_components = min(n_components, *matrix.shape)
+    key = ("pca", int(level), bool(apply_clr), n_components)
+    if key in index.derived:
+        return index.derived[key]
+
+    from sklearn.decomposition import PCA
+
+    if apply_clr:
+        X = clr_matrix(index, level)
+        pca = PCA(n_components=n_components)
+    elif matrix.is_sparse and n_components < min(matrix.shape):
+        # ARPACK centres implicitly, so the CSR matrix is never densified
+        X = matrix.values
+        pca = PCA(n_components=n_components, svd_solver="arpack", random_state=0)
+    else:
+        X = matrix.dense().astype(float)
+        pca = PCA(n_components=n_components)
+    scores = pca.fit_transform(X)
+
+    fit = PCAFit(scores, pca.explained_variance_ratio_, matrix.samples)
+    index.derived[key] = fit
+    return fit
+
+
+def perform_pca(
+    index: LevelIndex,
+    level: int = 3,
+    n_components: int = 3,
+    apply_clr: bool = True,
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Run PCA on the counts of one ontology level.
+
+    Parameters
+    ----------
+    index : LevelIndex
+        Index of the RDDCounts object (see ``get_level_index``).
+    level : int
+        Ontology level to analyse.
+    n_components : int
+        Number of principal components (capped by the matrix shape).
+    apply_clr : bool
+        Apply a centred log-ratio transform (zeros handled by multiplicative
+        replacement) before fitting.  Without CLR, sparse levels are fitted
+        directly with the sparse-aware ARPACK solver.
+
+    Returns
+    -------
+    pca_df : pd.DataFrame
+        ``PC1..PCn`` scores plus ``filename`` and ``group`` columns.
+    explained_variance : np.ndarray
+        Explained variance ratio of each component.
+    """
+    fit = fit_pca(index, level=level, n_components=n_components, apply_clr=apply_clr)
+    n = fit.scores.shape[1]
+    pca_df = pd.DataFrame(fit.scores, columns=[f"PC{i + 1}" for i in range(n)])
+    pca_df["filename"] = fit.samples
+    pca_df["group"] = index.groups.reindex(fit.samples).to_numpy()
+    return pca_df, fit.explained_variance_ratio
@@ -0,0 +1,276 @@
+"""
+Per-stage timing and memory instrumentation.
+
+Pages wrap the stages of their pipeline in :meth:`PerfLog.stage`; every stage
+records its wall time, the process's peak RSS (high-water mark, so a stage
+that raises it shows a growth) and, when allocation tracing is switched on,
+the peak of the memory allocated while it ran (``tracemalloc``, which sees
+NumPy and pandas buffers but slows allocation-heavy code down).
+
+Both memory figures are per process, not per session: every Streamlit
+session runs in the one server process.  RSS is the whole process's, and
+tracing is switched on process-wide while any session has a traced stage
+running (one session never stops it under another).  A stage that overlaps
+other sessions' traced stages reports the peak of everything the process
+allocated since the earliest of them started.
+
+Builds run in worker processes (:mod:`src.jobs`), so :func:`src.build.build_rdd`
+times its own stages with a :class:`PerfLog` and hands the records back on the
+result; the page adds them to the session log with ``where="worker"``.
+
+Each Streamlit session keeps one bounded log (:func:`session_perf_log`);
+:func:`performance_panel` shows it in a collapsible sidebar panel and exports
+it as JSON, so a user's report can be attached to a bug without reproducing
+their session.  ``RDD_PERF_TRACEMALLOC=1`` turns allocation tracing on by
+default.
+"""
+
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Iterable, Iterator, List, Optional
+
+MAX_RECORDS = 500  # per session; the oldest records are dropped first
+# Faster stages are not recorded: on most reruns they are cache hits
+MIN_SECONDS = 0.005
+
+
+@dataclass(frozen=True)
+class StageTiming:
+    """One timed stage."""
+
+    page: str
+    stage: str
+    seconds: float
+    started: float  # wall clock (epoch seconds)
+    peak_rss_mib: Optional[float]  # process high-water mark after the stage (all sessions)
+    rss_growth_mib: Optional[float]  # how much the stage raised that mark
+    traced_peak_mib: Optional[float] = None  # only with allocation tracing (process-wide)
+    where: str = "app"  # "app" (script thread) or "worker" (build process)
+    error: Optional[str] = None  # exception type if the stage raised
+
+
+def peak_rss_mib() -> Optional[float]:
+    """Peak resident set size of this process in MiB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+_trace_lock = threading.Lock()
+_traced_stages = 0  # traced stages running in this process, any session
+_started_tracing = False  # tracing was switched on here (not by e.g. ``-X tracemalloc``)
+
+
+def _begin_tracing() -> int:
+    """Join process-wide allocation tracing; returns the traced bytes now."""
+    global _traced_stages, _started_tracing
+    with _trace_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        if not _traced_stages:  # nobody else is measuring a peak
+            tracemalloc.reset_peak()
+        _traced_stages += 1
+        return tracemalloc.get_traced_memory()[0]
+
+
+def _end_tracing(before: int) -> float:
+    """Leave tracing (stopped with the last traced stage); peak above `before` in MiB."""
+    global _traced_stages, _started_tracing
+    with _trace_lock:
+        peak = tracemalloc.get_traced_memory()[1]
+        _traced_stages -= 1
+        if not _traced_stages and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+    return max(0, peak - before) / 2**20
+
+
+def _tracing_default() -> bool:
+    return os.environ.get("RDD_PERF_TRACEMALLOC", "").lower() in ("1", "true", "yes")
+
+
+class PerfLog:
+    """
+    Bounded log of :class:`StageTiming` records.
+
+    Parameters
+    ----------
+    trace_allocations : bool, optional
+        Sample peak allocations with ``tracemalloc``; defaults to
+        ``RDD_PERF_TRACEMALLOC``.
+    max_records : int
+        Records kept; older ones are dropped.
+    min_seconds : float
+        Stages that finish faster (without raising) are not recorded.
+    """
+
+    def __init__(
+        self,
+        trace_allocations: Optional[bool] = None,
+        max_records: int = MAX_RECORDS,
+        min_seconds: float = MIN_SECONDS,
+    ) -> None:
+        self.trace_allocations = (
+            _tracing_default() if trace_allocations is None else trace_allocations
+        )
+        self.min_seconds = min_seconds
+        self._records: deque = deque(maxlen=max_records)
+        self._tracing = False
+
+    @contextmanager
+    def stage(self, page: str, stage: str) -> Iterator[None]:
+        """
+        Time the body of the ``with`` block as `stage` of `page`.
+
+        Exceptions propagate; the stage is still recorded with their type.
+        Nested stages are timed too, but only the outermost one traces
+        allocations (``tracemalloc`` has a single peak counter).
+        """
+        trace = self.trace_allocations and not self._tracing
+        if trace:
+            self._tracing = True
+            traced_before = _begin_tracing()
+        rss_before = peak_rss_mib()
+        started, start = time.time(), time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            traced = None
+            if trace:
+                traced = _end_tracing(traced_before)
+                self._tracing = False
+            if seconds >= self.min_seconds or error is not None:
+                rss_after = peak_rss_mib()
+                growth = None if None in (rss_before, rss_after) else rss_after - rss_before
+                self.add(
+                    StageTiming(
+                        page=page,
+                        stage=stage,
+                        seconds=seconds,
+                        started=started,
+                        peak_rss_mib=rss_after,
+                        rss_growth_mib=growth,
+                        traced_peak_mib=traced,
+                        error=error,
+                    )
+                )
+
+    def add(self, timing: StageTiming) -> None:
+        self._records.append(timing)
+
+    def extend(self, timings: Iterable[StageTiming], **changes: Any) -> None:
+        """Add `timings`, overriding fields with `changes` (e.g. ``where="worker"``)."""
+        for timing in timings:
+            self.add(StageTiming(**{**asdict(timing), **changes}))
+
+    def records(self) -> List[StageTiming]:
+        return list(self._records)
+
+    def clear(self) -> None:
+        self._records.clear()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def to_frame(self) -> Any:
+        """Records as a DataFrame, newest first."""
+        import pandas as pd
+
+        columns = list(StageTiming.__dataclass_fields__)
+        frame = pd.DataFrame([asdict(r) for r in reversed(self._records)], columns=columns)
+        frame["started"] = pd.to_datetime(frame["started"], unit="s")
+        return frame
+
+    def to_json(self) -> str:
+        """Records plus the interpreter / platform they were taken on."""
+        import pandas as pd
+
+        return json.dumps(
+            {
+                "environment": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "pandas": pd.__version__,
+                    "pid": os.getpid(),
+                    "trace_allocations": self.trace_allocations,
+                },
+                "stages": [asdict(r) for r in self._records],
+            },
+            indent=2,
+        )
+
+
+# ────────────────────── Streamlit ──────────────────────
+def session_perf_log() -> PerfLog:
+    """The :class:`PerfLog` of the current Streamlit session."""
+    import streamlit as st
+
+    if "perf_log" not in st.session_state:
+        st.session_state["perf_log"] = PerfLog()
+    log = st.session_state["perf_log"]
+    # the panel's checkbox is drawn last; pick its value up before any stage runs
+    log.trace_allocations = st.session_state.get("perf_trace_allocations", log.trace_allocations)
+    return log
+
+
+def performance_panel(max_rows: int = 50) -> None:
+    """Collapsible "Performance" sidebar panel with the session's stage timings."""
+    import streamlit as st
+
+    log = session_perf_log()
+    with st.sidebar.expander("⏱️ Performance"):
+        log.trace_allocations = st.checkbox(
+            "Trace allocations",
+            value=log.trace_allocations,
+            key="perf_trace_allocations",
+            help="Record the peak memory allocated while each stage runs (tracemalloc, "
+            "process-wide); slows stages down",
+        )
+        if not len(log):
+            st.caption("No stages timed yet in this session.")
+            return
+        frame = log.to_frame()
+        shown = {
+            "page": "page",
+            "stage": "stage",
+            "seconds": "seconds",
+            "peak_rss_mib": "process peak RSS (MiB)",
+            "rss_growth_mib": "process RSS growth (MiB)",
+            "traced_peak_mib": "traced peak (MiB)",
+        }
+        st.dataframe(
+            frame[list(shown)].head(max_rows).round(3).rename(columns=shown), hide_index=True
+        )
+        st.caption(
+            "Memory columns are for the whole server process, which every session shares; "
+            "they include other sessions' work running at the same time."
+        )
+        c1, c2 = st.columns(2)
+        c1.download_button(
+            "📥 JSON",
+            data=log.to_json(),
+            file_name="rdd_performance.json",
+            mime="application/json",
+            key="perf_download",
+        )
+        if c2.button("Clear", key="perf_clear"):
+            log.clear()
+            st.rerun()
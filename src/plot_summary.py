@@ -0,0 +1,335 @@
+"""
+Server-side aggregation for the page 2 plots.
+
+The library's Plotly figures embed one point per sample × reference type, so
+on large studies the figure JSON grows with the number of samples.  The
+summaries below are computed from the per-level index (:mod:`src.level_index`)
+on the server and only the aggregates are sent to the browser:
+
+• box plots  – quartiles, whiskers (1.5 × IQR, as Plotly draws them), mean
+  and at most ``max_outliers`` outliers per box
+• bar plots  – total counts per group × reference type
+• heatmaps   – sample rows averaged into at most ``max_rows`` tiles; tiles
+  never mix groups
+
+Payload size therefore depends on groups × types (and the tile / outlier
+caps), not on the number of samples.  Plotly is imported only by the figure
+builders.
+"""
+
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.level_index import LevelIndex, LevelMatrix
+
+ALL_SAMPLES = "All samples"
+
+
+def _proportions(
+    index: LevelIndex, level: int, reference_types: Optional[Sequence[str]]
+) -> LevelMatrix:
+    """Row-normalised `level` (over all types), then restricted to `reference_types`."""
+    matrix = index.level(level)
+    scaled = LevelMatrix(
+        matrix.level, matrix.sample_codes, matrix.samples, matrix.types, matrix.proportions()
+    )
+    return scaled.select_types(reference_types)
+
+
+def _row_groups(index: LevelIndex, matrix: LevelMatrix, group_by: bool) -> np.ndarray:
+    if not group_by or index.groups.empty:
+        return np.full(len(matrix.samples), ALL_SAMPLES, dtype=object)
+    groups = index.groups.to_numpy(dtype=object)[matrix.sample_codes]
+    return np.where(pd.isna(groups), "NA", groups).astype(str).astype(object)
+
+
+# ────────────────────── summaries ──────────────────────
+def box_summary(
+    index: LevelIndex,
+    level: int,
+    reference_types: Optional[Sequence[str]] = None,
+    group_by: bool = True,
+    max_outliers: int = 50,
+) -> pd.DataFrame:
+    """
+    Box statistics of the per-sample proportions, one row per group × type.
+
+    Parameters
+    ----------
+    index : LevelIndex
+        Index of the counts table (with its current group labels).
+    level : int
+        Ontology level.
+    reference_types : sequence of str, optional
+        Types to summarise (None = all at `level`).
+    group_by : bool
+        One box per group and type; otherwise one box per type.
+    max_outliers : int
+        Outliers kept per box, the most extreme first.
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns ``group, reference_type, n, q1, median, q3, lowerfence,
+        upperfence, mean, outliers`` (outliers is a list per row).
+    """
+    matrix = _proportions(index, level, reference_types)
+    groups = _row_groups(index, matrix, group_by)
+    frames = []
+    for group in pd.unique(groups):
+        stats = _column_stats(matrix.values[groups == group], max_outliers)
+        stats.insert(0, "reference_type", matrix.types)
+        stats.insert(0, "group", group)
+        frames.append(stats)
+    columns = ["group", "reference_type", "n", "q1", "median", "q3"]
+    columns += ["lowerfence", "upperfence", "mean", "outliers"]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns]
+
+
+def _sorted_columns(values: Any):
+    """
+    The stored values of each column in ascending order, as one flat array.
+
+    Returns ``(data, starts, stored, implicit)``: column ``j`` holds
+    ``data[starts[j] : starts[j] + stored[j]]`` plus ``implicit[j]`` zeros
+    that a sparse matrix does not store.
+    """
+    n_rows, n_cols = values.shape
+    if hasattr(values, "tocsc"):
+        csc = values.tocsc()
+        stored = np.diff(csc.indptr)
+        columns = np.repeat(np.arange(n_cols), stored)
+        data = csc.data[np.lexsort((csc.data, columns))]
+        starts = csc.indptr[:-1]
+    else:
+        data = np.sort(np.asarray(values, dtype=float), axis=0).T.ravel()
+        stored = np.full(n_cols, n_rows)
+        starts = np.arange(n_cols) * n_rows
+    return data.astype(float), starts, stored, n_rows - stored
+
+
+def _column_stats(values: Any, max_outliers: int) -> pd.DataFrame:
+    """
+    Box statistics of every column of `values` (dense or sparse).
+
+    Sparse columns are summarised from their stored values plus a count of
+    the zeros they leave out, so a block is never densified.
+    """
+    n = values.shape[0]
+    data, starts, stored, implicit = _sorted_columns(values)
+    columns = np.repeat(np.arange(len(starts)), stored)
+    negative = np.bincount(columns[data < 0], minlength=len(starts))
+    padded = np.append(data, 0.0)  # valid gather target for all-zero columns
+
+    def kth(k):
+        """k-th smallest value of each column, implicit zeros included."""
+        zero = (k >= negative) & (k < negative + implicit)
+        position = np.where(k < negative, k, k - implicit)
+        position = starts + np.clip(position, 0, np.maximum(stored - 1, 0))
+        return np.where(zero | (stored == 0), 0.0, padded[position])
+
+    def quantile(q):
+        position = q * (n - 1)
+        below = int(np.floor(position))
+        low = kth(np.full(len(starts), below))
+        high = kth(np.full(len(starts), min(below + 1, n - 1)))
+        return low + (high - low) * (position - below)
+
+    q1, median, q3 = quantile(0.25), quantile(0.5), quantile(0.75)
+    iqr = q3 - q1
+    low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+    inside = (data >= low[columns]) & (data <= high[columns])
+    zero_inside = (implicit > 0) & (low <= 0) & (high >= 0)
+    lowerfence = np.where(zero_inside, 0.0, np.inf)
+    upperfence = np.where(zero_inside, 0.0, -np.inf)
+    np.minimum.at(lowerfence, columns[inside], data[inside])
+    np.maximum.at(upperfence, columns[inside], data[inside])
+    means = np.bincount(columns, weights=data, minlength=len(starts)) / n
+
+    # outliers: stored values outside the whiskers, plus the left-out zeros if outside
+    zero_out = (implicit > 0) & ~zero_inside
+    zero_columns = np.repeat(np.flatnonzero(zero_out), np.minimum(implicit, max_outliers)[zero_out])
+    out_columns = np.concatenate([columns[~inside], zero_columns])
+    out_values = np.concatenate([data[~inside], np.zeros(len(zero_columns))])
+    distance = np.maximum(low[out_columns] - out_values, out_values - high[out_columns])
+    order = np.lexsort((-distance, out_columns))
+    out_columns, out_values = out_columns[order], out_values[order]
+    first = np.searchsorted(out_columns, np.arange(len(starts)))
+    kept = np.arange(len(out_columns)) - first[out_columns] < max_outliers
+    out_columns, out_values = out_columns[kept], out_values[kept]
+    bounds = np.searchsorted(out_columns, np.arange(1, len(starts)))
+    outliers = [chunk.tolist() for chunk in np.split(out_values, bounds)] if len(starts) else []
+
+    return pd.DataFrame(
+        {
+            "n": n,
+            "q1": q1,
+            "median": median,
+            "q3": q3,
+            "lowerfence": lowerfence,
+            "upperfence": upperfence,
+            "mean": means,
+            "outliers": outliers,
+        }
+    )
+
+
+def bar_summary(
+    index: LevelIndex,
+    level: int,
+    reference_types: Optional[Sequence[str]] = None,
+    group_by: bool = True,
+) -> pd.DataFrame:
+    """
+    Total counts per group × reference type.
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns ``group, reference_type, count, n_samples``; types ordered by
+        decreasing overall total.
+    """
+    matrix = index.level(level).select_types(reference_types)
+    codes, labels = pd.factorize(_row_groups(index, matrix, group_by))
+    totals = _sum_rows(matrix.values, codes, len(labels))
+    order = np.argsort(-totals.sum(axis=0), kind="stable")
+    n_groups, n_types = len(labels), len(order)
+    return pd.DataFrame(
+        {
+            "group": np.repeat(np.asarray(labels, dtype=object), n_types),
+            "reference_type": np.tile(matrix.types[order], n_groups),
+            "count": totals[:, order].ravel(),
+            "n_samples": np.repeat(np.bincount(codes, minlength=n_groups), n_types),
+        }
+    )
+
+
+def _sum_rows(values: Any, codes: np.ndarray, n: int) -> np.ndarray:
+    """Dense ``n × types`` sums of the rows of `values` sharing a code."""
+    from scipy.sparse import csr_matrix
+
+    indicator = csr_matrix(
+        (np.ones(len(codes)), (codes, np.arange(len(codes)))), shape=(n, len(codes))
+    )
+    sums = indicator @ values
+    return sums.toarray() if hasattr(sums, "toarray") else np.asarray(sums, dtype=float)
+
+
+@dataclass(frozen=True)
+class HeatmapTiles:
+    """Mean proportions of consecutive samples of one group, one row per tile."""
+
+    values: np.ndarray
+    labels: List[str]
+    groups: List[str]
+    sizes: np.ndarray
+    types: np.ndarray
+
+
+def heatmap_tiles(
+    index: LevelIndex,
+    level: int,
+    reference_types: Optional[Sequence[str]] = None,
+    max_rows: int = 200,
+) -> HeatmapTiles:
+    """
+    Downsample the sample × type proportion heatmap to at most `max_rows` rows.
+
+    Samples are ordered by group, then name.  Each group gets tiles in
+    proportion to its size (at least one, so more groups than `max_rows`
+    means one tile per group) and each tile is the mean of its samples; with
+    fewer samples than `max_rows` every tile is one sample.
+    """
+    matrix = _proportions(index, level, reference_types)
+    groups = _row_groups(index, matrix, group_by=True)
+    order = np.lexsort((matrix.samples.astype(str), groups.astype(str)))
+    values, samples, groups = matrix.values[order], matrix.samples[order], groups[order]
+    if not len(samples):
+        return HeatmapTiles(
+            np.zeros((0, len(matrix.types))), [], [], np.zeros(0, int), matrix.types
+        )
+
+    boundaries, tile_groups, labels = [], [], []
+    unique, starts, sizes = np.unique(groups, return_index=True, return_counts=True)
+    n_tiles = np.maximum(1, np.floor(sizes * max_rows / max(len(samples), 1))).astype(int)
+    for group, start, size, tiles in zip(unique, starts, sizes, np.minimum(n_tiles, sizes)):
+        for chunk in np.array_split(np.arange(start, start + size), tiles):
+            boundaries.append(chunk[0])
+            tile_groups.append(str(group))
+            first, last = samples[chunk[0]], samples[chunk[-1]]
+            labels.append(
+                f"{group}: {first}"
+                if len(chunk) == 1
+                else f"{group}: {first} … {last} ({len(chunk)})"
+            )
+    boundaries = np.asarray(boundaries, dtype=np.intp)
+    tile_of_row = np.searchsorted(boundaries, np.arange(len(samples)), side="right") - 1
+    sums = _sum_rows(values, tile_of_row, len(boundaries))
+    tile_sizes = np.bincount(tile_of_row, minlength=len(boundaries))
+    return HeatmapTiles(sums / tile_sizes[:, None], labels, tile_groups, tile_sizes, matrix.types)
+
+
+# ────────────────────── figures ──────────────────────
+def box_figure(summary: pd.DataFrame, title: str = "RDD proportions") -> Any:
+    """Plotly box plot drawn from :func:`box_summary` (one trace per group)."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for group, boxes in summary.groupby("group", sort=False):
+        fig.add_trace(
+            go.Box(
+                name=str(group),
+                x=boxes["reference_type"].tolist(),
+                q1=boxes["q1"].tolist(),
+                median=boxes["median"].tolist(),
+                q3=boxes["q3"].tolist(),
+                lowerfence=boxes["lowerfence"].tolist(),
+                upperfence=boxes["upperfence"].tolist(),
+                mean=boxes["mean"].tolist(),
+                y=boxes["outliers"].tolist(),  # sample points: the capped outliers
+                boxpoints="outliers",
+            )
+        )
+    fig.update_layout(
+        title=title, boxmode="group", xaxis_title="Reference type", yaxis_title="Proportion"
+    )
+    return fig
+
+
+def bar_figure(summary: pd.DataFrame, title: str = "Reference type distribution") -> Any:
+    """Plotly grouped bar chart drawn from :func:`bar_summary`."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for group, bars in summary.groupby("group", sort=False):
+        fig.add_trace(
+            go.Bar(name=str(group), x=bars["reference_type"].tolist(), y=bars["count"].tolist())
+        )
+    fig.update_layout(
+        title=title, barmode="group", xaxis_title="Reference type", yaxis_title="Total count"
+    )
+    return fig
+
+
+def heatmap_figure(tiles: HeatmapTiles, title: str = "RDD proportions") -> Any:
+    """Plotly heatmap drawn from :func:`heatmap_tiles`."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure(
+        go.Heatmap(
+            z=tiles.values,
+            x=tiles.types.tolist(),
+            y=tiles.labels,
+            customdata=np.broadcast_to(tiles.sizes[:, None], tiles.values.shape),
+            hovertemplate="%{y}<br>%{x}: %{z:.3f}<br>samples: %{customdata}<extra></extra>",
+            colorscale="Viridis",
+        )
+    )
+    fig.update_layout(title=title, xaxis_title="Reference type", yaxis_autorange="reversed")
+    return fig
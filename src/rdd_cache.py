@@ -0,0 +1,234 @@
+"""
+Content-addressed cache for built RDDCounts objects.
+
+Results are keyed by the content hashes of the input files plus the build
+parameters, so re-uploading the same GNPS network / metadata with the same
+settings skips the whole construction.  Entries live in two tiers:
+
+• memory – pickled bytes in an LRU ordered dict (bounded by ``memory_bytes``)
+• disk   – one ``<key>.pkl`` file per entry (bounded by ``disk_bytes``,
+  least-recently-used files are evicted first)
+
+Entries are stored pickled in both tiers, so every ``get`` hands back a fresh
+object: one session relabelling its groups never leaks into another session
+sharing the same cache.  Unpickling runs code, so the disk tier must only be
+writable by the server's user: the directory is created (or tightened) to
+mode 0700 and refused if another user owns it, and the default location is
+per user (:func:`user_cache_directory`).  Unreadable entries are dropped and
+reported as misses.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+
+
+def file_digest(path: Union[str, os.PathLike], chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Hash a file's content without loading it into memory.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        File to hash.
+    chunk_size : int
+        Number of bytes read per iteration.
+
+    Returns
+    -------
+    str
+        Hex-encoded BLAKE2b digest.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def user_cache_directory(name: str) -> str:
+    """``<tmp>/<name>-<user>``: a temp-directory location no other user shares."""
+    user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    return os.path.join(tempfile.gettempdir(), f"{name}-{user}")
+
+
+def private_directory(path: Union[str, os.PathLike]) -> Path:
+    """
+    Create `path` with mode 0700, or tighten an existing directory to it.
+
+    Raises
+    ------
+    PermissionError
+        If the directory belongs to another user.
+    """
+    path = Path(path)
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if hasattr(os, "getuid"):  # POSIX permissions
+        stat = path.stat()
+        if stat.st_uid != os.getuid():
+            raise PermissionError(f"Cache directory {path} is owned by another user.")
+        if stat.st_mode & 0o077:
+            path.chmod(0o700)
+    return path
+
+
+def cache_key(inputs: Dict[str, Optional[str]], params: Dict[str, Any]) -> str:
+    """
+    Combine input digests and build parameters into a single cache key.
+
+    Parameters
+    ----------
+    inputs : dict
+        Role → content digest (or any other stable identifier such as a GNPS
+        task id).  ``None`` marks an input that was not provided.
+    params : dict
+        Build parameters; values must be JSON-serialisable.  List values are
+        order-sensitive, so sort them first if order does not matter.
+
+    Returns
+    -------
+    str
+        Hex-encoded SHA-256 of the canonical JSON payload.
+    """
+    payload = json.dumps({"inputs": inputs, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class RDDCache:
+    """
+    Two-tier (memory + disk) LRU cache with byte budgets.
+
+    The instance is thread-safe so a single one can be shared by every
+    Streamlit session of the server process.
+
+    Parameters
+    ----------
+    directory : str or PathLike
+        Directory holding the on-disk tier.  Created if missing, private to
+        the current user (see :func:`private_directory`).
+    memory_bytes : int
+        Budget for the in-memory tier.
+    disk_bytes : int
+        Budget for the on-disk tier.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, os.PathLike],
+        memory_bytes: int = 1 << 30,
+        disk_bytes: int = 8 << 30,
+    ) -> None:
+        self.directory = private_directory(directory)
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+
+    # ────────────────────── public API ──────────────────────
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return the cached object for `key`, or None on a miss.
+
+        A truncated or otherwise unreadable entry is deleted and counts as a
+        miss.
+        """
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+            else:
+                blob = self._read_disk(key)
+                if blob is None:
+                    return None
+                self._remember(key, blob)
+        try:
+            return pickle.loads(blob)
+        except Exception:  # EOFError, UnpicklingError, missing classes, …
+            self.discard(key)
+            return None
+
+    def put(self, key: str, obj: Any) -> None:
+        """Store `obj` under `key` in both tiers, evicting LRU entries."""
+        blob = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._remember(key, blob)
+            self._write_disk(key, blob)
+
+    def discard(self, key: str) -> None:
+        """Drop `key` from both tiers (no error if absent)."""
+        with self._lock:
+            blob = self._memory.pop(key, None)
+            if blob is not None:
+                self._memory_used -= len(blob)
+            self._path(key).unlink(missing_ok=True)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._memory or self._path(key).exists()
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+            for path in self.directory.glob("*.pkl"):
+                path.unlink(missing_ok=True)
+
+    # ────────────────────── memory tier ──────────────────────
+    def _remember(self, key: str, blob: bytes) -> None:
+        if len(blob) > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_used -= len(old)
+        self._memory[key] = blob
+        self._memory_used += len(blob)
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+
+    # ────────────────────── disk tier ──────────────────────
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pkl"
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            blob = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # mark as recently used
+        return blob
+
+    def _write_disk(self, key: str, blob: bytes) -> None:
+        if len(blob) > self.disk_bytes:
+            return
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(blob)
+        os.replace(tmp, path)
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        entries = []
+        for path in self.directory.glob("*.pkl"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        used = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if used <= self.disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            used -= size
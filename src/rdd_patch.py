@@ -0,0 +1,39 @@
+"""
+Temporarily swapping functions inside the ``rdd`` package.
+
+RDDCounts calls helpers such as ``rdd.utils.get_gnps_task_data`` internally,
+and modules may hold their own reference (``from rdd.utils import ...``).
+:func:`patch_rdd_function` rebinds every loaded reference for the duration
+of a block.  Module globals are process-wide, so this is meant for build
+workers that run one build at a time.
+"""
+
+import sys
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+
+@contextmanager
+def patch_rdd_function(name: str, wrap: Callable[[Callable], Callable]) -> Iterator[Callable]:
+    """
+    Replace ``rdd.utils.<name>`` with ``wrap(original)`` in every ``rdd.*`` module.
+
+    Yields the original function; everything is restored on exit.
+    """
+    import rdd.utils
+
+    original = getattr(rdd.utils, name)
+    replacement = wrap(original)
+    patched = [
+        module
+        for module_name, module in list(sys.modules.items())
+        if (module_name == "rdd" or module_name.startswith("rdd."))
+        and getattr(module, name, None) is original
+    ]
+    for module in patched:
+        setattr(module, name, replacement)
+    try:
+        yield original
+    finally:
+        for module in patched:
+            setattr(module, name, original)
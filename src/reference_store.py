@@ -0,0 +1,229 @@
+"""
+Compiled, memory-mapped reference metadata store.
+
+The reference metadata (the bundled foodomics library or an upload) is
+parsed by ``rdd.utils._load_RDD_metadata`` on every build, although it
+hardly ever changes.  A *reference store* is that parsed table compiled once
+into a directory of binary files:
+
+• ``metadata.arrow``  – the table as an uncompressed Arrow IPC file
+• ``view_<sample_type>.npy`` – row numbers of the pre-split ``simple`` /
+  ``complex`` views (``all`` is the whole table)
+• ``manifest.json`` – format, source key, rows and views
+
+Stores are opened with memory maps, so every build worker on the machine
+shares the same physical pages; :func:`open_reference_store` keeps one open
+store per process and path, and each store converts a view to pandas once.
+Builds only read a store when ``RDD_REFERENCE_STORE=1`` (see
+:func:`src.resources.reference_store_dir`).  Stores live under one root
+directory, one sub-directory per source key (content digest of the file, or
+the rdd library version for the bundled metadata), and are written
+atomically, so concurrent builds never see a partial store.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from src.rdd_cache import cache_key, file_digest, private_directory, user_cache_directory
+from src.rdd_patch import patch_rdd_function
+
+FORMAT_NAME = "gnps-rdd-reference-store"
+FORMAT_VERSION = 2
+SAMPLE_TYPE_COLUMN = "sample_type"
+VIEWS = ("simple", "complex")
+
+
+class ReferenceStore:
+    """
+    Read-only view of a compiled store directory.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        Store directory written by :func:`compile_reference_store`.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        import pyarrow as pa
+
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / "manifest.json").read_text())
+        if self.manifest.get("format") != FORMAT_NAME:
+            raise ValueError(f"{self.path} is not a reference store")
+        source = pa.memory_map(str(self.path / "metadata.arrow"), "r")
+        self.table = pa.ipc.open_file(source).read_all()  # zero-copy over the map
+        self._views = {
+            view: np.load(self.path / f"view_{view}.npy", mmap_mode="r")
+            for view in self.manifest["views"]
+        }
+        self._frames: Dict[str, pd.DataFrame] = {}
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def frame(self, sample_types: str = "all") -> pd.DataFrame:
+        """
+        The metadata as a DataFrame, restricted to one pre-split view.
+
+        `sample_types` is ``"all"`` or one of the stored views; unknown views
+        fall back to the whole table.  Each view is converted from the mapped
+        Arrow table once per store; callers (RDDCounts) get a copy they may
+        modify.  With pandas copy-on-write (the default from pandas 3) that
+        copy is shallow and shares the converted columns.
+        """
+        view = sample_types if sample_types in self._views else "all"
+        if view not in self._frames:
+            rows = self._views.get(view)
+            table = self.table if rows is None else self.table.take(np.asarray(rows))
+            self._frames[view] = table.to_pandas()
+        return self._frames[view].copy(deep=not _copy_on_write())
+
+
+def _copy_on_write() -> bool:
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    return pd.get_option("mode.copy_on_write") is True
+
+
+def compile_reference_store(
+    metadata: pd.DataFrame,
+    directory: Union[str, os.PathLike],
+    key: str,
+) -> ReferenceStore:
+    """
+    Compile parsed reference `metadata` into ``<directory>/<key>``.
+
+    A store that already exists is reused as is.
+
+    Parameters
+    ----------
+    metadata : pd.DataFrame
+        Parsed reference metadata with a ``filename`` column.
+    directory : str or PathLike
+        Store root.
+    key : str
+        Identifies the source (see :func:`reference_source_key`).
+    """
+    import pyarrow as pa
+
+    target = Path(directory) / key
+    if (target / "manifest.json").exists():
+        return ReferenceStore(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{key}.", dir=target.parent))
+    try:
+        metadata = metadata.reset_index(drop=True)
+        table = pa.Table.from_pandas(metadata, preserve_index=False)
+        with pa.OSFile(str(staging / "metadata.arrow"), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+        views = []
+        if SAMPLE_TYPE_COLUMN in metadata.columns:
+            sample_type = metadata[SAMPLE_TYPE_COLUMN].astype(str).str.lower()
+            for view in VIEWS:
+                np.save(staging / f"view_{view}.npy", np.flatnonzero(sample_type == view))
+                views.append(view)
+
+        manifest: Dict[str, Any] = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "key": key,
+            "rows": len(metadata),
+            "views": views,
+        }
+        (staging / "manifest.json").write_text(json.dumps(manifest, indent=2))
+        try:
+            os.rename(staging, target)
+        except OSError:  # compiled concurrently by another process
+            if not (target / "manifest.json").exists():
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return ReferenceStore(target)
+
+
+def reference_source_key(reference_metadata: Optional[str]) -> str:
+    """Store key of a reference file (content digest) or of the bundled metadata."""
+    if reference_metadata:
+        source = file_digest(reference_metadata)
+    else:
+        from importlib.metadata import PackageNotFoundError, version
+
+        try:
+            source = f"bundled:{version('gnps-rdd')}"
+        except PackageNotFoundError:
+            import rdd.utils
+
+            source = f"bundled:{os.path.getmtime(rdd.utils.__file__)}"
+    return cache_key({"reference_metadata": source}, {"format": FORMAT_VERSION})
+
+
+def ensure_reference_store(
+    directory: str, reference_metadata: Optional[str] = None
+) -> ReferenceStore:
+    """
+    Open the store of `reference_metadata` (None: bundled foodomics data),
+    compiling it with the library's loader on first use.
+
+    `directory` is made private to the user: stores are served to builds
+    as they are, so nobody else may plant one.
+    """
+    key = reference_source_key(reference_metadata)
+    path = private_directory(directory) / key
+    if not (path / "manifest.json").exists():
+        from rdd.utils import _load_RDD_metadata
+
+        metadata = _load_RDD_metadata(reference_metadata)
+        compile_reference_store(metadata, directory, key)
+    return open_reference_store(str(path))
+
+
+def reference_store_root() -> Optional[str]:
+    """
+    Store root of builds, or None unless ``RDD_REFERENCE_STORE=1``.
+
+    ``RDD_REFERENCE_STORE_DIR`` overrides the default ``<tmp>/gnps_reference_store-<user>``.
+    """
+    if os.environ.get("RDD_REFERENCE_STORE", "").lower() not in ("1", "true", "yes"):
+        return None
+    return os.environ.get("RDD_REFERENCE_STORE_DIR") or user_cache_directory("gnps_reference_store")
+
+
+@lru_cache(maxsize=8)
+def open_reference_store(path: str) -> ReferenceStore:
+    """One open (memory-mapped) store per process and path."""
+    return ReferenceStore(path)
+
+
+def serve_reference_store(
+    store: ReferenceStore, sample_types: str = "all", reference_metadata: Optional[str] = None
+) -> ContextManager:
+    """
+    Serve ``_load_RDD_metadata`` calls inside the rdd package from `store`.
+
+    RDDCounts receives the pre-split `sample_types` view instead of parsing
+    the file; its own sample-type filter then has nothing left to remove.
+    Only calls for the source `store` was compiled from are served: the file
+    `reference_metadata`, or the bundled metadata when it is None.  Calls for
+    any other source reach the library's loader.
+    """
+    source = os.fspath(reference_metadata) if reference_metadata else None
+
+    def wrap(original):
+        def load(path=None, *args, **kwargs):
+            if not args and not kwargs and (os.fspath(path) if path else None) == source:
+                return store.frame(sample_types)
+            return original(path, *args, **kwargs)
+
+        return load
+
+    return patch_rdd_function("_load_RDD_metadata", wrap)
@@ -0,0 +1,62 @@
+"""
+Server-wide resources shared by the pages.
+
+Each resource is created once per server process (``st.cache_resource``) and
+handed to every session.  They are defined here rather than in the pages so
+that every page gets the same object: a ``cache_resource`` function defined
+separately in two page scripts would create two of them.
+"""
+
+import os
+from typing import Optional
+
+import streamlit as st
+
+from src.jobs import JobQueue
+from src.rdd_cache import RDDCache, user_cache_directory
+from src.reference_store import reference_store_root
+from src.shared_tables import SharedTables
+from src.task_cache import TaskCache
+
+
+def env_flag(name: str) -> bool:
+    """True if the environment variable `name` is set to 1 / true / yes."""
+    return os.environ.get(name, "").lower() in ("1", "true", "yes")
+
+
+@st.cache_resource
+def job_queue() -> JobQueue:
+    """Process pool shared by every session; builds never block the script thread."""
+    return JobQueue(max_workers=int(os.environ.get("RDD_BUILD_WORKERS", "0")) or None)
+
+
+@st.cache_resource
+def rdd_cache() -> RDDCache:
+    """Built RDDCounts objects in memory and on disk, shared by every session."""
+    directory = os.environ.get("RDD_CACHE_DIR", user_cache_directory("gnps_rdd_cache"))
+    budget_mb = int(os.environ.get("RDD_CACHE_MAX_MB", "4096"))
+    return RDDCache(
+        directory,
+        memory_bytes=min(budget_mb, 1024) << 20,
+        disk_bytes=budget_mb << 20,
+    )
+
+
+@st.cache_resource
+def shared_tables() -> SharedTables:
+    """Counts / reference tables memory-mapped by every session instead of copied."""
+    directory = os.environ.get("RDD_SHARED_DIR", user_cache_directory("gnps_rdd_shared"))
+    budget_mb = int(os.environ.get("RDD_CACHE_MAX_MB", "4096"))
+    return SharedTables(directory, max_bytes=budget_mb << 20)
+
+
+@st.cache_resource
+def task_cache() -> TaskCache:
+    """GNPS task tables on disk, shared by every session (RDD_GNPS_OFFLINE=1: no downloads)."""
+    return TaskCache.from_env(user_cache_directory("gnps_task_cache"))
+
+
+@st.cache_resource
+def reference_store_dir() -> Optional[str]:
+    """Root of the compiled reference metadata stores; None unless RDD_REFERENCE_STORE=1."""
+    return reference_store_root()
@@ -0,0 +1,189 @@
+"""
+Immutable RDD tables shared by every session through memory maps.
+
+A built RDDCounts object holds a long counts table and the reference
+metadata, neither of which a session ever changes after the build.  Instead
+of one private copy per Streamlit session, :class:`SharedTables` writes them
+once per content key (the build cache key) to uncompressed Arrow IPC files
+and hands every session DataFrames that point straight into a read-only
+memory map:
+
+• numeric columns are NumPy views of the mapped buffers (read-only)
+• string columns are Arrow-backed ``StringDtype`` arrays over the same
+  buffers, so no Python string objects are created
+
+The operating system keeps one copy of the pages however many sessions map
+the file.  What a session may change stays private (*overlays*): the
+``group`` column of the counts table and the sample metadata, both rewritten
+by ``set_group`` / ``relabel_groups``.  Overlay columns are never written to
+the shared files; :meth:`SharedTables.attach` carries the session's own
+values over onto the mapped frame.
+
+The shared frames are immutable: replace a column (``df[col] = ...``)
+instead of writing into it in place.
+"""
+
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.rdd_cache import private_directory
+
+SHARED_FRAMES = ("counts", "reference_metadata")
+OVERLAY_COLUMNS: Dict[str, Tuple[str, ...]] = {"counts": ("group",)}
+
+
+def _string_dtype() -> pd.StringDtype:
+    try:  # the default ``str`` dtype of pandas 3
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:  # pandas 2.2
+        return pd.StringDtype("pyarrow")
+
+
+@lru_cache(maxsize=64)
+def _open_table(path: str, mtime: float) -> Any:
+    """One memory-mapped Arrow table per file and process (mtime guards rewrites)."""
+    import pyarrow as pa
+
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+def mapped_frame(path: Union[str, os.PathLike]) -> pd.DataFrame:
+    """
+    DataFrame over the memory-mapped Arrow IPC file at `path`, without copying.
+
+    Every call returns a new DataFrame object (columns can be added or
+    replaced per caller) backed by the same mapped buffers.
+    """
+    import pyarrow as pa
+
+    path = str(path)
+    table = _open_table(path, os.path.getmtime(path))
+    strings = {pa.string(): _string_dtype(), pa.large_string(): _string_dtype()}
+    return table.to_pandas(split_blocks=True, types_mapper=strings.get)
+
+
+def _write_arrow(frame: pd.DataFrame, path: Path) -> None:
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    with pa.OSFile(str(path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+class SharedTables:
+    """
+    Directory of shared, memory-mapped RDD tables, one sub-directory per key.
+
+    The instance is thread-safe so a single one can be shared by every
+    Streamlit session of the server process.
+
+    Parameters
+    ----------
+    directory : str or PathLike
+        Root directory.  Created if missing, private to the current user
+        (see :func:`src.rdd_cache.private_directory`).
+    max_bytes : int
+        Disk budget; least-recently-attached keys are removed first (by an
+        in-process use counter; keys this process has not used yet, e.g.
+        left by a previous server run, go before them, oldest first).
+        Sessions that still map a removed file keep working (the data stays
+        alive until the last map is closed).
+    """
+
+    def __init__(self, directory: Union[str, os.PathLike], max_bytes: int = 8 << 30) -> None:
+        self.directory = private_directory(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._clock = itertools.count()
+        self._last_used: Dict[str, int] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return (self.directory / key / "counts.arrow").exists()
+
+    def publish(self, key: str, rdd: Any) -> None:
+        """
+        Write the shared frames of `rdd` under `key` unless they already exist.
+
+        Other keys are evicted to make room; `key` itself only goes if it
+        alone exceeds the budget.
+        """
+        self._last_used[key] = next(self._clock)
+        if key in self:
+            return
+        staging = Path(tempfile.mkdtemp(prefix=f".{key}.", dir=self.directory))
+        try:
+            for name in SHARED_FRAMES:
+                frame = getattr(rdd, name, None)
+                if isinstance(frame, pd.DataFrame):
+                    overlay = [c for c in OVERLAY_COLUMNS.get(name, ()) if c in frame.columns]
+                    _write_arrow(frame.drop(columns=overlay), staging / f"{name}.arrow")
+            try:
+                os.rename(staging, self.directory / key)
+            except OSError:  # published concurrently by another session
+                if key not in self:
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        self._evict(keep=key)
+
+    def attach(self, key: str, rdd: Any) -> Any:
+        """
+        Swap the shared frames of `rdd` for memory-mapped ones (in place).
+
+        Publishes them first if needed.  The overlay columns of `rdd` (its
+        current ``group`` labels) are copied onto the mapped counts table.
+
+        Returns
+        -------
+        RDDCounts
+            `rdd` itself, for chaining.
+        """
+        with self._lock:
+            self.publish(key, rdd)
+            if key not in self:  # larger than the whole budget: stays private
+                return rdd
+            target = self.directory / key
+            for name in SHARED_FRAMES:
+                path = target / f"{name}.arrow"
+                if not path.exists():
+                    continue
+                private = getattr(rdd, name)
+                shared = mapped_frame(path)
+                for column in OVERLAY_COLUMNS.get(name, ()):
+                    if column in private.columns:
+                        shared[column] = private[column].to_numpy()
+                if list(shared.columns) != list(private.columns):
+                    shared = shared[list(private.columns)]  # lazy copy (copy-on-write)
+                setattr(rdd, name, shared)
+        return rdd
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        entries = []
+        for entry in self.directory.iterdir():
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            size = sum(p.stat().st_size for p in entry.glob("*.arrow"))
+            # keys unknown to this process first (oldest written first), `keep` last
+            order = (
+                entry.name == keep,
+                self._last_used.get(entry.name, -1),
+                entry.stat().st_mtime,
+            )
+            entries.append((order, size, entry))
+        used = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if used <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            self._last_used.pop(entry.name, None)
+            used -= size
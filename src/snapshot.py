@@ -0,0 +1,163 @@
+"""
+Binary snapshots of a built RDDCounts object.
+
+A snapshot is an uncompressed ZIP archive holding
+
+• ``manifest.json``  – format version, levels / ontology settings and every
+  other plain attribute of the object (NumPy scalars and arrays as JSON
+  numbers and lists)
+• ``<attr>.parquet`` – one Parquet file per DataFrame attribute (counts,
+  sample_metadata, reference_metadata, …)
+
+The high-cardinality string columns of the counts table are written as Arrow
+dictionaries, which keeps the file small and the round trip fast.  Loading
+bypasses the RDDCounts constructor entirely: the object is allocated with
+``__new__`` and its attributes are restored as they were.
+"""
+
+import io
+import json
+import zipfile
+from typing import IO, Any, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+FORMAT_NAME = "gnps-rdd-snapshot"
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+DICTIONARY_COLUMNS = ("filename", "reference_type", "group")
+# Caches and handles the app attaches to the object; rebuilt on demand after loading
+TRANSIENT_ATTRIBUTES = ("_count_codes", "_groups", "_level_index", "build_timings")
+
+
+def _json_value(value: Any) -> Any:
+    """`value` with NumPy scalars and arrays as Python numbers and lists (TypeError if not JSON)."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    elif isinstance(value, np.ndarray):
+        value = value.tolist()
+    elif isinstance(value, (list, tuple)):
+        value = [_json_value(v) for v in value]
+    elif isinstance(value, dict):
+        value = {k: _json_value(v) for k, v in value.items()}
+    json.dumps(value)
+    return value
+
+
+def _to_parquet_bytes(frame: pd.DataFrame, dictionary_columns=()) -> bytes:
+    encoded = frame.astype({c: "category" for c in dictionary_columns})
+    buf = io.BytesIO()
+    encoded.to_parquet(buf, engine="pyarrow", compression="zstd")
+    return buf.getvalue()
+
+
+def save_snapshot(rdd: Any, target: Union[str, IO[bytes]]) -> None:
+    """
+    Write `rdd` as a snapshot archive.
+
+    Parameters
+    ----------
+    rdd : RDDCounts
+        Object to serialise.  DataFrame attributes become Parquet members,
+        JSON-serialisable attributes (NumPy values converted) go to the
+        manifest, the app's caches (``TRANSIENT_ATTRIBUTES``) are skipped and
+        listed in the manifest.
+    target : str or binary file-like
+        Destination path or writable buffer.
+
+    Raises
+    ------
+    TypeError
+        If an attribute is none of these: restoring without it would give an
+        incomplete object.
+    """
+    manifest = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "frames": [],
+        "dictionary_columns": {},
+        "attributes": {},
+        "skipped": [],
+    }
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_STORED) as zf:
+        for name, value in vars(rdd).items():
+            if isinstance(value, pd.DataFrame):
+                dict_cols = []
+                if name == "counts":
+                    dict_cols = [
+                        c
+                        for c in DICTIONARY_COLUMNS
+                        if c in value.columns
+                        and not isinstance(value[c].dtype, pd.CategoricalDtype)
+                    ]
+                zf.writestr(f"{name}.parquet", _to_parquet_bytes(value, dict_cols))
+                manifest["frames"].append(name)
+                manifest["dictionary_columns"][name] = dict_cols
+            elif name in TRANSIENT_ATTRIBUTES:
+                manifest["skipped"].append(name)
+            else:
+                try:
+                    manifest["attributes"][name] = _json_value(value)
+                except (TypeError, ValueError) as e:
+                    raise TypeError(
+                        f"Cannot snapshot attribute {name!r} of type {type(value).__name__}: {e}"
+                    ) from None
+        zf.writestr(MANIFEST, json.dumps(manifest, indent=2))
+
+
+def snapshot_bytes(rdd: Any) -> bytes:
+    """Return the snapshot archive of `rdd` as bytes (for download buttons)."""
+    buf = io.BytesIO()
+    save_snapshot(rdd, buf)
+    return buf.getvalue()
+
+
+def load_snapshot(source: Union[str, IO[bytes]], cls: Optional[type] = None) -> Any:
+    """
+    Rehydrate an object written by :func:`save_snapshot`.
+
+    Parameters
+    ----------
+    source : str or binary file-like
+        Snapshot path or readable buffer (e.g. a Streamlit upload).
+    cls : type, optional
+        Class to instantiate; defaults to ``rdd.RDDCounts``.  The manifest is
+        never trusted to name the class.
+
+    Returns
+    -------
+    RDDCounts
+        Object with every saved attribute restored, without running
+        ``__init__``.
+
+    Raises
+    ------
+    ValueError
+        If `source` is not a snapshot or was written by a newer version.
+    """
+    if cls is None:
+        from rdd import RDDCounts as cls
+
+    with zipfile.ZipFile(source) as zf:
+        try:
+            manifest = json.loads(zf.read(MANIFEST))
+        except KeyError:
+            raise ValueError("Not an RDD snapshot: manifest.json is missing.") from None
+        if manifest.get("format") != FORMAT_NAME:
+            raise ValueError("Not an RDD snapshot: unexpected format marker.")
+        if manifest.get("version", 0) > FORMAT_VERSION:
+            raise ValueError(
+                f"Snapshot version {manifest['version']} is newer than supported "
+                f"version {FORMAT_VERSION}."
+            )
+
+        obj = cls.__new__(cls)
+        obj.__dict__.update(manifest["attributes"])
+        for name in manifest["frames"]:
+            frame = pd.read_parquet(io.BytesIO(zf.read(f"{name}.parquet")), engine="pyarrow")
+            # Decode the dictionaries added on save so group-bys behave as before
+            for col in manifest["dictionary_columns"].get(name, []):
+                frame[col] = frame[col].astype(frame[col].cat.categories.dtype)
+            setattr(obj, name, frame)
+    return obj
@@ -4,8 +4,13 @@ Helpers that *touch Streamlit session state* but leave your core library
 """
 
 from typing import Any
+import pandas as pd
 import streamlit as st
 
+from src.groups import GroupAssignment, get_group_assignment
+from src.ingest import SpillDirectory
+from src.level_index import get_level_index
+
 
 def set_group(rdd: Any, column_name: str) -> None:
     """
@@ -32,6 +37,57 @@ def set_group(rdd: Any, column_name: str) -> None:
     # Map to canonical 'group' in sample_metadata
     rdd.sample_metadata["group"] = rdd.sample_metadata[column_name].astype(str)
 
-    # Map to 'group' in counts via filename
-    mapping = rdd.sample_metadata.set_index("filename")["group"]
-    rdd.counts["group"] = rdd.counts["filename"].map(mapping)
+    # Map to 'group' in counts via the per-sample lookup
+    assignment = get_group_assignment(rdd)
+    assignment.assign(rdd.sample_metadata.set_index("filename")["group"])
+    _publish_groups(rdd, assignment)
+
+
+def relabel_groups(rdd: Any, mapping: pd.Series) -> int:
+    """
+    Reassign the samples in `mapping` (filename → new group) to new groups.
+
+    Only the per-sample lookup and rdd.sample_metadata (both O(samples)) are
+    updated; the 'group' column of rdd.counts is re-materialised from integer
+    codes without merging or copying the table.  Samples absent from
+    `mapping` keep their current group.
+
+    Returns
+    -------
+    int
+        Number of samples that were found and relabelled.
+    """
+    mapping = mapping[~mapping.index.duplicated(keep="last")]
+    assignment = get_group_assignment(rdd)
+    n_relabelled = assignment.relabel(mapping)
+
+    meta = rdd.sample_metadata
+    meta["group"] = meta["filename"].map(mapping).fillna(meta["group"])
+    group_col = getattr(rdd, "sample_group_col", "group")
+    if group_col != "group" and group_col in meta.columns:
+        meta[group_col] = meta["group"]
+
+    _publish_groups(rdd, assignment)
+    return n_relabelled
+
+
+def _publish_groups(rdd: Any, assignment: GroupAssignment) -> None:
+    # An in-place edit, but not a counts_changed() one: the assignment is the
+    # source of these labels and the caches built on it are synced here
+    rdd.counts["group"] = assignment.group_column()
+    # Keep the shared per-level index in sync (labels only, no re-pivot)
+    get_level_index(rdd).set_groups(assignment.sample_groups())
+
+
+def spill_directory() -> SpillDirectory:
+    """
+    Return this session's SpillDirectory, creating it on first use.
+
+    The directory lives in st.session_state, so its files are removed when
+    the session is dropped (or the server exits).
+    """
+    spill = st.session_state.get("_spill_dir")
+    if spill is None or not spill.alive:
+        spill = SpillDirectory()
+        st.session_state["_spill_dir"] = spill
+    return spill
@@ -0,0 +1,200 @@
+"""
+Persistent on-disk cache of GNPS task network tables.
+
+``rdd.utils.get_gnps_task_data`` downloads the whole network table of a task
+on every call, and the result used to live only in one browser session.
+:class:`TaskCache` stores each table once per ``(GNPS version, task id)`` as a
+zstd Parquet file, shared by every session and server restart:
+
+    <directory>/gnps2/<task_id>.parquet
+    <directory>/gnps1/<task_id>.parquet
+
+Misses are downloaded by the pluggable ``fetcher``: ``"rdd"`` (default, the
+library's own ``get_gnps_task_data``) or ``"http"`` (opt-in,
+:class:`src.fetch.HttpFetcher` with pooling, retries and resume, whose parsed
+tables have not yet been checked against the library's); see
+``RDD_GNPS_FETCHER``.
+
+Cached tables are read back as they are, so the directory must only be
+writable by the server's user: like the RDD cache it is created (or
+tightened) to mode 0700 and refused if another user owns it
+(:func:`src.rdd_cache.private_directory`).
+
+In offline mode (``RDD_GNPS_OFFLINE=1``) a missing task raises
+:class:`TaskNotCached` instead of contacting GNPS, so the app can run from a
+pre-filled cache directory (or a test fixture).
+
+RDDCounts fetches task data itself; :func:`serve_tasks_from` routes those
+calls through the cache so the cached DataFrame is handed to it directly,
+without a CSV round trip.
+"""
+
+import os
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+import pandas as pd
+
+from src.rdd_cache import private_directory
+from src.rdd_patch import patch_rdd_function
+
+Downloader = Callable[..., pd.DataFrame]
+FETCHERS = ("http", "rdd")
+
+_SAFE_TASK_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class TaskNotCached(LookupError):
+    """Raised in offline mode when a task is not in the cache."""
+
+
+@dataclass(frozen=True)
+class TaskCache:
+    """
+    Task id → network table cache (picklable, so it can travel in a BuildRequest).
+
+    Parameters
+    ----------
+    directory : str
+        Cache root; created on first write.
+    offline : bool
+        Serve from the cache only, never download.
+    fetcher : str
+        Downloader used on a miss, one of ``FETCHERS``.
+    """
+
+    directory: str
+    offline: bool = False
+    fetcher: str = "rdd"
+
+    def __post_init__(self) -> None:
+        if self.fetcher not in FETCHERS:
+            raise ValueError(f"fetcher must be one of {FETCHERS}, got {self.fetcher!r}")
+
+    @classmethod
+    def from_env(cls, default_directory: str) -> "TaskCache":
+        """Build from ``RDD_TASK_CACHE_DIR`` / ``RDD_GNPS_OFFLINE`` / ``RDD_GNPS_FETCHER``."""
+        offline = os.environ.get("RDD_GNPS_OFFLINE", "").lower() in ("1", "true", "yes")
+        return cls(
+            os.environ.get("RDD_TASK_CACHE_DIR", default_directory),
+            offline,
+            os.environ.get("RDD_GNPS_FETCHER", "rdd"),
+        )
+
+    def downloader(self, progress: Optional[Callable[[Any], None]] = None) -> Downloader:
+        """
+        Return the configured ``download(task_id, gnps2=...)`` callable.
+
+        `progress` receives :class:`src.fetch.FetchProgress` updates (http
+        fetcher only).
+        """
+        if self.fetcher == "rdd":
+            from rdd.utils import get_gnps_task_data
+
+            return get_gnps_task_data
+        from src.fetch import shared_fetcher
+
+        fetcher = shared_fetcher()
+        return lambda task_id, gnps2=True: fetcher.fetch_task(task_id, gnps2, progress)
+
+    def path(self, task_id: str, gnps2: bool = True) -> Path:
+        """Cache file of `task_id` (ValueError for ids that are not plain tokens)."""
+        task_id = task_id.strip()
+        if not _SAFE_TASK_ID.match(task_id):
+            raise ValueError(f"Invalid GNPS task id: {task_id!r}")
+        return Path(self.directory) / ("gnps2" if gnps2 else "gnps1") / f"{task_id}.parquet"
+
+    def __contains__(self, key) -> bool:
+        task_id, gnps2 = key
+        return self.path(task_id, gnps2).exists()
+
+    def get(self, task_id: str, gnps2: bool = True) -> Optional[pd.DataFrame]:
+        """Return the cached table of `task_id`, or None."""
+        path = self.path(task_id, gnps2)
+        private_directory(self.directory)  # never read tables another user could plant
+        if not path.exists():
+            return None
+        return pd.read_parquet(path)
+
+    def put(self, task_id: str, gnps2: bool, table: pd.DataFrame) -> bool:
+        """
+        Store `table` for `task_id`.
+
+        Returns False (and caches nothing) if the table cannot be written as
+        Parquet, e.g. an object column holding mixed types.
+        """
+        path = self.path(task_id, gnps2)
+        private_directory(self.directory)
+        path.parent.mkdir(mode=0o700, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            table.to_parquet(tmp, compression="zstd", index=False)
+        except (ValueError, TypeError):
+            tmp.unlink(missing_ok=True)
+            return False
+        os.replace(tmp, path)  # readers never see a partial file
+        return True
+
+    def fetch(
+        self, task_id: str, gnps2: bool = True, download: Optional[Downloader] = None
+    ) -> pd.DataFrame:
+        """
+        Return the network table of `task_id`, downloading it on a cache miss.
+
+        Parameters
+        ----------
+        task_id : str
+            GNPS task id.
+        gnps2 : bool
+            GNPS2 (True) or GNPS1/Classic (False) task.
+        download : callable, optional
+            ``download(task_id, gnps2=...) -> DataFrame``; defaults to
+            :meth:`downloader`.
+
+        Raises
+        ------
+        TaskNotCached
+            In offline mode, if the task is not cached.
+        """
+        table = self.get(task_id, gnps2)
+        if table is not None:
+            return table
+        if self.offline:
+            raise TaskNotCached(
+                f"GNPS task {task_id} ({'GNPS2' if gnps2 else 'GNPS1'}) is not in the "
+                f"offline cache at {self.directory}"
+            )
+        if download is None:
+            download = self.downloader()
+        table = download(task_id.strip(), gnps2=gnps2)
+        self.put(task_id, gnps2, table)
+        return table
+
+
+@contextmanager
+def serve_tasks_from(
+    cache: TaskCache, progress: Optional[Callable[[Any], None]] = None
+) -> Iterator[None]:
+    """
+    Route ``get_gnps_task_data`` calls made inside the rdd package through `cache`.
+
+    ``RDDCounts(task_id=...)`` then receives the cached (or freshly fetched)
+    DataFrame.  `progress` is passed to the downloader.  See
+    :func:`src.rdd_patch.patch_rdd_function` for the scope of the patch.
+    """
+
+    def wrap(original):
+        def cached(task_id, gnps2=True, **kwargs):
+            if cache.fetcher == "rdd":
+                download = lambda t, gnps2: original(t, gnps2=gnps2, **kwargs)  # noqa: E731
+            else:
+                download = cache.downloader(progress)
+            return cache.fetch(task_id, gnps2, download=download)
+
+        return cached
+
+    with patch_rdd_function("get_gnps_task_data", wrap):
+        yield
@@ -0,0 +1,31 @@
+"""
+Deferred access to the plotting backends of ``rdd.visualization``.
+
+``rdd.visualization`` pulls in Plotly, Matplotlib and Seaborn at import.
+Pages call :func:`visualizer` only once a plot is actually drawn, so opening
+a page (or the How-to page) does not pay for the plotting stack.
+"""
+
+from typing import Any
+
+import streamlit as st
+
+BACKENDS = ("Plotly", "Matplotlib")
+
+
+def visualizer(backend: str = "Plotly") -> Any:
+    """Return an ``rdd.visualization.Visualizer`` for `backend` ("Plotly" or "Matplotlib")."""
+    from rdd.visualization import Visualizer
+
+    if backend == "Matplotlib":
+        from rdd.visualization import MatplotlibBackend
+
+        return Visualizer(MatplotlibBackend())
+    from rdd.visualization import PlotlyBackend
+
+    return Visualizer(PlotlyBackend())
+
+
+def show_figure(fig: Any, backend: str = "Plotly") -> None:
+    """Render `fig` with the Streamlit element matching `backend`."""
+    (st.plotly_chart if backend == "Plotly" else st.pyplot)(fig, use_container_width=True)
@@ -0,0 +1,126 @@
+"""
+Tests for batch mode in src/batch.py
+"""
+
+from dataclasses import replace
+
+import pandas as pd
+import pytest
+
+from src.batch import (
+    BatchEntry,
+    entry_request,
+    read_manifest,
+    run_batch,
+    share_reference,
+    write_counts,
+)
+from src.build import BuildRequest
+
+
+def _fake_build(request):
+    if request.task_id == "broken":
+        raise RuntimeError("HTTP 500 from GNPS")
+    name = request.task_id or request.gnps_network_path
+    return pd.DataFrame(
+        {
+            "filename": [f"{name}_s1", f"{name}_s2"],
+            "reference_type": ["Type_A", "Type_B"],
+            "count": [1, 2],
+            "level": [request.levels or 0] * 2,
+        }
+    )
+
+
+def test_read_manifest(tmp_path):
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(
+        "batch_id,network,task_id,gnps_version,sample_metadata\n"
+        "a,nets/a.tsv,,,\n"
+        ",,t123,GNPS1,meta/t.csv\n"
+        ",nets/c.tsv,,,\n"
+    )
+
+    entries = read_manifest(str(manifest))
+
+    assert entries == [
+        BatchEntry("a", network=str(tmp_path / "nets/a.tsv")),
+        BatchEntry(
+            "t123", task_id="t123", gnps2=False, sample_metadata=str(tmp_path / "meta/t.csv")
+        ),
+        BatchEntry("c", network=str(tmp_path / "nets/c.tsv")),
+    ]
+
+
+@pytest.mark.parametrize(
+    "body, message",
+    [
+        ("batch_id,network,task_id\nx,a.tsv,t1\n", "exactly one"),
+        ("batch_id,network,task_id\nx,,\n", "exactly one"),
+        ("batch_id,task_id\nx,t1\nx,t2\n", "Duplicate batch_id"),
+    ],
+)
+def test_read_manifest_rejects_bad_rows(tmp_path, body, message):
+    manifest = tmp_path / "manifest.tsv"
+    manifest.write_text(body.replace(",", "\t"))
+    with pytest.raises(ValueError, match=message):
+        read_manifest(str(manifest))
+
+
+def test_entry_request_keeps_shared_options():
+    template = BuildRequest(levels=3, external_sample_metadata="shared.csv", sample_types="simple")
+
+    by_task = entry_request(BatchEntry("t", task_id="t", gnps2=False), template)
+    by_file = entry_request(BatchEntry("f", network="f.tsv", sample_metadata="own.csv"), template)
+
+    assert (by_task.task_id, by_task.gnps_2, by_task.gnps_network_path) == ("t", False, None)
+    assert by_task.external_sample_metadata == "shared.csv"
+    assert by_file.external_sample_metadata == "own.csv"
+    assert by_file.levels == 3 and by_file.sample_types == "simple"
+
+
+def test_run_batch_combines_counts_and_collects_errors(tmp_path):
+    entries = [
+        BatchEntry("first", task_id="t1"),
+        BatchEntry("bad", task_id="broken"),
+        BatchEntry("second", network="n2.tsv"),
+    ]
+    done = []
+
+    result = run_batch(
+        entries,
+        BuildRequest(levels=2),
+        max_workers=2,
+        on_done=lambda *args: done.append(args),
+        build=_fake_build,
+    )
+
+    assert list(result.counts.columns) == [
+        "batch_id",
+        "filename",
+        "reference_type",
+        "count",
+        "level",
+    ]
+    assert result.counts["batch_id"].tolist() == ["first", "first", "second", "second"]
+    assert result.counts["filename"].tolist() == ["t1_s1", "t1_s2", "n2.tsv_s1", "n2.tsv_s2"]
+    assert (result.counts["level"] == 2).all()
+    assert result.errors == {"bad": "RuntimeError: HTTP 500 from GNPS"}
+    assert sorted(d[0] for d in done) == ["bad", "first", "second"]
+    assert [d[2:] for d in done] == [(1, 3), (2, 3), (3, 3)]
+
+    write_counts(result.counts, tmp_path / "out.parquet")
+    write_counts(result.counts, tmp_path / "out.tsv")
+    restored = pd.read_parquet(tmp_path / "out.parquet")
+    assert restored["batch_id"].astype(str).tolist() == result.counts["batch_id"].tolist()
+    assert len(pd.read_csv(tmp_path / "out.tsv", sep="\t")) == 4
+
+
+def test_share_reference_points_jobs_at_the_compiled_store(tmp_path):
+    template = BuildRequest(levels=2)
+    assert share_reference(template) is template  # no store root: every job parses
+
+    shared = share_reference(template, str(tmp_path))
+    # without the library's metadata loader there is nothing to compile
+    assert shared.reference_store in (str(tmp_path), None)
+    assert replace(shared, reference_store=None) == template
@@ -0,0 +1,82 @@
+"""
+Tests for the synthetic benchmark data in benchmarks/ and the threshold check
+"""
+
+import json
+
+import pandas as pd
+
+from benchmarks.bench_pipeline import THRESHOLDS, _dumps, check, record
+from benchmarks.synthetic import SCALES, file_counts, generate
+
+
+def test_generated_inputs_are_deterministic_and_consistent(tmp_path):
+    scale = SCALES["tiny"]
+
+    paths = generate(scale, str(tmp_path / "a"))
+    again = generate(scale, str(tmp_path / "b"))
+
+    for key, path in paths.items():
+        assert open(path).read() == open(again[key]).read()
+    network = pd.read_csv(paths["network"], sep="\t")
+    references = pd.read_csv(paths["reference_metadata"])
+    assert len(network) == scale.spectra
+    assert list(network.columns[:2]) == ["#ClusterIdx", "#Filename"]
+    assert len(references) == scale.references
+    # every term has exactly one parent on the level above
+    for level in range(2, scale.depth + 1):
+        parents = references.groupby(f"sample_type_group{level}")[f"sample_type_group{level - 1}"]
+        assert parents.nunique().max() == 1
+
+
+def test_file_counts_follow_shared_clusters(tmp_path):
+    paths = generate(SCALES["tiny"], str(tmp_path))
+    network = pd.read_csv(paths["network"], sep="\t")
+
+    counts = file_counts(paths)
+
+    assert counts["filename"].str.startswith("sample_").all()
+    assert counts["reference_type"].str.startswith("ref_").all()
+    assert set(counts["group"]) <= {"G1", "G2", "G3"}
+    sample, reference = counts.iloc[0][["filename", "reference_type"]]
+    names = network["#Filename"].str.split("/").str[-1].str[:-5]
+    shared = set(network.loc[names == reference, "#ClusterIdx"])
+    expected = (names == sample) & network["#ClusterIdx"].isin(shared)
+    assert counts.iloc[0]["count"] == expected.sum()
+
+
+def test_check_reports_stages_above_their_ceilings():
+    thresholds = {"stages": {"a": {"seconds": 1.0, "peak_mib": 10}, "b": {"seconds": 1.0}}}
+    results = {"a": {"seconds": 2.5, "peak_mib": 4.0}}
+
+    assert check(results, thresholds) == ["a: seconds 2.5 > 1"]
+    with open(THRESHOLDS) as fh:
+        recorded = json.load(fh)
+    assert recorded["scale"] in SCALES
+    # every ceiling comes from a measured baseline or is awaiting one; all are checked
+    assert set(recorded["stages"]) == set(recorded["baselines"]) | set(recorded["provisional"])
+    assert not set(recorded["baselines"]) & set(recorded["provisional"])
+    library = {stage: {"seconds": 1e9, "peak_mib": 1e9} for stage in recorded["provisional"]}
+    assert len(check(library, recorded)) == 2 * len(library)
+
+
+def test_record_replaces_the_ceilings_of_the_stages_that_ran():
+    thresholds = {
+        "stages": {"app.a": {"seconds": 1.0}, "rdd.b": {"seconds": 60, "peak_mib": 2048}},
+        "baselines": {"app.a": {"seconds": 0.2}},
+        "provisional": ["rdd.b"],
+    }
+    results = {"rdd.b": {"seconds": 1.234, "peak_mib": 0.1}}
+
+    updated = record(results, thresholds, {"rdd": "1.0"})
+
+    assert updated["stages"] == {
+        "app.a": {"seconds": 1.0},
+        "rdd.b": {"seconds": 6.2, "peak_mib": 1.0},
+    }
+    assert updated["baselines"]["rdd.b"] == {"seconds": 1.23, "peak_mib": 0.1}
+    assert updated["provisional"] == [] and updated["recorded"]["rdd"] == "1.0"
+    with open(THRESHOLDS) as fh:
+        text = fh.read()
+    assert _dumps(json.loads(text)) == text  # --record keeps the file's layout
+    assert thresholds["provisional"] == ["rdd.b"]  # not modified in place
@@ -0,0 +1,60 @@
+"""
+Tests for the colour-mapping registry in src/colours.py
+"""
+
+import pytest
+
+from src.colours import colour_mapping, foodomics_colours, grayscale_colours
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        b"descriptor;order_num;color_code\nplant_1;1;#458B00\nanimal_1;2;#8B1A1A\n",
+        b"descriptor\tcolor_code\nplant_1\t#458B00\nanimal_1\t #8B1A1A\n",
+        b"name,colour\nplant_1,#458B00\nanimal_1,#8B1A1A\nfungi_1,\n",
+    ],
+)
+def test_separators_and_columns(content):
+    assert dict(colour_mapping(content)) == {"plant_1": "#458B00", "animal_1": "#8B1A1A"}
+
+
+def test_invalid_codes_are_rejected():
+    with pytest.raises(ValueError, match="1 invalid colour code.*#12345Z"):
+        colour_mapping(b"descriptor;color_code\nplant_1;#12345Z\nmeat_2;rgb(1, 2, 3)\n")
+    with pytest.raises(ValueError, match="2 invalid colour code.*gren, bleu"):
+        colour_mapping(b"descriptor;color_code\nplant_1;gren\nmeat_2;bleu\nfish_2;Red\n")
+    with pytest.raises(ValueError, match="two columns"):
+        colour_mapping(b"descriptor\nplant_1\n")
+
+
+def test_css_colour_names_are_accepted_in_any_case():
+    content = b"descriptor;color_code\nplant_1;SteelBlue\nmeat_2;red\nfish_2;rgba(1, 2, 3, 0.5)\n"
+
+    assert list(colour_mapping(content).values()) == ["SteelBlue", "red", "rgba(1, 2, 3, 0.5)"]
+
+
+def test_mappings_are_cached_and_read_only():
+    content = b"descriptor;color_code\nplant_1;red\n"
+
+    mapping = colour_mapping(content)
+
+    assert colour_mapping(bytes(content)) is mapping
+    with pytest.raises(TypeError):
+        mapping["plant_1"] = "blue"
+
+
+def test_foodomics_mapping_skips_rows_without_colour():
+    colours = foodomics_colours()
+
+    assert colours["plant_1"] == "#458B00"
+    assert "corn husk_4" not in colours
+    assert foodomics_colours() is colours
+
+
+def test_grayscale_runs_from_white_to_dark_grey():
+    colours = grayscale_colours(["a_1", "b_1", "c_2"])
+
+    assert dict(colours) == {"a_1": "#ffffff", "b_1": "#9b9b9b", "c_2": "#373737"}
+    assert grayscale_colours(("a_1", "b_1", "c_2")) is colours
+    assert dict(grayscale_colours(["x_1"])) == {"x_1": "#ffffff"}
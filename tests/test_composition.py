@@ -0,0 +1,66 @@
+"""
+Tests for the in-house CLR transform in src/composition.py
+"""
+
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+
+from src.composition import clr_transform
+
+
+def _counts(seed=0, shape=(50, 30)):
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(0, 20, size=shape).astype(float)
+    counts[rng.random(shape) < 0.5] = 0
+    counts[:, 0] += 1  # no all-zero rows
+    return counts
+
+
+def test_matches_skbio_multi_replace_clr():
+    skbio = pytest.importorskip("skbio.stats.composition")
+    counts = _counts()
+    expected = skbio.clr(skbio.multi_replace(counts))
+
+    result = clr_transform(counts, chunk_rows=7)
+
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result, expected, rtol=1e-5, atol=1e-4)
+    np.testing.assert_allclose(result.sum(axis=1), 0, atol=1e-4)
+
+
+def test_sparse_input_and_in_place_buffer():
+    counts = _counts(1)
+    dense = clr_transform(counts)
+
+    np.testing.assert_array_equal(clr_transform(csr_matrix(counts), chunk_rows=8), dense)
+
+    buffer = counts.astype(np.float32)
+    assert clr_transform(buffer, out=buffer) is buffer
+    np.testing.assert_array_equal(buffer, dense)
+
+
+def test_without_replacement_requires_positive_values():
+    positive = _counts(2) + 1
+    skbio = pytest.importorskip("skbio.stats.composition")
+    np.testing.assert_allclose(
+        clr_transform(positive, multiplicative_replacement=False),
+        skbio.clr(positive),
+        rtol=1e-5,
+        atol=1e-5,
+    )
+    with pytest.raises(ValueError, match="zeros"):
+        clr_transform(_counts(2), multiplicative_replacement=False)
+
+
+@pytest.mark.parametrize(
+    "counts, delta, message",
+    [
+        (np.array([[1.0, 2.0], [0.0, 0.0]]), None, "all zeros"),
+        (np.array([[1.0, -2.0]]), None, "negative counts"),
+        (np.array([[1.0, 0.0, 0.0]]), 0.6, "smaller `delta`"),
+    ],
+)
+def test_invalid_input(counts, delta, message):
+    with pytest.raises(ValueError, match=message):
+        clr_transform(counts, delta=delta)
@@ -0,0 +1,164 @@
+"""
+Tests for the cached row filters in src/count_filter.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.count_filter import CountFilter, filter_counts, get_count_codes, with_cached_filters
+from src.level_index import LevelIndex
+from src.state_helpers import relabel_groups
+
+
+class FakeRDD:
+    def __init__(self, n_samples=40, seed=0):
+        rng = np.random.default_rng(seed)
+        rows = []
+        for level, types in ((0, [f"r{i}" for i in range(12)]), (1, ["plant", "animal", "fungi"])):
+            for s in range(n_samples):
+                for t in rng.choice(types, 3, replace=False):
+                    rows.append((f"s{s:02d}", t, int(rng.integers(1, 50)), level))
+        self.counts = pd.DataFrame(rows, columns=["filename", "reference_type", "count", "level"])
+        self.counts["group"] = np.where(self.counts["filename"] < "s20", "G1", "G2")
+        self.sample_metadata = pd.DataFrame(
+            {"filename": [f"s{s:02d}" for s in range(n_samples)]}
+        ).assign(group=lambda m: np.where(m["filename"] < "s20", "G1", "G2"))
+
+
+def _scan(counts, level=None, reference_types=None, groups=None, samples=None):
+    """Reference implementation: boolean scans over the string columns."""
+    keep = pd.Series(True, index=counts.index)
+    if level is not None:
+        keep &= counts["level"] == level
+    if reference_types:
+        keep &= counts["reference_type"].isin(reference_types)
+    if groups:
+        keep &= counts["group"].isin(groups)
+    if samples:
+        keep &= counts["filename"].isin(samples)
+    return counts[keep]
+
+
+@pytest.mark.parametrize(
+    "selection",
+    [
+        {},
+        {"level": 1},
+        {"level": 0, "reference_types": ["r1", "r5", "missing"]},
+        {"level": 1, "reference_types": ["plant"], "groups": ["G2"]},
+        {"reference_types": [], "samples": ["s03", "s31"]},
+        {"groups": ["G3"]},
+    ],
+)
+def test_selections_match_boolean_scans(selection):
+    rdd = FakeRDD()
+
+    got = filter_counts(rdd, **selection)
+
+    pd.testing.assert_frame_equal(got, _scan(rdd.counts, **selection))
+
+
+def test_selectors_are_normalised_and_masks_cached_per_component():
+    rdd = FakeRDD()
+    codes = get_count_codes(rdd)
+    first = CountFilter.compile(level=0, reference_types=["r2", "r1"], groups=["G1"])
+    second = CountFilter.compile(level=0, reference_types=("r1", "r2"), groups=["G2"])
+
+    assert first == CountFilter.compile(0, {"r1", "r2"}, ["G1"])
+    assert CountFilter.compile(reference_types=[]) == CountFilter()
+    level, types, _ = first.masks(codes)
+    level2, types2, groups2 = second.masks(codes)
+    # only the changed selector was evaluated again
+    assert level2 is level and types2 is types
+    assert not groups2.flags.writeable
+    assert get_count_codes(rdd) is codes
+
+
+def test_group_masks_follow_relabelling():
+    rdd = FakeRDD()
+    selection = CountFilter.compile(groups=["G9"])
+    assert selection.apply(rdd).empty
+
+    relabel_groups(rdd, pd.Series({"s00": "G9", "s01": "G9"}))
+
+    assert sorted(selection.apply(rdd)["filename"].unique()) == ["s00", "s01"]
+
+
+def test_contiguous_selections_are_views():
+    rdd = FakeRDD()
+
+    assert filter_counts(rdd) is rdd.counts
+    level0 = filter_counts(rdd, level=0)
+    assert np.shares_memory(level0["count"].to_numpy(), rdd.counts["count"].to_numpy())
+
+    index = LevelIndex(rdd.counts, sparse=False)
+    matrix = index.level(1)
+    sub = matrix.select_types(["fungi", "plant"])  # adjacent once sorted
+    assert sub.types.tolist() == ["fungi", "plant"]
+    assert np.shares_memory(sub.values, matrix.values)
+    assert matrix.select_types(matrix.types.tolist()) is matrix
+
+
+def test_cached_filters_serve_the_objects_filter_counts():
+    rdd = FakeRDD()
+
+    view = with_cached_filters(rdd)
+    got = view.filter_counts(reference_types=["plant"], level=1)
+
+    assert isinstance(view, FakeRDD) and view.counts is rdd.counts
+    assert not hasattr(rdd, "filter_counts")
+    pd.testing.assert_frame_equal(got, _scan(rdd.counts, level=1, reference_types=["plant"]))
+    assert get_count_codes(rdd).matches(rdd.counts)
+
+
+def _with_missing_groups():
+    rdd = FakeRDD()
+    missing = rdd.counts["filename"].isin(["s00", "s21"])
+    rdd.counts["group"] = rdd.counts["group"].where(~missing)
+    rdd.sample_metadata["group"] = rdd.sample_metadata["group"].where(
+        ~rdd.sample_metadata["filename"].isin(["s00", "s21"])
+    )
+    return rdd
+
+
+def test_rows_without_a_group_are_kept_unless_groups_are_selected():
+    rdd = _with_missing_groups()
+    view = with_cached_filters(rdd)
+
+    level = view.filter_counts(reference_types=["plant", "animal"], level=1)
+    grouped = filter_counts(rdd, level=1, groups=["G1", "G2"])
+
+    pd.testing.assert_frame_equal(level, _scan(rdd.counts, 1, ["plant", "animal"]))
+    assert {"s00", "s21"} <= set(level["filename"])
+    assert level["group"].isna().any()
+    pd.testing.assert_frame_equal(grouped, _scan(rdd.counts, 1, groups=["G1", "G2"]))
+    assert not grouped["group"].isna().any()
+
+
+def test_level_zero_selects_only_file_level_rows():
+    rdd = FakeRDD()
+    view = with_cached_filters(rdd)
+
+    everything = view.filter_counts(level=0)
+    some = view.filter_counts(reference_types=["r3", "plant"], level=0)
+
+    assert set(everything["level"]) == {0}
+    pd.testing.assert_frame_equal(everything, _scan(rdd.counts, 0))
+    assert set(some["reference_type"]) == {"r3"}
+    pd.testing.assert_frame_equal(some, _scan(rdd.counts, 0, ["r3", "plant"]))
+
+
+def test_unknown_reference_types_select_nothing():
+    rdd = FakeRDD()
+    view = with_cached_filters(rdd)
+
+    unknown = view.filter_counts(reference_types=["missing", "also missing"], level=1)
+    mixed = view.filter_counts(reference_types=["missing", "fungi"], level=1)
+    other_level = view.filter_counts(reference_types=["plant"], level=0)
+    no_level = view.filter_counts(reference_types=["plant"], level=7)
+
+    assert unknown.empty and list(unknown.columns) == list(rdd.counts.columns)
+    assert set(mixed["reference_type"]) == {"fungi"}
+    pd.testing.assert_frame_equal(mixed, _scan(rdd.counts, 1, ["missing", "fungi"]))
+    assert other_level.empty and no_level.empty
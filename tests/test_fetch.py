@@ -0,0 +1,198 @@
+"""
+Tests for the pooled, resumable GNPS downloader in src/fetch.py, run against a
+local stand-in HTTP server.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from src.fetch import FetchError, HttpFetcher, task_url
+from src.task_cache import TaskCache
+
+PAYLOAD = (
+    "#ClusterIdx\t#Filename\tDefaultGroups\n"
+    + "".join(f"{i}\tsample_{i}.mzML\tG{i % 2 + 1}\n" for i in range(5000))
+).encode()
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Serves PAYLOAD with Range support and scripted failures."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.get("Range"))
+        if server.errors:
+            status = server.errors.pop(0)
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start = 0
+        if self.headers.get("Range"):
+            start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+            if start >= len(PAYLOAD):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(PAYLOAD)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+        else:
+            self.send_response(200)
+        body = PAYLOAD[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if server.cut_after is not None:
+            # Drop the connection part-way through the body
+            self.wfile.write(body[: server.cut_after])
+            server.cut_after = None
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    httpd.requests, httpd.errors, httpd.cut_after = [], [], None
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/resultfile?task={{task_id}}"
+
+
+def _fetcher(tmp_path, **kwargs):
+    delays = []
+    kwargs.setdefault("chunk_size", 4096)
+    fetcher = HttpFetcher(download_dir=str(tmp_path), sleep=delays.append, **kwargs)
+    return fetcher, delays
+
+
+def test_download_reports_progress(tmp_path, server, url):
+    fetcher, delays = _fetcher(tmp_path)
+    updates = []
+
+    path = fetcher.download(url.format(task_id="t"), tmp_path / "net.tsv", updates.append)
+
+    assert path.read_bytes() == PAYLOAD
+    assert not (tmp_path / "net.tsv.part").exists()
+    assert updates[-1].received == updates[-1].total == len(PAYLOAD)
+    assert updates[-1].fraction == 1.0 and "MiB/s" in updates[-1].describe()
+    assert delays == []
+
+
+def test_retries_server_errors_with_bounded_backoff(tmp_path, server, url):
+    server.errors = [500, 503, 502, 500]
+    fetcher, delays = _fetcher(tmp_path, backoff=1.0, max_backoff=3.0)
+
+    path = fetcher.download(url.format(task_id="t"), tmp_path / "net.tsv")
+
+    assert path.read_bytes() == PAYLOAD
+    assert delays == [1.0, 2.0, 3.0, 3.0]
+
+
+def test_gives_up_after_retries(tmp_path, server, url):
+    server.errors = [500] * 10
+    fetcher, delays = _fetcher(tmp_path, retries=2)
+
+    with pytest.raises(FetchError, match="HTTP 500"):
+        fetcher.download(url.format(task_id="t"), tmp_path / "net.tsv")
+    assert len(server.requests) == 3 and len(delays) == 2
+
+
+def test_client_errors_are_not_retried(tmp_path, server, url):
+    server.errors = [404]
+    fetcher, delays = _fetcher(tmp_path)
+
+    with pytest.raises(FetchError, match="HTTP 404"):
+        fetcher.download(url.format(task_id="t"), tmp_path / "net.tsv")
+    assert delays == []
+
+
+def test_interrupted_transfer_resumes_with_range(tmp_path, server, url):
+    server.cut_after = 10_000
+    fetcher, _ = _fetcher(tmp_path)
+
+    path = fetcher.download(url.format(task_id="t"), tmp_path / "net.tsv")
+
+    assert path.read_bytes() == PAYLOAD
+    # Resumes after the last complete chunk written before the drop
+    assert server.requests[0] is None and len(server.requests) == 2
+    assert 0 < int(server.requests[1][len("bytes=") : -1]) <= 10_000
+
+
+def test_existing_part_file_is_resumed_or_completed(tmp_path, server, url):
+    fetcher, _ = _fetcher(tmp_path)
+    (tmp_path / "a.tsv.part").write_bytes(PAYLOAD[:123])
+    (tmp_path / "b.tsv.part").write_bytes(PAYLOAD)
+
+    assert fetcher.download(url.format(task_id="a"), tmp_path / "a.tsv").read_bytes() == PAYLOAD
+    assert fetcher.download(url.format(task_id="b"), tmp_path / "b.tsv").read_bytes() == PAYLOAD
+    assert server.requests == ["bytes=123-", f"bytes={len(PAYLOAD)}-"]
+
+
+def test_task_cache_uses_http_fetcher(tmp_path, server, url, monkeypatch):
+    monkeypatch.setenv("RDD_GNPS1_URL", url)
+    assert task_url("abc", gnps2=False) == url.format(task_id="abc")
+    cache = TaskCache(str(tmp_path / "cache"))
+    fetcher, _ = _fetcher(tmp_path / "downloads")
+
+    table = cache.fetch("abc", gnps2=False, download=fetcher.fetch_task)
+    again = cache.fetch("abc", gnps2=False, download=fetcher.fetch_task)
+
+    assert len(table) == 5000 and list(table.columns)[:2] == ["#ClusterIdx", "#Filename"]
+    pd.testing.assert_frame_equal(again, table)
+    assert len(server.requests) == 1
+    assert list((tmp_path / "downloads").iterdir()) == []
+
+
+def test_concurrent_fetches_of_one_task_share_one_download(tmp_path, server, url, monkeypatch):
+    monkeypatch.setenv("RDD_GNPS1_URL", url)
+    fetcher, _ = _fetcher(tmp_path)
+    tables = []
+    threads = [
+        threading.Thread(target=lambda: tables.append(fetcher.fetch_task("abc", gnps2=False)))
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [len(table) for table in tables] == [5000, 5000]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_fetch_is_resumed_by_the_next_one(tmp_path, server, url, monkeypatch):
+    monkeypatch.setenv("RDD_GNPS1_URL", url)
+    server.cut_after = 10_000
+    fetcher, _ = _fetcher(tmp_path, retries=0)
+
+    with pytest.raises(FetchError):
+        fetcher.fetch_task("abc", gnps2=False)
+    [part] = tmp_path.iterdir()
+    staged = part.stat().st_size
+    assert part.name.endswith(".tsv.part") and 0 < staged <= 10_000
+
+    # A new fetcher (as after a restart) picks the part file up
+    table = _fetcher(tmp_path)[0].fetch_task("abc", gnps2=False)
+
+    assert len(table) == 5000
+    assert server.requests == [None, f"bytes={staged}-"]
+    assert list(tmp_path.iterdir()) == []
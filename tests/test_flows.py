@@ -0,0 +1,145 @@
+"""
+Tests for the precomputed Sankey flow graph in src/flows.py
+"""
+
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.flows import build_flow_graph, get_flow_graph, sankey_figure
+
+ONTOLOGY = ["sample_type_group1", "sample_type_group2", "sample_type_group3"]
+
+
+def _reference():
+    return pd.DataFrame(
+        {
+            "filename": ["apple.mzML", "pear.mzML", "beef.mzML", "kale.mzML"],
+            "sample_type_group1": ["plant", "plant", "animal", "plant"],
+            "sample_type_group2": ["fruit", "fruit", "meat", "vegetable"],
+            "sample_type_group3": ["apple", "pear", "beef", None],
+        }
+    )
+
+
+def _file_counts():
+    return pd.DataFrame(
+        {
+            "filename": ["s1", "s1", "s1", "s2", "s2", "s2"],
+            "reference_type": ["apple", "pear", "kale", "beef", "apple", "unknown"],
+            "count": [2, 3, 4, 5, 1, 9],
+            "level": 0,
+        }
+    )
+
+
+def _as_dict(flows):
+    return {(s, t): v for s, t, v in flows.itertuples(index=False)}
+
+
+def test_flows_of_all_samples_and_one_sample():
+    graph = build_flow_graph(_file_counts(), _reference(), ONTOLOGY)
+
+    assert _as_dict(graph.flows()) == {
+        ("plant_1", "fruit_2"): 6,
+        ("plant_1", "vegetable_2"): 4,
+        ("animal_1", "meat_2"): 5,
+        ("fruit_2", "apple_3"): 3,
+        ("fruit_2", "pear_3"): 3,
+        ("meat_2", "beef_3"): 5,
+    }
+    assert _as_dict(graph.flows("s2")) == {
+        ("plant_1", "fruit_2"): 1,
+        ("animal_1", "meat_2"): 5,
+        ("fruit_2", "apple_3"): 1,
+        ("meat_2", "beef_3"): 5,
+    }
+    with pytest.raises(KeyError):
+        graph.flows("s9")
+
+
+def test_max_level_drops_deeper_edges():
+    graph = build_flow_graph(_file_counts(), _reference(), ONTOLOGY)
+
+    flows = graph.flows("s1", max_level=2)
+
+    assert graph.max_level == 3
+    assert set(flows["target"]) == {"fruit_2", "vegetable_2"}
+    assert flows["value"].sum() == 9
+
+
+def _random_inputs(seed=0, n_references=60, n_samples=25):
+    rng = np.random.default_rng(seed)
+    reference = pd.DataFrame({"filename": [f"ref{i:03d}.mzML" for i in range(n_references)]})
+    for level, n_terms in enumerate((3, 6, 12), start=1):
+        terms = rng.choice([f"L{level}t{t}" for t in range(n_terms)], n_references).astype(object)
+        terms[rng.random(n_references) < 0.1] = None  # unannotated at this level
+        reference[f"sample_type_group{level}"] = terms
+    rows = [
+        (f"s{s:02d}", f"ref{r:03d}", int(rng.integers(1, 20)))
+        for s in range(n_samples)
+        for r in rng.choice(n_references + 5, 15, replace=False)  # ref060+ are unknown
+    ]
+    counts = pd.DataFrame(rows, columns=["filename", "reference_type", "count"]).assign(level=0)
+    return counts, reference
+
+
+def _scan_flows(counts, reference, sample=None, max_level=None):
+    """Reference implementation: join and group by every adjacent pair of levels."""
+    if sample is not None:
+        counts = counts[counts["filename"] == sample]
+    terms = reference.assign(reference_type=reference["filename"].str.rsplit(".", n=1).str[0])
+    joined = counts.merge(terms, on="reference_type")
+    flows = {}
+    for level in range(1, min(max_level or len(ONTOLOGY), len(ONTOLOGY))):
+        parent, child = ONTOLOGY[level - 1], ONTOLOGY[level]
+        pairs = joined.dropna(subset=[parent, child]).groupby([parent, child])["count"].sum()
+        for (a, b), value in pairs.items():
+            flows[(f"{a}_{level}", f"{b}_{level + 1}")] = value
+    return flows
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_flow_tables_match_a_join_over_the_counts(seed):
+    counts, reference = _random_inputs(seed)
+    graph = build_flow_graph(counts, reference, ONTOLOGY)
+
+    for sample in (None, "s00", "s17"):
+        for max_level in (None, 2, 3):
+            flows = graph.flows(sample, max_level=max_level)
+            assert list(flows.columns) == ["source", "target", "value"]
+            assert (flows["value"] > 0).all() and not flows.duplicated(["source", "target"]).any()
+            assert _as_dict(flows) == pytest.approx(
+                _scan_flows(counts, reference, sample, max_level)
+            )
+
+
+def test_graph_is_memoised_on_the_level_index():
+    counts = _file_counts()
+    upper = pd.DataFrame(
+        {"filename": ["s1"], "reference_type": ["plant"], "count": [9], "level": [1]}
+    )
+    rdd = types.SimpleNamespace(
+        counts=pd.concat([counts, upper], ignore_index=True),
+        reference_metadata=_reference(),
+        levels=2,
+    )
+
+    graph = get_flow_graph(rdd)
+
+    assert get_flow_graph(rdd) is graph
+    assert graph.max_level == 2
+
+
+def test_sankey_figure_uses_the_colour_mapping():
+    graph = build_flow_graph(_file_counts(), _reference(), ONTOLOGY)
+
+    fig = sankey_figure(graph.flows(max_level=2), {"plant_1": "#458B00"}, dark_mode=True)
+
+    sankey = fig.data[0]
+    labels = list(sankey.node.label)
+    assert sorted(labels) == ["animal", "fruit", "meat", "plant", "vegetable"]
+    assert sankey.node.color[labels.index("plant")] == "#458B00"
+    assert sankey.link.color[0] == "rgba(69, 139, 0, 0.4)"
@@ -0,0 +1,85 @@
+"""
+Tests for the per-sample group lookup in src/groups.py and relabel_groups
+"""
+
+import pandas as pd
+
+from src.groups import GroupAssignment, get_group_assignment
+from src.level_index import get_level_index
+from src.state_helpers import relabel_groups
+
+
+class FakeRDD:
+    def __init__(self):
+        self.counts = pd.DataFrame(
+            {
+                "filename": ["s2", "s1", "s1", "s2", "s1", "s3"],
+                "reference_type": ["Type_A", "Type_A", "Type_B", "Type_B", "r1", "r2"],
+                "count": [15, 10, 20, 25, 3, 4],
+                "level": [1, 1, 1, 1, 0, 0],
+                "group": ["G2", "G1", "G1", "G2", "G1", "G3"],
+            }
+        )
+        self.sample_metadata = pd.DataFrame(
+            {
+                "filename": ["s1", "s2", "s3"],
+                "group": ["G1", "G2", "G3"],
+                "diet": ["G1", "G2", "G3"],
+            }
+        )
+        self.sample_group_col = "diet"
+
+
+def test_assignment_is_seeded_from_counts():
+    counts = FakeRDD().counts
+    assignment = GroupAssignment(counts)
+    assert assignment.sample_groups().to_dict() == {"s2": "G2", "s1": "G1", "s3": "G3"}
+    assert assignment.group_column().tolist() == counts["group"].tolist()
+
+
+def test_relabel_keeps_unmatched_samples():
+    assignment = GroupAssignment(FakeRDD().counts)
+    found = assignment.relabel(pd.Series(["Vegan", "X"], index=["s1", "missing"]))
+    assert found == 1
+    assert assignment.group_column().tolist() == ["G2", "Vegan", "Vegan", "G2", "Vegan", "G3"]
+    assert "G1" not in assignment.labels.categories
+
+
+def test_relabel_groups_updates_counts_metadata_and_index():
+    rdd = FakeRDD()
+    index = get_level_index(rdd)
+    counts = rdd.counts
+
+    found = relabel_groups(rdd, pd.Series(["Omnivore", "Vegan", "Vegan"], index=["s2", "s3", "s3"]))
+
+    assert found == 2
+    assert rdd.counts is counts  # relabelled in place, no copy or merge
+    assert rdd.counts["group"].tolist() == ["Omnivore", "G1", "G1", "Omnivore", "G1", "Vegan"]
+    assert not isinstance(rdd.counts["group"].dtype, pd.CategoricalDtype)
+    assert rdd.sample_metadata["group"].tolist() == ["G1", "Omnivore", "Vegan"]
+    assert rdd.sample_metadata["diet"].tolist() == ["G1", "Omnivore", "Vegan"]
+    assert get_level_index(rdd) is index
+    assert index.groups.to_dict() == {"s1": "G1", "s2": "Omnivore", "s3": "Vegan"}
+
+
+def test_assignment_is_rebuilt_when_counts_are_replaced():
+    rdd = FakeRDD()
+    first = get_group_assignment(rdd)
+    assert get_group_assignment(rdd) is first
+    rdd.counts = rdd.counts[rdd.counts["level"] == 1].reset_index(drop=True)
+    assert get_group_assignment(rdd) is not first
+
+
+def test_group_bys_keep_only_used_groups_with_pandas_2_defaults():
+    """pandas 2 defaults to observed=False: unused groups must not appear as empty rows."""
+    rdd = FakeRDD()
+    relabel_groups(rdd, pd.Series({"s3": "G1"}))  # G3 is no longer used
+
+    sizes = rdd.counts.groupby(["group", "reference_type"], observed=False).size()
+    table = rdd.counts.pivot_table(
+        index="group", columns="level", values="count", aggfunc="sum", observed=False
+    )
+
+    assert (sizes > 0).all()
+    assert sorted(table.index) == ["G1", "G2"]
+    assert pd.isna(GroupAssignment(rdd.counts.assign(group=None)).group_column()).all()
@@ -0,0 +1,97 @@
+"""
+Tests for the clustered level-of-detail heatmap in src/heatmap.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from src.heatmap import cluster_order, heatmap_view, leaf_order, view_figure
+from src.level_index import LevelIndex
+
+
+def _counts(n_samples=60, n_types=12, seed=0):
+    """Two sample clusters with disjoint dominant types, interleaved by name."""
+    rng = np.random.default_rng(seed)
+    types = [f"T{j:02d}" for j in range(n_types)]
+    records = []
+    for i in range(n_samples):
+        dominant = types[: n_types // 2] if i % 2 else types[n_types // 2 :]
+        for t in types:
+            records.append((f"s{i:03d}", t, int(rng.integers(50, 60) if t in dominant else 1)))
+    frame = pd.DataFrame(records, columns=["filename", "reference_type", "count"])
+    frame["level"] = 1
+    return frame
+
+
+def _proportions(counts):
+    wide = counts.pivot_table(index="filename", columns="reference_type", values="count")
+    return wide.div(wide.sum(axis=1), axis=0)
+
+
+@pytest.mark.parametrize("max_leaves", [500, 8])
+def test_leaf_order_keeps_clusters_together(max_leaves):
+    points = np.vstack([np.zeros((20, 40)), np.ones((20, 40))])[np.argsort(np.arange(40) % 2)]
+    points += np.random.default_rng(1).normal(0, 0.01, points.shape)
+    labels = points[:, 0] > 0.5
+
+    order = leaf_order(points, max_leaves=max_leaves)
+
+    assert sorted(order) == list(range(40))
+    assert np.count_nonzero(np.diff(labels[order].astype(int))) == 1
+
+
+def test_cluster_order_is_memoised():
+    index = LevelIndex(_counts())
+
+    order = cluster_order(index, 1)
+
+    assert cluster_order(index, 1) is order
+    assert sorted(order.columns) == list(range(12))
+
+
+def test_full_resolution_view_is_the_reordered_matrix():
+    counts = _counts()
+    index = LevelIndex(counts)
+    order = cluster_order(index, 1)
+
+    view = heatmap_view(index, 1, max_rows=1000, max_cols=1000)
+
+    expected = _proportions(counts).to_numpy()[np.ix_(order.rows, order.columns)]
+    assert view.is_exact and view.shape == (60, 12)
+    np.testing.assert_allclose(view.values, expected)
+
+
+def test_coarse_tiles_and_zoomed_viewport():
+    counts = _counts()
+    index = LevelIndex(counts)
+    order = cluster_order(index, 1)
+    full = _proportions(counts).to_numpy()[np.ix_(order.rows, order.columns)]
+
+    coarse = heatmap_view(index, 1, max_rows=7, max_cols=5)
+    zoom = heatmap_view(index, 1, rows=(10, 14), columns=(2, 5), max_rows=7, max_cols=5)
+
+    assert coarse.values.shape == (7, 5) and not coarse.is_exact
+    edges_r, edges_c = coarse.row_edges, coarse.col_edges
+    np.testing.assert_allclose(
+        coarse.values[1, 2], full[edges_r[1] : edges_r[2], edges_c[2] : edges_c[3]].mean()
+    )
+    assert zoom.is_exact and zoom.values.shape == (4, 3)
+    np.testing.assert_allclose(zoom.values, full[10:14, 2:5])
+    assert "(" in coarse.row_labels[0] and "(" not in zoom.row_labels[0]
+
+
+def test_sparse_levels_and_type_selection():
+    counts = _counts()
+    dense, sparse_index = LevelIndex(counts), LevelIndex(counts, sparse=True)
+    assert sparse.issparse(sparse_index.level(1).values)
+    sparse_index.derived.update(dense.derived)
+    selected = ["T01", "T07", "T03"]
+
+    expected = heatmap_view(dense, 1, selected, max_rows=9)
+    view = heatmap_view(sparse_index, 1, selected, max_rows=9)
+
+    np.testing.assert_allclose(view.values, expected.values)
+    assert sorted(view.col_labels) == sorted(selected)
+    assert view_figure(view).data[0].z.shape == (9, 3)
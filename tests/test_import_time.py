@@ -0,0 +1,77 @@
+"""
+Import-time budget: app modules and page loads must not pull in the heavy
+scientific / plotting stack, and a cold import must stay under budget.
+
+Each check runs in a fresh interpreter so modules imported by other tests do
+not hide a regression.  The time budget can be tuned for slow CI machines
+with the ``IMPORT_BUDGET_SECONDS`` environment variable.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BUDGET_SECONDS = float(os.environ.get("IMPORT_BUDGET_SECONDS", "5"))
+
+# Loaded only on the code paths that need them (Streamlit itself imports plotly)
+DEFERRED = ("rdd", "sklearn", "skbio", "scipy", "matplotlib", "seaborn")
+
+APP_MODULES = [
+    f"src.{name[:-3]}"
+    for name in sorted(os.listdir(os.path.join(ROOT, "src")))
+    if name.endswith(".py") and not name.startswith("_")
+]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{body}
+seconds = time.perf_counter() - start
+loaded = sorted({{m.split(".")[0] for m in sys.modules}} & set({deferred!r}))
+print(json.dumps({{"seconds": seconds, "loaded": loaded}}))
+"""
+
+
+def _probe(body: str) -> dict:
+    code = _PROBE.format(body=body, deferred=DEFERRED)
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_app_modules_import_lazily_and_within_budget():
+    report = _probe("\n".join(f"import {module}" for module in APP_MODULES))
+
+    assert report["loaded"] == []
+    assert report["seconds"] < BUDGET_SECONDS
+
+
+@pytest.mark.parametrize(
+    "page",
+    [
+        "Home.py",
+        "pages/01_Create_RDD_Count_Table.py",
+        "pages/02_Visualizations.py",
+        "pages/03_PCA_Analysis.py",
+        "pages/04_Sankey_Diagram.py",
+        "pages/05_How_to_Use.py",
+        "pages/06_Batch_Mode.py",
+    ],
+)
+def test_page_load_defers_heavy_imports(page):
+    pytest.importorskip("streamlit.testing.v1")
+    body = (
+        "from streamlit.testing.v1 import AppTest\n"
+        f"at = AppTest.from_file({os.path.join(ROOT, page)!r}, default_timeout=60).run()\n"
+        "assert not at.exception, at.exception"
+    )
+    report = _probe(body)
+
+    assert report["loaded"] == []
+    assert report["seconds"] < BUDGET_SECONDS
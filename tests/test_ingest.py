@@ -0,0 +1,68 @@
+"""
+Tests for the upload ingestion stage in src/ingest.py
+"""
+
+import io
+import os
+
+from src.ingest import SpillDirectory, read_header, sep_for, unique_values
+
+
+def _upload(text, name):
+    buf = io.BytesIO(text.encode())
+    buf.name = name
+    return buf
+
+
+def test_sep_for_extension():
+    """TSV/TXT are tab separated, everything else is comma separated."""
+    assert sep_for("network.tsv") == "\t"
+    assert sep_for("meta.TXT") == "\t"
+    assert sep_for("meta.csv") == ","
+
+
+def test_spill_deduplicates_identical_content():
+    """Identical bytes share one spilled file named by their digest."""
+    spill = SpillDirectory()
+    first = spill.spill(_upload("filename,group\na,G1\n", "one.csv"))
+    second = spill.spill(_upload("filename,group\na,G1\n", "two.csv"))
+
+    assert first.digest == second.digest
+    assert first.path == second.path
+    assert len(os.listdir(spill.path)) == 1
+    spill.cleanup()
+
+
+def test_spill_reuses_upload_id():
+    """An upload carrying a file_id is only streamed once."""
+    spill = SpillDirectory()
+    upload = _upload("filename,group\na,G1\n", "meta.csv")
+    upload.file_id = "abc"
+    first = spill.spill(upload)
+    upload.read = None  # any further read would fail
+
+    assert spill.spill(upload) is first
+    spill.cleanup()
+
+
+def test_cleanup_removes_directory():
+    """Cleanup deletes the directory and its spilled files."""
+    spill = SpillDirectory()
+    spill.spill(_upload("a\n1\n", "x.csv"))
+    path = spill.path
+
+    spill.cleanup()
+    assert not os.path.exists(path)
+    assert not spill.alive
+
+
+def test_projected_readers():
+    """Header and unique values are read without parsing the whole frame."""
+    spill = SpillDirectory()
+    spilled = spill.spill(
+        _upload("filename\tDefaultGroups\tmz\na\tG1\t1\nb\tG4\t2\nc\tG1\t3\nd\t\t4\n", "n.tsv")
+    )
+
+    assert read_header(spilled) == ["filename", "DefaultGroups", "mz"]
+    assert unique_values(spilled, "DefaultGroups") == ["G1", "G4"]
+    spill.cleanup()
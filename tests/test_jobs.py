@@ -0,0 +1,84 @@
+"""
+Tests for the background job runner in src/jobs.py and build requests in src/build.py
+"""
+
+import time
+
+import pytest
+
+from src.build import BuildRequest
+from src.jobs import DONE, FAILED, JobQueue
+
+
+def _square(x, progress):
+    progress("compute", 0.5, "squaring")
+    return x * x
+
+
+def _boom(progress):
+    raise RuntimeError("HTTP 500 from GNPS")
+
+
+@pytest.fixture(scope="module")
+def queue():
+    q = JobQueue(max_workers=2)
+    yield q
+    q.shutdown()
+
+
+def test_job_result_and_status(queue):
+    """A finished job reports DONE with its last stage, then returns its result."""
+    job_id = queue.submit(_square, 7)
+    queue._futures[job_id].result(timeout=60)
+
+    status = queue.status(job_id)
+    assert status.state == DONE
+    assert status.finished
+    assert (status.stage, status.fraction, status.message) == ("compute", 0.5, "squaring")
+    assert queue.result(job_id) == 49
+    assert job_id not in queue
+
+
+def test_failed_job_reports_error(queue):
+    """Worker exceptions surface as FAILED with the message, and re-raise on result()."""
+    job_id = queue.submit(_boom)
+    queue._futures[job_id].exception(timeout=60)
+
+    status = queue.status(job_id)
+    assert status.state == FAILED
+    assert "HTTP 500" in status.error
+    with pytest.raises(RuntimeError, match="HTTP 500"):
+        queue.result(job_id)
+
+
+def test_unclaimed_results_are_dropped():
+    """Finished jobs nobody collects expire, and at most max_unclaimed are kept."""
+    q = JobQueue(max_workers=1, result_ttl=3600, max_unclaimed=1)
+    try:
+        first, second = q.submit(_square, 2), q.submit(_square, 3)
+        q._futures[second].result(timeout=60)
+        q._futures[first].result(timeout=60)
+        while len(q._finished) < 2:  # done callbacks run on the pool's thread
+            time.sleep(0.01)
+
+        assert q.prune() == 1 and first not in q and second in q
+        q.result_ttl = 0
+        assert second not in q
+        assert q._futures == {} and q._finished == {}
+    finally:
+        q.shutdown()
+
+
+def test_build_request_kwargs():
+    """Only the input that is actually used reaches the RDDCounts constructor."""
+    by_file = BuildRequest(gnps_network_path="net.tsv", sample_groups=("G1",), levels=3)
+    kwargs = by_file.rdd_kwargs()
+    assert kwargs["gnps_network_path"] == "net.tsv"
+    assert kwargs["sample_groups"] == ["G1"]
+    assert "task_id" not in kwargs and "gnps_2" not in kwargs
+
+    by_task = BuildRequest(task_id="abc", gnps_2=False)
+    kwargs = by_task.rdd_kwargs()
+    assert kwargs["task_id"] == "abc" and kwargs["gnps_2"] is False
+    assert "gnps_network_path" not in kwargs
+    assert kwargs["reference_groups"] is None
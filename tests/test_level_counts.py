@@ -0,0 +1,92 @@
+"""
+Tests for vectorised per-level aggregation in src/level_counts.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.level_counts import aggregate_levels, resolve_ontology_columns
+
+
+def _file_counts():
+    return pd.DataFrame(
+        {
+            "filename": ["s1", "s1", "s1", "s2", "s2"],
+            "reference_type": ["r1", "r2", "r3", "r1", "r4"],
+            "count": [1, 2, 4, 8, 16],
+            "level": 0,
+            "group": ["G1", "G1", "G1", "G2", "G2"],
+        }
+    )
+
+
+def _reference_metadata():
+    return pd.DataFrame(
+        {
+            "filename": ["r1.mzML", "r2.mzXML", "r3.mzML", "r4.mzML"],
+            "sample_type_group1": ["plant", "plant", "animal", "plant"],
+            "sample_type_group2": ["fruit", "vegetable", "meat", None],
+            "custom_kingdom": ["K", "K", "K", "K"],
+        }
+    )
+
+
+def _serial(file_counts, reference_metadata, columns):
+    """Reference implementation: merge + group-by, one level at a time."""
+    ref = reference_metadata.assign(
+        filename=reference_metadata["filename"].str.replace(r"\.(mzML|mzXML)$", "", regex=True)
+    )
+    joined = file_counts.merge(ref, left_on="reference_type", right_on="filename")
+    out = []
+    for i, col in enumerate(columns, start=1):
+        level = (
+            joined.groupby(["filename_x", col, "group"])["count"]
+            .sum()
+            .reset_index()
+            .rename(columns={"filename_x": "filename", col: "reference_type"})
+        )
+        level["level"] = i
+        out.append(level)
+    return pd.concat(out, ignore_index=True)
+
+
+def test_matches_serial_groupby():
+    """The vectorised aggregation equals a serial merge + group-by per level."""
+    columns = ["sample_type_group1", "sample_type_group2"]
+    result = aggregate_levels(_file_counts(), _reference_metadata(), columns)
+    expected = _serial(_file_counts(), _reference_metadata(), columns)
+
+    key = ["level", "filename", "reference_type"]
+    cols = key + ["count", "group"]
+    pd.testing.assert_frame_equal(
+        result[cols].sort_values(key).reset_index(drop=True),
+        expected[cols].sort_values(key).reset_index(drop=True),
+    )
+
+
+def test_levels_come_in_order_and_skip_references_without_a_term():
+    reference_metadata = _reference_metadata()
+    reference_metadata.loc[0, "sample_type_group2"] = np.nan
+    columns = ["sample_type_group1", "sample_type_group2"]
+
+    result = aggregate_levels(_file_counts(), reference_metadata, columns)
+    expected = _serial(_file_counts(), reference_metadata, columns)
+
+    assert result["level"].is_monotonic_increasing
+    assert result["reference_type"].notna().all()
+    assert result.groupby("level")["count"].sum().tolist() == (
+        expected.groupby("level")["count"].sum().tolist()
+    )
+
+
+def test_resolve_ontology_columns():
+    """Renamed, then custom, then default sample_type_group columns are used."""
+    ref = _reference_metadata()
+
+    assert resolve_ontology_columns(ref) == ["sample_type_group1", "sample_type_group2"]
+    assert resolve_ontology_columns(ref, levels=1) == ["sample_type_group1"]
+    assert resolve_ontology_columns(ref, custom=["custom_kingdom"]) == ["custom_kingdom"]
+    assert resolve_ontology_columns(ref, custom=["missing"]) == [
+        "sample_type_group1",
+        "sample_type_group2",
+    ]
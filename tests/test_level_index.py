@@ -0,0 +1,149 @@
+"""
+Tests for the per-level matrix index in src/level_index.py
+"""
+
+import pickle
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from src.count_filter import get_count_codes
+from src.counts_version import counts_changed, counts_stamp, counts_version
+from src.groups import get_group_assignment
+from src.level_index import LevelIndex, get_level_index
+
+
+def _counts():
+    return pd.DataFrame(
+        {
+            "filename": ["s2", "s1", "s1", "s2", "s1", "s3"],
+            "reference_type": ["Type_A", "Type_A", "Type_B", "Type_B", "r1", "r2"],
+            "count": [15, 10, 20, 25, 3, 4],
+            "level": [1, 1, 1, 1, 0, 0],
+            "group": ["G2", "G1", "G1", "G2", "G1", "G3"],
+        }
+    )
+
+
+def test_level_matrix_matches_pivot():
+    """Each level equals a pivot of the long table."""
+    counts = _counts()
+    index = LevelIndex(counts)
+    level1 = index.level(1)
+
+    expected = (
+        counts[counts["level"] == 1]
+        .pivot_table(index="filename", columns="reference_type", values="count", fill_value=0)
+        .astype(float)
+    )
+    pd.testing.assert_frame_equal(level1.to_frame(), expected, check_names=False)
+    assert level1.samples.tolist() == ["s1", "s2"]
+    assert index.reference_types(0) == ["r1", "r2"]
+    assert index.reference_types(7) == []
+
+
+def test_rows_are_coded_into_shared_sample_axis():
+    """Per-level row codes point into the shared, sorted sample axis."""
+    index = LevelIndex(_counts())
+
+    assert index.samples.tolist() == ["s1", "s2", "s3"]
+    assert index.level(0).sample_codes.tolist() == [0, 2]
+    assert index.samples[index.level(0).sample_codes].tolist() == ["s1", "s3"]
+
+
+def test_select_types_and_proportions():
+    """Column selection and row-normalisation work on the matrix."""
+    level1 = LevelIndex(_counts()).level(1)
+
+    assert level1.select_types(["Type_B"]).values[:, 0].tolist() == [20, 25]
+    np.testing.assert_allclose(level1.proportions().sum(axis=1), 1.0)
+
+
+def test_groups_follow_set_groups():
+    """Group labels are refreshed without rebuilding the matrices."""
+    index = LevelIndex(_counts())
+    matrix = index.level(1)
+    assert index.groups.tolist() == ["G1", "G2", "G3"]
+
+    index.set_groups(pd.Series({"s1": "Vegan", "s2": "Omnivore", "s3": "Vegan"}))
+    assert index.level(1) is matrix
+    assert index.level(1).to_frame(index.groups)["group"].tolist() == ["Vegan", "Omnivore"]
+
+
+def test_get_level_index_rebuilds_when_counts_replaced():
+    """The cached index is reused until rdd.counts is replaced."""
+
+    class Holder:
+        counts = _counts()
+
+    rdd = Holder()
+    first = get_level_index(rdd)
+    assert get_level_index(rdd) is first
+
+    rdd.counts = _counts()
+    assert get_level_index(rdd) is not first
+
+
+def test_caches_follow_announced_edits_but_not_pickles():
+    """Announced in-place edits rebuild every counts cache; unpickled caches never match."""
+    rdd = SimpleNamespace(counts=_counts())
+    index, codes = get_level_index(rdd), get_count_codes(rdd)
+    assignment = get_group_assignment(rdd)
+
+    rdd.counts["count"] = rdd.counts["count"] * 2  # same object, same length
+    assert get_level_index(rdd) is index
+    counts_changed(rdd)
+
+    assert get_level_index(rdd) is not index
+    assert get_level_index(rdd).level(0).dense().sum() == 14
+    assert get_count_codes(rdd) is not codes
+    assert get_group_assignment(rdd) is not assignment
+    restored = pickle.loads(pickle.dumps(get_level_index(rdd)))
+    assert not restored.matches(rdd.counts, counts_version(rdd))
+
+
+def test_counts_stamps_compare_by_table_and_version():
+    """Pages key their results on stamps; a new table or an announced edit changes them."""
+    rdd = SimpleNamespace(counts=_counts())
+    stamp = counts_stamp(rdd)
+
+    assert stamp == counts_stamp(rdd) and hash(stamp) == hash(counts_stamp(rdd))
+    counts_changed(rdd)
+    assert stamp != counts_stamp(rdd)
+    later = counts_stamp(rdd)
+    rdd.counts = _counts()
+    assert later != counts_stamp(rdd)
+    del rdd.counts
+    assert later != later  # a collected table matches nothing, not even a reused id
+
+
+def test_sparse_storage_matches_dense():
+    """Sparse levels hold the same counts and proportions as dense ones."""
+    dense = LevelIndex(_counts(), sparse=False).level(1)
+    sparse = LevelIndex(_counts(), sparse=True).level(1)
+
+    assert sparse.is_sparse and not dense.is_sparse
+    np.testing.assert_array_equal(sparse.dense(), dense.values)
+    np.testing.assert_allclose(sparse.proportions().toarray(), dense.proportions())
+    np.testing.assert_array_equal(
+        sparse.select_types(["Type_A"]).dense(), dense.select_types(["Type_A"]).values
+    )
+    assert sparse.to_frame().sparse.to_dense().equals(dense.to_frame())
+
+
+def test_auto_sparse_threshold(monkeypatch):
+    """Large, mostly-zero levels switch to CSR automatically."""
+    import src.level_index as level_index
+
+    monkeypatch.setattr(level_index, "SPARSE_MIN_CELLS", 4)
+    counts = pd.DataFrame(
+        {
+            "filename": [f"s{i}" for i in range(20)],
+            "reference_type": [f"T{i}" for i in range(20)],
+            "count": 1,
+            "level": 0,
+        }
+    )
+    assert LevelIndex(counts).level(0).is_sparse
+    assert not LevelIndex(_counts()).level(1).is_sparse
@@ -0,0 +1,130 @@
+"""
+The app's in-house replacements of rdd library stages against the library itself.
+
+Run on the synthetic "tiny" inputs of benchmarks/synthetic.py; skipped when
+the rdd library is not installed.
+"""
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("rdd")
+
+from benchmarks.synthetic import SCALES, generate  # noqa: E402
+from src.build import BuildRequest, build_rdd  # noqa: E402
+from src.count_filter import with_cached_filters  # noqa: E402
+from src.flows import get_flow_graph  # noqa: E402
+
+SCALE = SCALES["tiny"]
+KEY = ["level", "filename", "reference_type"]
+
+
+@pytest.fixture(scope="module")
+def inputs(tmp_path_factory):
+    return generate(SCALE, str(tmp_path_factory.mktemp("synthetic")))
+
+
+def _request(paths, **changes):
+    return BuildRequest(
+        gnps_network_path=paths["network"],
+        external_sample_metadata=paths["sample_metadata"],
+        external_reference_metadata=paths["reference_metadata"],
+        sample_group_col="group",
+        levels=SCALE.depth,
+        **changes,
+    )
+
+
+def _rows(counts):
+    """Counts in a canonical row order and dtypes."""
+    rows = counts[KEY + ["count", "group"]].astype({"count": float, "group": object})
+    return rows.sort_values(KEY).reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def library(inputs):
+    """The library's own build: serial per-level counting."""
+    return build_rdd(_request(inputs))
+
+
+def test_in_house_aggregation_matches_create_rdd_counts_all_levels(inputs, library):
+    """aggregator="app" replaces the library's levels 1..N with aggregate_levels."""
+    aggregated = build_rdd(_request(inputs, aggregator="app"))
+
+    assert aggregated.levels == library.levels
+    pd.testing.assert_frame_equal(_rows(aggregated.counts), _rows(library.counts))
+
+
+def _flow_dict(flows):
+    """``(source, target) -> value`` of the non-zero flows."""
+    flows = flows[flows["value"] > 0]
+    return {
+        (str(source), str(target)): float(value)
+        for source, target, value in flows[["source", "target", "value"]].itertuples(index=False)
+    }
+
+
+@pytest.mark.parametrize("max_level", [None, 2])
+def test_flow_graph_matches_generate_rddflows(library, max_level):
+    """The precomputed flow graph replaces generate_RDDflows on the Sankey page."""
+    graph = get_flow_graph(library)
+    sample = sorted(library.counts["filename"].unique())[0]
+
+    for filename in (None, sample):
+        expected, _ = library.generate_RDDflows(
+            max_hierarchy_level=max_level, filename_filter=filename
+        )
+        ours = graph.flows(filename, max_level=max_level)
+        assert _flow_dict(ours) == pytest.approx(_flow_dict(expected))
+
+
+def test_projected_network_matches_the_original_file(inputs, library):
+    """project_network hands RDDCounts a slim copy of the network file."""
+    projected = build_rdd(_request(inputs, project_network=True))
+
+    pd.testing.assert_frame_equal(_rows(projected.counts), _rows(library.counts))
+
+
+@pytest.mark.parametrize("sample_types", ["all", "simple", "complex"])
+def test_reference_store_matches_parsing_the_file(inputs, library, tmp_path, sample_types):
+    """reference_store serves RDDCounts the store's pre-split view of the metadata."""
+    expected = library
+    if sample_types != "all":
+        expected = build_rdd(_request(inputs, sample_types=sample_types))
+    stored = build_rdd(_request(inputs, sample_types=sample_types, reference_store=str(tmp_path)))
+
+    assert stored.levels == expected.levels
+    pd.testing.assert_frame_equal(_rows(stored.counts), _rows(expected.counts))
+    pd.testing.assert_frame_equal(
+        stored.reference_metadata.reset_index(drop=True),
+        expected.reference_metadata.reset_index(drop=True),
+    )
+
+
+@pytest.mark.parametrize("sample_types", ["all", "simple"])
+def test_in_house_matcher_matches_the_library(inputs, library, sample_types):
+    """matcher="app" replaces the library's matching and level counting with src.matching."""
+    expected = library
+    if sample_types != "all":
+        expected = build_rdd(_request(inputs, sample_types=sample_types))
+    matched = build_rdd(_request(inputs, sample_types=sample_types, matcher="app"))
+
+    assert matched.levels == expected.levels
+    pd.testing.assert_frame_equal(_rows(matched.counts), _rows(expected.counts))
+
+
+@pytest.mark.parametrize("level", [0, 1, SCALE.depth])
+def test_cached_filters_match_filter_counts(library, level):
+    """RDD_APP_FILTERS=1: page 02 serves the visualizer's filter_counts calls from cached masks."""
+    types = sorted(library.counts.loc[library.counts["level"] == level, "reference_type"].unique())
+    view = with_cached_filters(library)
+
+    for selection in (None, types[:1], types[1::2] + ["missing"]):
+        expected = library.filter_counts(reference_types=selection, level=level)
+        got = view.filter_counts(reference_types=selection, level=level)
+        pd.testing.assert_frame_equal(
+            got.sort_values(KEY).reset_index(drop=True),
+            expected.sort_values(KEY).reset_index(drop=True),
+            check_dtype=False,
+            check_categorical=False,
+        )
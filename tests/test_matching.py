@@ -0,0 +1,105 @@
+"""
+Tests for the integer-encoded sample × reference matching in src/matching.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.level_counts import aggregate_levels
+from src.matching import cluster_index, match, match_network
+from src.network import read_membership
+
+
+def _network(path, n_spectra=4_000, seed=0):
+    rng = np.random.default_rng(seed)
+    files = [f"input_spectra/s{i}.mzML" for i in range(12)] + [f"r{i}.mzML" for i in range(6)]
+    table = pd.DataFrame(
+        {"#ClusterIdx": rng.integers(1, 300, n_spectra), "#Filename": rng.choice(files, n_spectra)}
+    )
+    table.to_csv(path, sep="\t", index=False)
+    table["file"] = table["#Filename"].str.split("/").str[-1].str[:-5]
+    return table
+
+
+def _reference_metadata():
+    return pd.DataFrame(
+        {
+            "filename": [f"r{i}.mzML" for i in range(6)] + ["r_absent.mzML"],
+            "sample_type_group1": ["plant", "plant", "animal", "plant", "animal", None, "plant"],
+            "sample_type_group2": ["fruit", "leaf", "meat", "fruit", "fish", None, "leaf"],
+        }
+    )
+
+
+def _merged(table, shared_clusters=False):
+    """Reference implementation: merge sample spectra with reference members per cluster."""
+    is_reference = table["file"].str.startswith("r")
+    references = table.loc[is_reference, ["#ClusterIdx", "file"]].drop_duplicates()
+    samples = table.loc[~is_reference, ["#ClusterIdx", "file"]]
+    if shared_clusters:
+        samples = samples.drop_duplicates()
+    joined = samples.merge(references, on="#ClusterIdx", suffixes=("", "_ref"))
+    return joined.groupby(["file", "file_ref"]).size()
+
+
+@pytest.mark.parametrize("weight", ["spectra", "clusters"])
+def test_counts_match_a_merge_on_clusters(tmp_path, weight):
+    path = str(tmp_path / "network.tsv")
+    table = _network(path)
+
+    counts = match_network(path, _reference_metadata()["filename"], weight=weight).file_counts()
+
+    got = counts.set_index(["filename", "reference_type"])["count"]
+    expected = _merged(table, shared_clusters=weight == "clusters")
+    pd.testing.assert_series_equal(
+        got.sort_index(), expected.sort_index(), check_names=False, check_dtype=False
+    )
+    assert (counts["level"] == 0).all()
+
+
+def test_level_counts_equal_aggregate_levels(tmp_path):
+    path = str(tmp_path / "network.tsv")
+    _network(path)
+    reference_metadata = _reference_metadata()
+    columns = ["sample_type_group1", "sample_type_group2"]
+    groups = {f"s{i}": "G1" if i < 6 else "G2" for i in range(12)}
+
+    matched = match_network(path, reference_metadata["filename"])
+    levels = matched.level_counts(reference_metadata, columns, groups)
+    expected = aggregate_levels(matched.file_counts(groups), reference_metadata, columns)
+
+    key = ["level", "filename", "reference_type"]
+    pd.testing.assert_frame_equal(
+        levels.sort_values(key).reset_index(drop=True)[key + ["count", "group"]],
+        expected.sort_values(key).reset_index(drop=True)[key + ["count", "group"]],
+        check_dtype=False,
+    )
+    assert set(levels["reference_type"]) == {"plant", "animal", "fruit", "leaf", "meat", "fish"}
+
+
+def test_samples_can_be_restricted_and_references_need_no_extension(tmp_path):
+    path = str(tmp_path / "network.tsv")
+    _network(path)
+
+    matched = match(read_membership(path), ["r0", "r1"], sample_files=["s0.mzML", "s3"])
+
+    assert sorted(matched.samples) == ["s0", "s3"]
+    assert sorted(matched.references) == ["r0", "r1"]
+    assert matched.matrix.shape == (2, 2)
+    with pytest.raises(ValueError, match="weight"):
+        match(read_membership(path), ["r0"], weight="files")
+
+
+def test_cluster_index_lists_the_members_of_each_cluster(tmp_path):
+    path = str(tmp_path / "network.tsv")
+    table = _network(path, n_spectra=500)
+    membership = read_membership(path)
+
+    index = cluster_index(membership)
+
+    assert index.n_clusters == table["#ClusterIdx"].nunique()
+    for code in (0, index.n_clusters // 2, index.n_clusters - 1):
+        cluster = membership.clusters[code]
+        members = set(membership.files[index.members_of(code)])
+        assert members == set(table.loc[table["#ClusterIdx"] == cluster, "file"])
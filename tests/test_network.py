@@ -0,0 +1,133 @@
+"""
+Tests for the streaming GNPS network reader in src/network.py
+"""
+
+import tracemalloc
+from contextlib import ExitStack
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.network as network
+from src.build import _projected_network
+from src.network import iter_network, network_columns, project_network, read_membership
+
+ENGINES = ["pyarrow", "pandas"]
+
+
+def _network(path, n_spectra=5_000, seed=0, sep="\t"):
+    """GNPS1-style table with a few columns RDD counting does not read."""
+    rng = np.random.default_rng(seed)
+    files = [f"input_spectra/file_{i:02d}.mzML" for i in range(30)]
+    table = pd.DataFrame(
+        {
+            "#ClusterIdx": rng.integers(1, 400, n_spectra),
+            "#Filename": rng.choice(files, n_spectra),
+            "#Scan": rng.integers(1, 5_000, n_spectra),
+            "#ParentMass": rng.uniform(100, 1_000, n_spectra),
+            "#RetTime": rng.uniform(0, 900, n_spectra),
+        }
+    )
+    table["DefaultGroups"] = np.where(table["#Filename"] < files[10], "G4", "G1")
+    table.to_csv(path, sep=sep, index=False)
+    return table
+
+
+def test_network_columns_of_gnps1_and_gnps2_tables():
+    gnps2 = network_columns(["#ClusterIdx", "#Filename", "#Scan"])
+    gnps1 = network_columns(["cluster index", "#Scan", "Original_Filename", "DefaultGroups"])
+
+    assert gnps2.names == ["#ClusterIdx", "#Filename"]
+    assert gnps1.names == ["cluster index", "Original_Filename", "DefaultGroups"]
+    with pytest.raises(ValueError, match="Not a GNPS network"):
+        network_columns(["cluster index", "DefaultGroups"])
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_chunks_hold_only_the_projected_columns(tmp_path, engine):
+    path = str(tmp_path / "network.tsv")
+    table = _network(path)
+
+    chunks = list(iter_network(path, engine=engine, chunk_bytes=32 << 10, chunk_rows=1_000))
+
+    assert len(chunks) > 1
+    assert all(list(c.columns) == ["#ClusterIdx", "#Filename", "DefaultGroups"] for c in chunks)
+    assert chunks[0]["#ClusterIdx"].dtype == np.int64
+    assert isinstance(chunks[0]["#Filename"].dtype, pd.CategoricalDtype)
+    assert sum(map(len, chunks)) == len(table)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_membership_matches_a_full_group_by(tmp_path, monkeypatch, engine):
+    monkeypatch.setattr(network, "COMPACT_PAIRS", 100)  # merge across chunks repeatedly
+    path = str(tmp_path / "network.tsv")
+    table = _network(path)
+
+    membership = read_membership(path, engine=engine, chunk_bytes=32 << 10, chunk_rows=700)
+
+    table["filename"] = table["#Filename"].str.split("/").str[-1].str.replace(".mzML", "")
+    expected = table.groupby(["#ClusterIdx", "filename"]).size()
+    frame = membership.to_frame()
+    got = frame.set_index(["cluster", frame["filename"].astype(str)])["spectra"]
+    pd.testing.assert_series_equal(
+        got.sort_index(), expected.astype(np.int32).sort_index(), check_names=False
+    )
+    assert membership.cluster_codes.dtype == membership.file_codes.dtype == np.int32
+    assert np.all(np.diff(membership.cluster_codes) >= 0)
+    groups = dict(zip(membership.files, membership.file_groups))
+    assert groups["file_00"] == "G4" and groups["file_29"] == "G1"
+
+
+def test_projected_copy_keeps_the_counting_columns(tmp_path):
+    source = str(tmp_path / "network.csv")
+    table = _network(source, sep=",")
+
+    target = project_network(source, str(tmp_path / "slim.tsv"))
+
+    slim = pd.read_csv(target, sep="\t")
+    pd.testing.assert_frame_equal(slim, table[["#ClusterIdx", "#Filename", "DefaultGroups"]])
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_projected_copy_can_leave_files_out(tmp_path, engine):
+    source = str(tmp_path / "network.tsv")
+    table = _network(source)
+
+    target = project_network(
+        source, str(tmp_path / "slim.tsv"), engine=engine, exclude=["file_01", "other/file_02.mzML"]
+    )
+
+    slim = pd.read_csv(target, sep="\t")
+    dropped = table["#Filename"].str.contains("file_0[12]")
+    pd.testing.assert_frame_equal(
+        slim,
+        table.loc[~dropped, ["#ClusterIdx", "#Filename", "DefaultGroups"]].reset_index(drop=True),
+    )
+
+
+def test_unrecognised_networks_are_passed_through(tmp_path):
+    odd = tmp_path / "odd.tsv"
+    odd.write_text("cluster index\tDefaultGroups\n1\tG1\n")
+    good = str(tmp_path / "network.tsv")
+    _network(good, n_spectra=50)
+
+    with ExitStack() as stack:
+        assert _projected_network(str(odd), stack) == str(odd)
+        slim = _projected_network(good, stack)
+        assert slim != good and list(pd.read_csv(slim, sep="\t").columns)[:2] == [
+            "#ClusterIdx",
+            "#Filename",
+        ]
+
+
+def test_membership_memory_is_a_fraction_of_the_file(tmp_path):
+    path = tmp_path / "network.tsv"
+    _network(str(path), n_spectra=200_000)
+
+    tracemalloc.start()
+    read_membership(str(path), engine="pandas", chunk_rows=20_000)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert peak < path.stat().st_size / 2
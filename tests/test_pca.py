@@ -0,0 +1,74 @@
+"""
+Tests for PCA on the level index in src/pca.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.level_index import LevelIndex
+from src.pca import fit_pca, perform_pca
+
+
+def _index():
+    rng = np.random.default_rng(0)
+    samples = [f"s{i}" for i in range(6)]
+    types = [f"T{j}" for j in range(4)]
+    rows = [(s, t, int(rng.integers(1, 50)), 2) for s in samples for t in types]
+    counts = pd.DataFrame(rows, columns=["filename", "reference_type", "count", "level"])
+    counts["group"] = counts["filename"].map(lambda f: "G1" if f < "s3" else "G2")
+    return LevelIndex(counts)
+
+
+def test_perform_pca_shapes_and_labels():
+    """Scores carry filename and group; variance ratios are sorted."""
+    pca_df, ev = perform_pca(_index(), level=2, n_components=3, apply_clr=True)
+
+    assert list(pca_df.columns) == ["PC1", "PC2", "PC3", "filename", "group"]
+    assert pca_df["group"].tolist() == ["G1"] * 3 + ["G2"] * 3
+    assert len(ev) == 3
+    assert np.all(np.diff(ev) <= 0)
+
+
+def test_perform_pca_caps_components():
+    """n_components is capped by the number of reference types."""
+    pca_df, ev = perform_pca(_index(), level=2, n_components=10, apply_clr=False)
+
+    assert len(ev) == 4
+    assert "PC4" in pca_df.columns
+
+
+def test_sparse_pca_matches_dense():
+    """Without CLR, the sparse (ARPACK) path reproduces dense PCA."""
+    rng = np.random.default_rng(1)
+    rows = [
+        (f"s{i}", f"T{j}", int(rng.integers(1, 9)), 0)
+        for i in range(30)
+        for j in range(40)
+        if rng.random() < 0.2
+    ]
+    counts = pd.DataFrame(rows, columns=["filename", "reference_type", "count", "level"])
+
+    dense_df, dense_ev = perform_pca(LevelIndex(counts, sparse=False), 0, 3, apply_clr=False)
+    sparse_df, sparse_ev = perform_pca(LevelIndex(counts, sparse=True), 0, 3, apply_clr=False)
+
+    np.testing.assert_allclose(sparse_ev, dense_ev)
+    pcs = ["PC1", "PC2", "PC3"]
+    np.testing.assert_allclose(np.abs(sparse_df[pcs]), np.abs(dense_df[pcs]), atol=1e-8)
+
+
+def test_fit_is_memoised_and_survives_relabelling():
+    """Repeated calls reuse the fit; new groups only change the labels."""
+    index = _index()
+    first_df, first_ev = perform_pca(index, level=2, apply_clr=True)
+    fit = fit_pca(index, level=2, apply_clr=True)
+    assert fit_pca(index, level=2, n_components=3, apply_clr=True) is fit
+    assert ("clr", 2) in index.derived
+
+    index.set_groups(pd.Series("G9", index=index.samples))
+    pca_df, ev = perform_pca(index, level=2, apply_clr=True)
+
+    assert fit_pca(index, level=2, apply_clr=True) is fit
+    assert ev is first_ev
+    assert pca_df["group"].eq("G9").all()
+    pd.testing.assert_frame_equal(pca_df.drop(columns="group"), first_df.drop(columns="group"))
+    assert fit_pca(index, level=2, apply_clr=False) is not fit
@@ -0,0 +1,95 @@
+"""
+Tests for the stage instrumentation in src/perf.py
+"""
+
+import json
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.build import pop_build_timings
+from src.perf import PerfLog
+
+
+def test_stages_are_timed_and_exceptions_recorded():
+    log = PerfLog(min_seconds=0)
+
+    with log.stage("page", "sleep"):
+        time.sleep(0.02)
+    with pytest.raises(KeyError):
+        with log.stage("page", "lookup"):
+            {}["missing"]
+
+    sleep, lookup = log.records()
+    assert sleep.stage == "sleep" and sleep.seconds >= 0.02 and sleep.error is None
+    assert lookup.error == "KeyError"
+    assert sleep.peak_rss_mib > 0 and sleep.traced_peak_mib is None
+
+
+def test_fast_stages_are_dropped_and_the_log_is_bounded():
+    log = PerfLog(max_records=3, min_seconds=1.0)
+
+    for i in range(5):
+        with log.stage("page", f"fast {i}"):
+            pass
+    assert len(log) == 0
+
+    log.min_seconds = 0
+    for i in range(5):
+        with log.stage("page", f"stage {i}"):
+            pass
+    assert [r.stage for r in log.records()] == ["stage 2", "stage 3", "stage 4"]
+    assert log.to_frame()["stage"].tolist() == ["stage 4", "stage 3", "stage 2"]
+
+
+def test_allocation_tracing_sees_the_outer_stage_only():
+    log = PerfLog(trace_allocations=True, min_seconds=0)
+
+    with log.stage("page", "outer"):
+        with log.stage("page", "inner"):
+            block = np.ones(4 << 20, dtype=np.uint8)
+        del block
+
+    inner, outer = log.records()
+    assert inner.traced_peak_mib is None
+    assert outer.traced_peak_mib >= 4
+
+
+def test_one_session_does_not_stop_tracing_under_another():
+    first, second = (PerfLog(trace_allocations=True, min_seconds=0) for _ in range(2))
+    was_tracing = tracemalloc.is_tracing()
+
+    running = second.stage("page 2", "long")
+    running.__enter__()
+    with first.stage("page 1", "short"):
+        pass
+    assert tracemalloc.is_tracing()
+    block = np.ones(4 << 20, dtype=np.uint8)
+    del block
+    running.__exit__(None, None, None)
+
+    assert tracemalloc.is_tracing() == was_tracing
+    assert second.records()[0].traced_peak_mib >= 4
+
+
+def test_worker_timings_join_the_session_log_and_export_as_json():
+    worker = PerfLog(min_seconds=0)
+    with worker.stage("build", "parse + RDDCounts"):
+        pass
+    rdd = SimpleNamespace(build_timings=worker.records())
+
+    log = PerfLog(min_seconds=0)
+    log.extend(pop_build_timings(rdd), page="Create", where="worker")
+
+    assert not hasattr(rdd, "build_timings") and pop_build_timings(rdd) == []
+    report = json.loads(log.to_json())
+    (stage,) = report["stages"]
+    assert (stage["page"], stage["stage"], stage["where"]) == (
+        "Create",
+        "parse + RDDCounts",
+        "worker",
+    )
+    assert "python" in report["environment"]
@@ -0,0 +1,147 @@
+"""
+Tests for the server-side plot aggregation in src/plot_summary.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.level_index import LevelIndex
+from src.plot_summary import (
+    bar_figure,
+    bar_summary,
+    box_figure,
+    box_summary,
+    heatmap_figure,
+    heatmap_tiles,
+)
+
+
+def _counts(n_samples=40):
+    rng = np.random.default_rng(0)
+    samples = [f"s{i:03d}" for i in range(n_samples)]
+    frame = pd.DataFrame(
+        {
+            "filename": np.repeat(samples, 3),
+            "reference_type": np.tile(["A", "B", "C"], n_samples),
+            "count": rng.integers(1, 50, 3 * n_samples),
+            "level": 1,
+        }
+    )
+    frame["group"] = np.where(frame["filename"] < samples[n_samples // 4], "G1", "G2")
+    return frame
+
+
+def _proportions(counts):
+    wide = counts.pivot_table(index="filename", columns="reference_type", values="count")
+    return wide.div(wide.sum(axis=1), axis=0)
+
+
+def test_box_summary_matches_the_per_sample_quartiles():
+    counts = _counts()
+    counts.loc[0, "count"] = 10_000  # one far outlier in G1 / A
+
+    summary = box_summary(LevelIndex(counts), 1, max_outliers=2).set_index(
+        ["group", "reference_type"]
+    )
+
+    groups = counts.drop_duplicates("filename").set_index("filename")["group"]
+    proportions = _proportions(counts)
+    g1_a = proportions["A"][groups == "G1"]
+    row = summary.loc[("G1", "A")]
+    assert row["n"] == len(g1_a)
+    assert row[["q1", "median", "q3"]].tolist() == pytest.approx(g1_a.quantile([0.25, 0.5, 0.75]))
+    assert row["mean"] == pytest.approx(g1_a.mean())
+    assert row["outliers"][0] == pytest.approx(g1_a.max())
+    assert row["upperfence"] < g1_a.max()
+    assert len(summary) == 6 and summary["outliers"].map(len).max() <= 2
+
+
+def test_bar_summary_totals_per_group():
+    counts = _counts()
+
+    summary = bar_summary(LevelIndex(counts), 1, ["A", "C"])
+    ungrouped = bar_summary(LevelIndex(counts), 1, group_by=False)
+
+    expected = counts[counts["reference_type"] != "B"].groupby(["group", "reference_type"])["count"]
+    totals = summary.set_index(["group", "reference_type"])["count"]
+    pd.testing.assert_series_equal(
+        totals.sort_index(), expected.sum().astype(float).sort_index(), check_names=False
+    )
+    assert summary.groupby("group")["n_samples"].first().to_dict() == {"G1": 10, "G2": 30}
+    assert ungrouped["count"].sum() == counts["count"].sum()
+    assert ungrouped["count"].is_monotonic_decreasing
+
+
+def test_heatmap_tiles_average_within_groups():
+    counts = _counts(n_samples=400)
+    index = LevelIndex(counts)
+
+    tiles = heatmap_tiles(index, 1, max_rows=40)
+    full = heatmap_tiles(index, 1, max_rows=1000)
+
+    assert len(tiles.labels) <= 40 and tiles.sizes.sum() == 400
+    assert tiles.groups.count("G1") == 10 and tiles.groups.count("G2") == 30
+    assert tiles.values.sum(axis=1) == pytest.approx(1.0)
+    proportions = _proportions(counts)
+    first = proportions.iloc[: tiles.sizes[0]].mean()
+    assert tiles.values[0] == pytest.approx(first.to_numpy())
+    assert len(full.labels) == 400 and (full.sizes == 1).all()
+
+
+def test_figure_payload_does_not_grow_with_samples():
+    small, large = LevelIndex(_counts(40)), LevelIndex(_counts(4000))
+
+    def payload(index):
+        return sum(
+            len(fig.to_json())
+            for fig in (
+                box_figure(box_summary(index, 1, max_outliers=5)),
+                bar_figure(bar_summary(index, 1)),
+                heatmap_figure(heatmap_tiles(index, 1, max_rows=50)),
+            )
+        )
+
+    assert payload(large) < 2 * payload(small)
+
+
+def _sparse_counts(n_samples=300, n_types=12):
+    """Each sample has a few of the types; most proportions are (implicit) zeros."""
+    rng = np.random.default_rng(1)
+    rows = []
+    for i in range(n_samples):
+        present = rng.choice(n_types, size=rng.integers(1, 4), replace=False)
+        for t in present:
+            rows.append((f"s{i:03d}", f"T{t:02d}", int(rng.integers(1, 100))))
+    frame = pd.DataFrame(rows, columns=["filename", "reference_type", "count"])
+    frame["level"] = 1
+    frame["group"] = np.where(frame["filename"] < "s100", "G1", "G2")
+    return frame
+
+
+def _dense_box(values, max_outliers):
+    """Reference implementation: percentiles and fences of a dense column."""
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    inside = values[(values >= low) & (values <= high)]
+    outside = values[(values < low) | (values > high)]
+    distance = np.maximum(low - outside, outside - high)
+    kept = outside[np.argsort(-distance, kind="stable")[:max_outliers]]
+    return [q1, median, q3, inside.min(), inside.max(), values.mean()], sorted(kept)
+
+
+@pytest.mark.parametrize("sparse", [True, False])
+def test_box_summary_counts_implicit_zeros(sparse):
+    counts = _sparse_counts()
+    summary = box_summary(LevelIndex(counts, sparse=sparse), 1, max_outliers=5)
+
+    groups = counts.drop_duplicates("filename").set_index("filename")["group"]
+    proportions = _proportions(counts).fillna(0.0)
+    assert len(summary) == 2 * proportions.shape[1]
+    for row in summary.itertuples():
+        column = proportions[row.reference_type][groups == row.group].to_numpy()
+        stats, outliers = _dense_box(column, 5)
+        assert row.n == len(column)
+        got = [row.q1, row.median, row.q3, row.lowerfence, row.upperfence, row.mean]
+        assert got == pytest.approx(stats)
+        assert sorted(row.outliers) == pytest.approx(outliers)
@@ -0,0 +1,89 @@
+"""
+Tests for the content-addressed RDDCounts cache in src/rdd_cache.py
+"""
+
+import os
+import stat
+
+import pandas as pd
+import pytest
+
+from src.rdd_cache import RDDCache, cache_key, file_digest, user_cache_directory
+
+
+def test_file_digest_depends_on_content(tmp_path):
+    """Identical content hashes identically regardless of the file name."""
+    a = tmp_path / "a.tsv"
+    b = tmp_path / "b.tsv"
+    c = tmp_path / "c.tsv"
+    a.write_text("x\ty\n1\t2\n")
+    b.write_text("x\ty\n1\t2\n")
+    c.write_text("x\ty\n1\t3\n")
+
+    assert file_digest(a) == file_digest(b)
+    assert file_digest(a) != file_digest(c)
+
+
+def test_cache_key_is_parameter_sensitive():
+    """Changing any parameter or input digest changes the key."""
+    inputs = {"network": "abc", "sample_metadata": None}
+    params = {"levels": 3, "sample_types": "simple"}
+
+    assert cache_key(inputs, params) == cache_key(dict(inputs), dict(params))
+    assert cache_key(inputs, {**params, "levels": 4}) != cache_key(inputs, params)
+    assert cache_key({**inputs, "network": "abd"}, params) != cache_key(inputs, params)
+
+
+def test_get_returns_independent_copies(tmp_path):
+    """Mutating a cached result must not leak into later hits."""
+    cache = RDDCache(tmp_path)
+    cache.put("k", pd.DataFrame({"group": ["G1", "G2"]}))
+
+    first = cache.get("k")
+    first["group"] = "changed"
+
+    assert cache.get("k")["group"].tolist() == ["G1", "G2"]
+    assert cache.get("missing") is None
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    """A fresh instance (e.g. after a restart) is served from disk."""
+    RDDCache(tmp_path).put("k", {"levels": 3})
+
+    assert RDDCache(tmp_path).get("k") == {"levels": 3}
+
+
+def test_lru_eviction_respects_budgets(tmp_path):
+    """The least recently used entry is evicted once the budget is exceeded."""
+    payload = b"x" * 1000
+    cache = RDDCache(tmp_path, memory_bytes=2500, disk_bytes=2500)
+    cache.put("a", payload)
+    cache.put("b", payload)
+    cache.get("a")  # "b" is now least recently used in memory
+    cache.put("c", payload)
+
+    assert set(cache._memory) == {"a", "c"}
+    assert len(list(tmp_path.glob("*.pkl"))) == 2
+
+
+def test_corrupt_entries_are_dropped_as_misses(tmp_path):
+    """A truncated pickle on disk is a miss, not an exception."""
+    RDDCache(tmp_path).put("k", {"levels": 3})
+    path = tmp_path / "k.pkl"
+    path.write_bytes(path.read_bytes()[:5])
+
+    assert RDDCache(tmp_path).get("k") is None
+    assert not path.exists()
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_disk_tier_is_private_to_the_user(tmp_path):
+    """Other users can neither read nor plant entries."""
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    shared.chmod(0o777)
+
+    RDDCache(shared)
+
+    assert stat.S_IMODE(shared.stat().st_mode) == 0o700
+    assert str(os.getuid()) in user_cache_directory("gnps_rdd_cache")
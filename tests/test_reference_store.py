@@ -0,0 +1,127 @@
+"""
+Tests for the compiled reference metadata store in src/reference_store.py
+"""
+
+import os
+import sys
+import tempfile
+import types
+
+import pandas as pd
+import pytest
+
+from src.build import BuildRequest
+from src.reference_store import (
+    ReferenceStore,
+    compile_reference_store,
+    ensure_reference_store,
+    reference_store_root,
+    serve_reference_store,
+)
+
+
+def _reference():
+    return pd.DataFrame(
+        {
+            "filename": ["apple.mzML", "beef.mzXML", "bread.mgf", "apple.mzML", "stew.mzML"],
+            "sample_type": ["simple", "simple", "complex", "simple", "Complex"],
+            "sample_type_group1": ["plant", "animal", "plant", "plant", "complex"],
+            "sample_type_group2": ["fruit", "meat", "grain", "fruit", "dish"],
+        }
+    )
+
+
+def test_compile_writes_views(tmp_path):
+    store = compile_reference_store(_reference(), tmp_path, "k1")
+
+    assert len(store) == 5
+    assert store.manifest["views"] == ["simple", "complex"]
+    pd.testing.assert_frame_equal(store.frame(), _reference())
+    assert store.frame("simple")["filename"].tolist() == ["apple.mzML", "beef.mzXML", "apple.mzML"]
+    assert store.frame("complex")["filename"].tolist() == ["bread.mgf", "stew.mzML"]
+    pd.testing.assert_frame_equal(store.frame("unknown"), _reference())
+
+
+def test_frames_are_converted_once_and_handed_out_as_copies(tmp_path):
+    store = compile_reference_store(_reference(), tmp_path, "k1")
+
+    first = store.frame("simple")
+    first["filename"] = "edited"
+    first.loc[0, "sample_type_group1"] = "edited"
+
+    assert list(store._frames) == ["simple"]
+    assert store.frame("simple")["filename"].tolist() == ["apple.mzML", "beef.mzXML", "apple.mzML"]
+    assert "edited" not in store.frame("simple")["sample_type_group1"].tolist()
+
+
+def test_existing_store_is_reused(tmp_path):
+    compile_reference_store(_reference(), tmp_path, "k1")
+
+    again = compile_reference_store(_reference().head(1), tmp_path, "k1")
+
+    assert len(again) == 5
+    assert [p.name for p in tmp_path.iterdir()] == ["k1"]  # no staging leftovers
+
+    (tmp_path / "bogus").mkdir()
+    (tmp_path / "bogus" / "manifest.json").write_text("{}")
+    with pytest.raises(ValueError, match="not a reference store"):
+        ReferenceStore(tmp_path / "bogus")
+
+
+def test_serve_reference_store_replaces_the_loader(tmp_path, monkeypatch):
+    calls = []
+
+    def load(path=None):
+        calls.append(path)
+        return _reference()
+
+    utils = types.ModuleType("rdd.utils")
+    utils._load_RDD_metadata = load
+    counts_module = types.ModuleType("rdd.RDDcounts")
+    counts_module._load_RDD_metadata = load  # ``from rdd.utils import ...``
+    package = types.ModuleType("rdd")
+    package.utils = utils
+    monkeypatch.setitem(sys.modules, "rdd", package)
+    monkeypatch.setitem(sys.modules, "rdd.utils", utils)
+    monkeypatch.setitem(sys.modules, "rdd.RDDcounts", counts_module)
+    reference = tmp_path / "reference.csv"
+    _reference().to_csv(reference, index=False)
+
+    store = ensure_reference_store(str(tmp_path / "stores"), str(reference))
+    again = ensure_reference_store(str(tmp_path / "stores"), str(reference))
+    with serve_reference_store(store, "complex", str(reference)):
+        served = counts_module._load_RDD_metadata(str(reference))
+        other = counts_module._load_RDD_metadata(str(tmp_path / "other.csv"))
+        bundled = counts_module._load_RDD_metadata()
+
+    assert again is store
+    # parsed on compilation; other sources are still loaded by the library
+    assert calls == [str(reference), str(tmp_path / "other.csv"), None]
+    assert len(other) == len(bundled) == len(_reference())
+    assert served["filename"].tolist() == ["bread.mgf", "stew.mzML"]
+    assert counts_module._load_RDD_metadata is load
+
+
+def test_stores_are_opt_in_and_private(tmp_path, monkeypatch):
+    monkeypatch.delenv("RDD_REFERENCE_STORE", raising=False)
+    monkeypatch.setenv("RDD_REFERENCE_STORE_DIR", str(tmp_path / "stores"))
+    assert reference_store_root() is None
+
+    monkeypatch.setenv("RDD_REFERENCE_STORE", "1")
+    assert reference_store_root() == str(tmp_path / "stores")
+    monkeypatch.delenv("RDD_REFERENCE_STORE_DIR")
+    assert reference_store_root().startswith(os.path.join(tempfile.gettempdir(), "gnps_reference"))
+
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    shared.chmod(0o777)
+    monkeypatch.setattr("src.reference_store.reference_source_key", lambda path: "k1")
+    compile_reference_store(_reference(), shared, "k1")
+    ensure_reference_store(str(shared))
+    assert shared.stat().st_mode & 0o777 == 0o700
+
+
+def test_build_request_drops_the_store_root():
+    request = BuildRequest(gnps_network_path="n.tsv", reference_store="/tmp/stores")
+
+    assert "reference_store" not in request.rdd_kwargs()
@@ -0,0 +1,107 @@
+"""
+Tests for the memory-mapped shared tables in src/shared_tables.py
+"""
+
+import stat
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.groups import get_group_assignment
+from src.shared_tables import SharedTables, mapped_frame
+
+
+def _rdd():
+    counts = pd.DataFrame(
+        {
+            "filename": ["s1", "s1", "s2", "s3"],
+            "reference_type": ["A", "B", "A", "B"],
+            "group": ["G1", "G1", "G2", "G1"],
+            "count": [3, 1, 4, 2],
+            "level": [1, 1, 1, 1],
+        }
+    )
+    reference = pd.DataFrame({"filename": ["r1.mzML"], "sample_type_group1": ["plant"]})
+    samples = pd.DataFrame({"filename": ["s1", "s2", "s3"], "group": ["G1", "G2", "G1"]})
+    return types.SimpleNamespace(
+        counts=counts, reference_metadata=reference, sample_metadata=samples
+    )
+
+
+def test_sessions_map_the_same_buffers(tmp_path):
+    tables = SharedTables(tmp_path)
+
+    first = tables.attach("k", _rdd())
+    second = tables.attach("k", _rdd())
+
+    pd.testing.assert_frame_equal(first.counts, _rdd().counts, check_dtype=False)
+    assert list(first.counts.columns) == list(_rdd().counts.columns)
+    assert np.shares_memory(first.counts["count"].to_numpy(), second.counts["count"].to_numpy())
+    assert not first.counts["count"].to_numpy().flags.writeable
+    assert first.reference_metadata["sample_type_group1"].tolist() == ["plant"]
+    assert first.sample_metadata is not second.sample_metadata  # stays private
+
+
+def test_overlay_columns_stay_private(tmp_path):
+    tables = SharedTables(tmp_path)
+    relabelled = _rdd()
+    relabelled.counts["group"] = ["X", "X", "Y", "X"]
+
+    first = tables.attach("k", _rdd())
+    second = tables.attach("k", relabelled)
+    assignment = get_group_assignment(first)
+    assignment.relabel(pd.Series({"s2": "Z"}))
+    first.counts["group"] = assignment.group_column()
+
+    assert "group" not in mapped_frame(tmp_path / "k" / "counts.arrow").columns
+    assert first.counts["group"].tolist() == ["G1", "G1", "Z", "G1"]
+    assert second.counts["group"].tolist() == ["X", "X", "Y", "X"]
+
+
+def test_shared_frames_are_read_only(tmp_path):
+    rdd = SharedTables(tmp_path).attach("k", _rdd())
+
+    with pytest.raises(ValueError, match="read-only"):
+        rdd.counts.loc[rdd.counts["count"] > 2, "count"] = 0
+    rdd.counts["count"] = rdd.counts["count"] * 2  # replacing a column is fine
+
+    assert rdd.counts["count"].tolist() == [6, 2, 8, 4]
+
+
+def test_least_recently_attached_keys_are_evicted(tmp_path):
+    tables = SharedTables(tmp_path)
+    tables.attach("old", _rdd())
+    size = sum(p.stat().st_size for p in (tmp_path / "old").iterdir())
+    tables.max_bytes = size + size // 2
+
+    tables.attach("new", _rdd())
+
+    assert "new" in tables and "old" not in tables
+
+    tables.max_bytes = 2 * size + size // 2
+    tables.attach("old", _rdd())
+    tables.attach("new", _rdd())  # within the same clock tick: mtimes cannot order these
+    tables.attach("third", _rdd())
+
+    assert "old" not in tables and "new" in tables and "third" in tables
+
+
+def test_key_larger_than_the_budget_stays_private(tmp_path):
+    tables = SharedTables(tmp_path, max_bytes=1)
+    rdd = _rdd()
+    counts = rdd.counts
+
+    assert tables.attach("k", rdd).counts is counts
+    assert "k" not in tables
+
+
+def test_root_directory_is_private_to_the_user(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    shared.chmod(0o777)
+
+    SharedTables(shared).attach("k", _rdd())
+
+    assert stat.S_IMODE(shared.stat().st_mode) == 0o700
@@ -0,0 +1,97 @@
+"""
+Tests for RDDCounts snapshots in src/snapshot.py
+"""
+
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from src.snapshot import load_snapshot, save_snapshot, snapshot_bytes
+
+
+class FakeRDD:
+    """Stand-in exposing the attributes the app reads from RDDCounts."""
+
+    def __init__(self):
+        raise AssertionError("snapshots must not call __init__")
+
+
+def _fake_rdd():
+    rdd = FakeRDD.__new__(FakeRDD)
+    rdd.counts = pd.DataFrame(
+        {
+            "filename": ["s1", "s1", "s2"],
+            "reference_type": ["Type_A", "Type_B", "Type_A"],
+            "count": [10, 20, 15],
+            "level": [1, 1, 1],
+            "group": ["G1", "G1", None],
+        }
+    )
+    rdd.sample_metadata = pd.DataFrame({"filename": ["s1", "s2"], "group": ["G1", None]})
+    rdd.reference_metadata = pd.DataFrame({"filename": ["r1"], "sample_type_group1": ["plant"]})
+    rdd.levels = 1
+    rdd.ontology_columns_renamed = []
+    rdd.sample_group_col = "group"
+    rdd._level_index = object()
+    return rdd
+
+
+def test_round_trip_restores_attributes(tmp_path):
+    """Frames and settings come back unchanged, without calling __init__."""
+    rdd = _fake_rdd()
+    path = tmp_path / "snap.zip"
+    save_snapshot(rdd, str(path))
+
+    restored = load_snapshot(str(path), cls=FakeRDD)
+
+    assert isinstance(restored, FakeRDD)
+    pd.testing.assert_frame_equal(restored.counts, rdd.counts)
+    pd.testing.assert_frame_equal(restored.sample_metadata, rdd.sample_metadata)
+    pd.testing.assert_frame_equal(restored.reference_metadata, rdd.reference_metadata)
+    assert restored.levels == 1
+    assert restored.sample_group_col == "group"
+    assert not hasattr(restored, "_level_index")
+
+
+def test_numpy_attributes_are_stored_as_json_values():
+    rdd = _fake_rdd()
+    rdd.levels = np.int64(3)
+    rdd.ontology_columns = np.array(["sample_type_group1", "sample_type_group2"])
+
+    restored = load_snapshot(io.BytesIO(snapshot_bytes(rdd)), cls=FakeRDD)
+
+    assert restored.levels == 3 and type(restored.levels) is int
+    assert restored.ontology_columns == ["sample_type_group1", "sample_type_group2"]
+
+
+def test_unknown_attributes_are_refused():
+    rdd = _fake_rdd()
+    rdd.handle = object()
+
+    with pytest.raises(TypeError, match="'handle'"):
+        snapshot_bytes(rdd)
+
+
+def test_counts_are_dictionary_encoded():
+    """String key columns of the counts table are stored as dictionaries."""
+    blob = snapshot_bytes(_fake_rdd())
+    with zipfile.ZipFile(io.BytesIO(blob)) as zf:
+        schema = pq.read_schema(io.BytesIO(zf.read("counts.parquet")))
+
+    for col in ("filename", "reference_type", "group"):
+        assert str(schema.field(col).type).startswith("dictionary")
+
+
+def test_rejects_non_snapshot():
+    """A ZIP without a manifest is refused."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("counts.csv", "a,b\n")
+    buf.seek(0)
+
+    with pytest.raises(ValueError, match="manifest.json is missing"):
+        load_snapshot(buf, cls=FakeRDD)
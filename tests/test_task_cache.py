@@ -0,0 +1,113 @@
+"""
+Tests for the on-disk GNPS task cache in src/task_cache.py
+"""
+
+import os
+import pickle
+import stat
+import sys
+import types
+
+import pandas as pd
+import pytest
+
+from src.build import BuildRequest
+from src.task_cache import TaskCache, TaskNotCached, serve_tasks_from
+
+
+def _network(task_id="t1"):
+    return pd.DataFrame(
+        {
+            "#ClusterIdx": [1, 1, 2],
+            "#Filename": [f"{task_id}_a.mzML", "b.mzML", "c.mzML"],
+            "DefaultGroups": ["G1", "G4", "G1"],
+        }
+    )
+
+
+class Downloader:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, task_id, gnps2=True):
+        self.calls.append((task_id, gnps2))
+        return _network(task_id)
+
+
+def test_fetch_downloads_once_per_task_and_version(tmp_path):
+    cache = TaskCache(str(tmp_path))
+    download = Downloader()
+
+    first = cache.fetch("abc123", gnps2=False, download=download)
+    again = TaskCache(str(tmp_path)).fetch("abc123", gnps2=False, download=download)
+    cache.fetch("abc123", gnps2=True, download=download)
+
+    pd.testing.assert_frame_equal(first, _network("abc123"))
+    pd.testing.assert_frame_equal(again, first)
+    assert download.calls == [("abc123", False), ("abc123", True)]
+    assert (tmp_path / "gnps1" / "abc123.parquet").exists()
+    assert ("abc123", True) in cache
+
+
+def test_offline_mode_serves_only_from_cache(tmp_path):
+    TaskCache(str(tmp_path)).put("cached", True, _network())
+    offline = TaskCache(str(tmp_path), offline=True)
+    download = Downloader()
+
+    pd.testing.assert_frame_equal(offline.fetch("cached", download=download), _network())
+    with pytest.raises(TaskNotCached, match="missing"):
+        offline.fetch("missing", download=download)
+    assert download.calls == []
+
+
+def test_from_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("RDD_TASK_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("RDD_GNPS_OFFLINE", "1")
+    assert TaskCache.from_env("/unused") == TaskCache(str(tmp_path), offline=True)
+
+
+def test_rejects_path_like_task_ids(tmp_path):
+    with pytest.raises(ValueError, match="Invalid GNPS task id"):
+        TaskCache(str(tmp_path)).path("../../etc/passwd")
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_cache_directory_is_private_to_the_user(tmp_path):
+    """Other users can neither read cached tables nor plant their own."""
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    shared.chmod(0o777)
+
+    TaskCache(str(shared)).put("t1", True, _network())
+
+    assert stat.S_IMODE(shared.stat().st_mode) == 0o700
+    assert stat.S_IMODE((shared / "gnps2").stat().st_mode) == 0o700
+
+
+def test_serve_tasks_from_patches_rdd_modules(tmp_path, monkeypatch):
+    download = Downloader()
+    utils = types.ModuleType("rdd.utils")
+    utils.get_gnps_task_data = download
+    counts_module = types.ModuleType("rdd.RDDcounts")
+    counts_module.get_gnps_task_data = download  # ``from rdd.utils import ...``
+    package = types.ModuleType("rdd")
+    package.utils = utils
+    monkeypatch.setitem(sys.modules, "rdd", package)
+    monkeypatch.setitem(sys.modules, "rdd.utils", utils)
+    monkeypatch.setitem(sys.modules, "rdd.RDDcounts", counts_module)
+
+    cache = TaskCache(str(tmp_path), fetcher="rdd")
+    with serve_tasks_from(cache):
+        counts_module.get_gnps_task_data("t9", gnps2=True)
+        utils.get_gnps_task_data("t9", gnps2=True)
+
+    assert download.calls == [("t9", True)]
+    assert counts_module.get_gnps_task_data is download
+    assert utils.get_gnps_task_data is download
+
+
+def test_build_request_carries_the_cache(tmp_path):
+    request = BuildRequest(task_id="t1", task_cache=TaskCache(str(tmp_path), offline=True))
+
+    assert "task_cache" not in request.rdd_kwargs()
+    assert pickle.loads(pickle.dumps(request)) == request